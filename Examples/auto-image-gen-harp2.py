@@ -2,7 +2,7 @@
 # Python script to generate HARP2 RGB Images
 
 # Load the required libraries
-from nasa_pace_data_reader import L1, plot
+from nasa_pace_data_reader import L1, plot, template
 
 import argparse
 from datetime import datetime
@@ -10,9 +10,6 @@ import os
 import sys
 from pathlib import Path
 from matplotlib import pyplot as plt
-import cartopy.crs as ccrs
-import cartopy.feature as cfeature
-from cartopy.mpl.gridliner import LONGITUDE_FORMATTER, LATITUDE_FORMATTER
 
 # suppress warnings
 import warnings
@@ -21,7 +18,16 @@ warnings.filterwarnings("ignore")
 class Args:
         pass
 
-def plotL1C(args):
+def quicklookTemplate(args):
+    """ Build the four panel quicklook figure once, the granules only swap the images"""
+    quicklook = template.FigureTemplate('PlateCarree', nrows=2, ncols=2, figsize=(12, 9), dpi=args.dpi)
+    quicklook[0].ax.set_title('Intensity\n(R=670 nm, G=550 nm, B=440 nm)')
+    quicklook[1].ax.set_title('Intensity\n(R=670 nm, G=870 nm, B=440 nm)')
+    quicklook[2].ax.set_title('Polarized Radiance\n(R=670 nm, G=550 nm, B=440 nm)')
+    quicklook[3].ax.set_title('Polarized Radiance\n(R=670 nm, G=870 nm, B=440 nm)')
+    return quicklook
+
+def plotL1C(args, quicklook):
     # Read the file
     l1c = L1.L1C()
     l1c_dict = l1c.read(args.l1c_file)
@@ -29,48 +35,36 @@ def plotL1C(args):
     # Load the plot class (default instrument is HARP2)
     plt_ = plot.Plot(l1c_dict)
 
-    # define the figure and axis handles
-    fig_ = plt.figure(dpi=args.dpi, figsize=(12, 9))
-
     # plot RGB in default plate carree projection
-    ax1 = fig_.add_subplot(221, projection=ccrs.PlateCarree())
-    plt_.projectedRGB(normFactor=args.normFactor, noShow=True, ax=ax1, setTitle=False)
-    ax1.set_title('Intensity\n(R=670 nm, G=550 nm, B=440 nm)')
+    quicklook.renderRGB(plt_, panel=0, normFactor=args.normFactor)
 
     # plot RGB in with different view angle
-    ax2 = fig_.add_subplot(222, projection=ccrs.PlateCarree())
-    plt_.projectedRGB(var='i', viewAngleIdx=[36, 73, 84], normFactor=args.normFactor,
-                       scale=[0.85, 1.4, 1], ax=ax2, noShow=True, setTitle=False) # type: ignore
-    # plt_.projectedRGB(var='q', viewAngleIdx=[31, 3, 83], scale=2, normFactor=100, saveFig=True)
-    ax2.set_title('Intensity\n(R=670 nm, G=870 nm, B=440 nm)')
+    quicklook.renderRGB(plt_, panel=1, var='i', viewAngleIdx=[36, 73, 84], normFactor=args.normFactor,
+                        scale=[0.85, 1.4, 1])
 
     # project dolp
-    ax3 = fig_.add_subplot(223, projection=ccrs.PlateCarree())
-    plt_.projectedRGB(var='dolp', viewAngleIdx=[31, 3, 83], normFactor=50,
-                       scale=[0.8, 1, 1], ax=ax3, rgb_dolp=True, noShow=True, setTitle=False) # type: ignore
-    ax3.set_title('Polarized Radiance\n(R=670 nm, G=550 nm, B=440 nm)')
+    quicklook.renderRGB(plt_, panel=2, var='dolp', viewAngleIdx=[31, 3, 83], normFactor=50,
+                        scale=[0.8, 1, 1], rgb_dolp=True)
 
     # plot one variable in a specific projection at closest viewing angle to nadir
-    ax4 = fig_.add_subplot(224, projection=ccrs.PlateCarree())
-    plt_.projectedRGB(var='dolp', normFactor=50, scale=[0.8, 1, 1], ax=ax4, # type: ignore
-                       rgb_dolp=True, noShow=True, setTitle=False)
-    ax4.set_title('Polarized Radiance\n(R=670 nm, G=870 nm, B=440 nm)')
+    quicklook.renderRGB(plt_, panel=3, var='dolp', normFactor=50, scale=[0.8, 1, 1], rgb_dolp=True)
 
     if l1c_dict is not None:
-        fig_.suptitle(f'HARP2 L1C Quicklook\n {l1c_dict["date_time"]} UTC')
+        title = f'HARP2 L1C Quicklook\n {l1c_dict["date_time"]} UTC'
     else:
-        fig_.suptitle('HARP2 L1C Quicklook')
+        title = 'HARP2 L1C Quicklook'
 
     try:
-        fig_.savefig(args.save_path, dpi=args.dpi)
+        quicklook.save(args.save_path, title=title)
         print(f'Quicklook saved to {args.save_path}')
     except Exception as e:
         print(f'Error saving the figure: {e}')
         return 1
 
-    # plot RGB in Orthographic projection
+    # plot RGB in Orthographic projection, centred on the granule
     plt_.projectedRGB(proj='Orthographic', normFactor=args.normFactor, saveFig=True,
                     figsize=(5, 5), noShow=True, savePath=args.save_path.replace('.png', '_orthographic.png'))
+    plt.close('all')
 
     return 0
 
@@ -97,8 +91,10 @@ if __name__ == "__main__":
                 """)
 
     #-- required arguments
-    parser.add_argument('--l1c_file',  type=str, required=True, help='path+filename of the HARP2 Level 1C file')
-    parser.add_argument('--save_path', type=str, required=False, help='path to the quicklook png file')
+    parser.add_argument('--l1c_file',  type=str, nargs='+', required=True,
+                        help='path+filename of one or more HARP2 Level 1C files, rendered with one figure')
+    parser.add_argument('--save_path', type=str, required=False,
+                        help='path to the quicklook png file, or a directory when several files are given')
 
     #-- optional arguments
     parser.add_argument('--verbose', '-v', action='store_true')
@@ -111,28 +107,34 @@ if __name__ == "__main__":
     args = parser.parse_args()
 
     #-- validate arguments
-    assert os.path.exists(args.l1c_file),     'l1c_file does not exist!' 
+    for l1c_file in args.l1c_file:
+        assert os.path.exists(l1c_file),     f'l1c_file {l1c_file} does not exist!'
     assert args.instrument in ['HARP2','AirHARP2'], 'instrument must be HARP2 or AirHARP2'
     assert args.normFactor > 0, 'normFactor must be greater than 0'
 
-    # save the figure in the same directory as the L1C file
-    if args.save_path is None:
-        args.save_path = os.path.join(os.path.dirname(args.l1c_file),
-                                      os.path.basename(args.l1c_file).replace('.nc', '_quicklook.png'))
-    if Path(args.save_path).is_dir():
-        assert os.path.exists(args.save_path), 'save_path does not exist!'
-        args.save_path = os.path.join(args.save_path, os.path.basename(args.l1c_file).replace('.nc', '_quicklook.png'))
-    else:
-        if os.path.dirname(args.save_path)!='':
-            assert os.path.exists(os.path.dirname(args.save_path)), 'save_path does not exist!'
-
-    #-- run the main program
+    #-- run the main program, the quicklook figure is built once for all files
+    quicklook = quicklookTemplate(args)
+    l1c_files, save_path, status = args.l1c_file, args.save_path, 0
+    for l1c_file in l1c_files:
+        args.l1c_file = l1c_file
+        # save the figure in the same directory as the L1C file
+        args.save_path = save_path
+        if args.save_path is None:
+            args.save_path = os.path.join(os.path.dirname(args.l1c_file),
+                                          os.path.basename(args.l1c_file).replace('.nc', '_quicklook.png'))
+        elif Path(args.save_path).is_dir():
+            assert os.path.exists(args.save_path), 'save_path does not exist!'
+            args.save_path = os.path.join(args.save_path, os.path.basename(args.l1c_file).replace('.nc', '_quicklook.png'))
+        else:
+            assert len(l1c_files) == 1, 'save_path must be a directory when several files are given'
+            if os.path.dirname(args.save_path)!='':
+                assert os.path.exists(os.path.dirname(args.save_path)), 'save_path does not exist!'
+
+        status = max(status, plotL1C(args, quicklook))
 
-    
     # args = Args()
     # args.l1c_file = '/Users/aputhukkudy/Downloads/az180_r.7/PACE_HARP2.20240224T104106.L1C.nc'
     # args.save_path = '/Users/aputhukkudy/Downloads/az180_r.7/PACE_HARP2.20240224T104106.L1C_quicklook.png'
     # args.dpi = 300
             
-    # run the main program
-    sys.exit(plotL1C(args))
+    sys.exit(status)
@@ -3,7 +3,7 @@
 # multiple L1C files
 
 # Load the required libraries
-from nasa_pace_data_reader import L1, plot
+from nasa_pace_data_reader import L1, plot, catalog, template
 from datetime import datetime
 import os
 import sys
@@ -12,12 +12,6 @@ import argparse
 import gc
 from pathlib import Path
 
-# plot libraries
-from matplotlib import pyplot as plt
-import cartopy.crs as ccrs
-import cartopy.feature as cfeature
-from cartopy.mpl.gridliner import LONGITUDE_FORMATTER, LATITUDE_FORMATTER
-
 # suppress warnings
 import warnings
 warnings.filterwarnings("ignore")
@@ -29,8 +23,8 @@ warnings.filterwarnings("ignore")
 class Args:
         pass
 
-def plotL1C(args, fig_, rgb_, temp_num=0, viewIndex=[36, 4, 84]):
-    """ Plot the L1C file in orthographic projection"""
+def plotL1C(args, templates, rgb_, temp_num=0, viewIndex=[36, 4, 84]):
+    """ Plot the L1C file in orthographic projection, reusing the figure templates across the granules"""
 
     # Read the file
     l1c = L1.L1C()
@@ -46,12 +40,16 @@ def plotL1C(args, fig_, rgb_, temp_num=0, viewIndex=[36, 4, 84]):
         # Load the plot class (default instrument is HARP2)
         plt_ = plot.Plot(l1c_dict)
 
-        # plot RGB in Orthographic projection with fixed latitude
-        lat_0 = None if args.fixed_lat == 0 else 0
         # assert if fixed_lon is between -180 and 180
         assert -180 <= args.fixed_lat <= 180, 'Error: fixed_lat must be between -180 and 180'
-        lon_0 = None if args.fixed_lon == 0 else args.fixed_lon
 
+        # build the figures once, centred on the fixed longitude or on the first granule
+        if not templates:
+            lon_0 = args.fixed_lon if args.fixed_lon != 0 else plt_.average_longitude(l1c_dict['longitude'].ravel())[0]
+            lat_0 = 0 if args.fixed_lat != 0 else float(l1c_dict['latitude'].mean())
+            for key in ['granule', 'orbit']:
+                templates[key] = template.FigureTemplate('Orthographic', lon_0=lon_0, lat_0=lat_0, figsize=(6, 6),
+                                                         dpi=args.dpi, underlays=['bluemarble'], proj_size=(1200, 600))
 
         # normFactor
         # normFactor = args.normFactor
@@ -61,30 +59,19 @@ def plotL1C(args, fig_, rgb_, temp_num=0, viewIndex=[36, 4, 84]):
         else:
             scale_ = [1, 1, 1]
 
-        # plot RGB in Orthographic projection
-        fig2, ax2, rgb_['rgb_new'][l1c_file], \
-            rgb_['rgb_extent'][l1c_file], \
-                rgb_['dateline'][l1c_file], rgb_['lon_center'][l1c_file], \
-                     rgb_['lat_center'][l1c_file] = plt_.projectedRGB(proj='Orthographic', viewAngleIdx=viewIndex,
-                                                            normFactor=normFactor, scale=scale_, saveFig=True, returnRGB=True, # type: ignore
-                                                            figsize=(6, 6), noShow=True, savePath=args.save_path,
-                                                            lat_0=lat_0, lon_0=lon_0, proj_size=(1200, 600), highResStockImage=True,
-                                                            returnTransitionFlag=True)
-        
+        # plot RGB in Orthographic projection, only the image of the granule is swapped
+        rgb_new, rgb_extent = templates['granule'].renderRGB(plt_, args.save_path, viewAngleIdx=viewIndex,
+                                                             normFactor=normFactor, scale=scale_)
+
+        # plot the orbit with previous L1C files, the earlier granules stay on the figure
+        if rgb_new is not None:
+            rgb_['rgb_new'][l1c_file] = rgb_new
+            rgb_['rgb_extent'][l1c_file] = rgb_extent
+            templates['orbit'][0].add(rgb_new, rgb_extent)
+        templates['orbit'].save(str(args.save_path).replace('.png', '_seq.png'))
         gc.collect()
-        if temp_num > 0:
-            # plot the orbit with previous L1C files
-            for key in rgb_['rgb_new']:
-                if rgb_['dateline'][key]:
-                    ax2.imshow(rgb_['rgb_new'][key], origin='lower', extent=rgb_['rgb_extent'][key], transform=ccrs.PlateCarree(central_longitude=rgb_['lon_center'][key]))
-                else:
-                    ax2.imshow(rgb_['rgb_new'][key], origin='lower', extent=rgb_['rgb_extent'][key], transform=ccrs.PlateCarree())
-                gc.collect()
-            fig2.savefig(str(args.save_path).replace('.png', '_seq.png'), dpi=args.dpi)
-        else:
-            fig2.savefig(str(args.save_path).replace('.png', '_seq.png'), dpi=args.dpi)
-        
-        return ax2
+
+        return templates['granule'][0].ax
     except Exception as e:
         print(f'Error: {e}')
         if "NetCDF: HDF error" in str(e):
@@ -170,6 +157,12 @@ parser.add_argument('--viewIndex', type=int, required=False, default=0, help='Vi
 parser.add_argument('--fixed_lat', type=int, required=False, default=0, help='Fixed latitude for the orthographic projection')
 parser.add_argument('--fixed_lon', type=int, required=False, default=0, help='Fixed longitude for the orthographic projection')
 parser.add_argument('--time_range', type=bool, required=False, default=0, help='Time range for the L1C files')
+parser.add_argument('--start', type=str, required=False, default='2024-03-11T05:15:00', help='Start of the time range (ISO format)')
+parser.add_argument('--end', type=str, required=False, default='2024-03-11T06:50:00', help='End of the time range (ISO format)')
+parser.add_argument('--bbox', type=float, nargs=4, required=False, default=None, help='Only granules over lon_min lon_max lat_min lat_max')
+parser.add_argument('--catalog', type=str, required=False,
+                    default=os.path.join(Path.home(), '.cache', 'nasa_pace_data_reader', 'pace_catalog.sqlite'),
+                    help='SQLite catalog of the L1C files, kept outside l1c_dir so read-only archives work')
 
 args_ = parser.parse_args()
 
@@ -194,20 +187,17 @@ args_ = parser.parse_args()
 #--------------------------------------------------------------#
 
 
-# List of L1C files from a directory
+# List of L1C files from a directory, indexed once in a catalog and updated when files change
 l1c_dir = Path(args_.l1c_dir)
-l1c_files = sorted(Path(l1c_dir).glob('*5km.nc'))
-
-# sort the L1C files by filename
-l1c_files = sorted(l1c_files, key=lambda x: x.name)
-
-#--------------------------------------------------------------#
-# select l1c_files in a range (start, end) based on the PACE_HARP2.20240311TXXXX*5km.nc to PACE_HARP2.20240311TYYYY*5km.nc
-if bool(args_.time_range):
-    start = 'PACE_HARP2.20240311T051500'
-    end = 'PACE_HARP2.20240311T065000'
+os.makedirs(os.path.dirname(os.path.abspath(args_.catalog)), exist_ok=True)
+with catalog.Catalog(args_.catalog) as l1c_catalog:
+    l1c_catalog.scan(l1c_dir, pattern='*5km.nc')
 
-    l1c_files = [x for x in l1c_files if start <= x.name <= end]
+    #--------------------------------------------------------------#
+    # select the HARP2 L1C files in a time range (start, end) and over a bbox, sorted by time
+    start, end = (args_.start, args_.end) if bool(args_.time_range) else (None, None)
+    l1c_files = [Path(x) for x in l1c_catalog.paths(instrument='HARP2', level='L1C', start=start, end=end,
+                                                    bbox=args_.bbox)]
 
 #--------------------------------------------------------------#
 
@@ -215,9 +205,6 @@ if bool(args_.time_range):
 rgb_ = {}
 rgb_['rgb_new'] = {}
 rgb_['rgb_extent'] = {}
-rgb_['dateline'] = {}
-rgb_['lon_center'] = {}
-rgb_['lat_center'] = {}
 
 #--------------------------------------------------------------
 
@@ -244,8 +231,8 @@ movie_dir = f'{l1c_dir}/movie_{str(args_.viewIndex)}' +'_Idx_lat'+str(args_.fixe
 args_.movie_dir = movie_dir
 os.makedirs(movie_dir, exist_ok=True)
 
-# Define the figure handle
-fig = plt.figure(dpi=args_.dpi, figsize=(12, 12))
+# The figure templates, built with the first granule
+templates = {}
 
 temp_num = 0
 
@@ -255,7 +242,7 @@ if not bool(args_.movie_only):
         args_.l1c_file = str(l1c_file)
         args_.save_path = l1c_file.with_suffix('.png')
         print('Projecting RGB for:', args_.l1c_file)
-        ax_new = plotL1C(args_, fig, rgb_, temp_num=temp_num, viewIndex=viewIndex)
+        ax_new = plotL1C(args_, templates, rgb_, temp_num=temp_num, viewIndex=viewIndex)
         temp_num += 1
 #--------------------------------------------------------------#
 # Save the RGB_ dict
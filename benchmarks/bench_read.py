@@ -0,0 +1,199 @@
+"""
+Benchmarks the read path of the nasa_pace_data_reader readers on synthetic granules.
+
+For every level and instrument the script writes synthetic granules (once per size,
+chunking and compression setup), then times ``read()`` and its variants in isolated
+processes and reports the throughput in MB/s of decoded data, the peak RSS increase
+and the decode time of every variable.
+
+Example:
+    python benchmarks/bench_read.py --levels L1C L2 --instruments HARP2 OCI --rows 519 --cols 519
+    python benchmarks/bench_read.py --chunks bins_along_track=64 --complevel 1 --json read.json
+"""
+
+# Standard library imports for the command line and timing.
+import os
+import glob
+import time
+import argparse
+import datetime
+import tempfile
+
+# Third-party imports for reading the granules variable by variable.
+from netCDF4 import Dataset # type: ignore
+
+# Local imports for the readers, the granule generator and the benchmark helpers.
+from nasa_pace_data_reader import L1, L2, synthetic
+from common import runIsolated, printTable, saveJSON
+
+
+def makeReader(level, instrument):
+    """Creates the reader of a level."""
+    match level.lower():
+        case 'l1c':
+            return L1.L1C(instrument)
+        case 'l1b':
+            return L1.L1B()
+        case 'l1beta':
+            return L1.L1beta()
+        case 'l2':
+            return L2.L2()
+
+
+def readEager(level, instrument, path, kwargs):
+    """Reads a granule into a dictionary."""
+    return makeReader(level, instrument).read(path, **kwargs)
+
+
+def readLazy(level, instrument, path, kwargs):
+    """Opens a granule lazily and decodes every variable through Granule.load."""
+    with makeReader(level, instrument).read(path, lazy=True, **kwargs) as granule:
+        return granule.load()
+
+
+def readBatch(level, instrument, paths, kwargs):
+    """Reads several granules with read_many, a failed read fails the case."""
+    results = list(makeReader(level, instrument).read_many(paths, **kwargs))
+    for result in results:
+        if not result.ok:
+            raise RuntimeError(f'Error: read_many failed on {result.path}\n{result.traceback}')
+    return [result.data for result in results]
+
+
+def variableDecodeTimes(path):
+    """
+    Times the decoding of every variable of a granule.
+
+    Args:
+        path (str): The path to the granule.
+
+    Returns:
+        list: One dict per variable with its group, name, shape, size and decode time.
+    """
+    rows = []
+    with Dataset(path, 'r') as dataNC:
+        groups = [dataNC] + list(dataNC.groups.values())
+        for group in groups:
+            for name, variable in group.variables.items():
+                start = time.perf_counter()
+                values = variable[:]
+                elapsed = time.perf_counter() - start
+                size = values.nbytes / 1e6
+                rows.append({'group': group.name, 'variable': name, 'shape': 'x'.join(map(str, values.shape)),
+                             'decoded_mb': size, 'time_s': elapsed,
+                             'mb_per_s': size / elapsed if elapsed > 0 else float('nan')})
+    return rows
+
+
+def readCases(level, instrument, paths, rows, cols):
+    """
+    Lists the read variants benchmarked for a level.
+
+    Args:
+        level (str): The product level.
+        instrument (str): The instrument.
+        paths (list): Two granules of the same setup, the second is used by read_many.
+        rows (int): The number of along-track bins.
+        cols (int): The number of across-track bins.
+
+    Returns:
+        list: (case name, function, arguments) tuples.
+    """
+    path = paths[0]
+    # a box around the swath centre covering about a quarter of the rows and columns
+    half = max(rows, cols) * 5.0 / 111.2 / 8
+    bbox = (-half, half, -half, half)
+    cases = [('read', readEager, (level, instrument, path, {})),
+             ('read lazy + load', readLazy, (level, instrument, path, {}))]
+
+    match level.lower():
+        case 'l1c':
+            views = [36, 4, 84] if instrument == 'HARP2' else [0]
+            cases += [("variables=['i']", readEager, (level, instrument, path, {'variables': ['i']})),
+                      (f'view_indices={views}', readEager, (level, instrument, path, {'view_indices': views})),
+                      ('bbox', readEager, (level, instrument, path, {'bbox': bbox})),
+                      (f'read_many x{len(paths)}', readBatch, (level, instrument, paths, {'workers': len(paths)}))]
+        case 'l1b':
+            cases += [("variables=['i']", readEager, (level, instrument, path, {'variables': ['i']}))]
+        case 'l1beta':
+            # L1beta has no lazy mode
+            cases = cases[:1]
+        case 'l2':
+            cases += [("variables=['aot']", readEager, (level, instrument, path, {'variables': ['aot']})),
+                      ('bbox', readEager, (level, instrument, path, {'bbox': bbox})),
+                      (f'read_many x{len(paths)}', readBatch, (level, instrument, paths, {'workers': len(paths)}))]
+    return cases
+
+
+def writeGranules(workdir, level, instrument, rows, cols, options, count=2):
+    """
+    Writes the synthetic granules of one setup, reusing files from earlier runs.
+
+    Returns:
+        list: The paths of the granules.
+    """
+    chunk_tag = '-'.join(f'{dim}{size}' for dim, size in sorted((options['chunks'] or {}).items())) or 'default'
+    tag = f"{rows}x{cols}-{chunk_tag}-{options['compression'] or 'raw'}{options['complevel']}"
+    directory = os.path.join(workdir, tag)
+
+    paths = []
+    for index in range(count):
+        granule_time = datetime.datetime(2024, 5, 1) + datetime.timedelta(minutes=5*index)
+        existing = glob.glob(os.path.join(directory, f"PACE_{instrument}.{granule_time:%Y%m%dT%H%M%S}.{level}.*nc"))
+        if existing:
+            paths.append(existing[0])
+            continue
+        print(f'...Writing synthetic {instrument} {level} granule {index + 1}/{count} ({tag})')
+        paths.append(synthetic.writeGranule(directory, level=level, instrument=instrument, time=granule_time,
+                                            rows=rows, cols=cols, **options))
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the read path of nasa_pace_data_reader on synthetic granules.')
+    parser.add_argument('--levels', nargs='+', default=['L1C', 'L1B', 'L1beta', 'L2'])
+    parser.add_argument('--instruments', nargs='+', default=['HARP2', 'SPEXone', 'OCI'], help='L1C instruments')
+    parser.add_argument('--rows', type=int, default=519)
+    parser.add_argument('--cols', type=int, default=519)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--chunks', nargs='*', default=None, help='chunk lengths as dim=size, e.g. bins_along_track=64')
+    parser.add_argument('--complevel', type=int, default=4)
+    parser.add_argument('--no-compression', action='store_true')
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'pace-bench'))
+    parser.add_argument('--json', default=None, help='save the results to this JSON file')
+    args = parser.parse_args()
+
+    options = {'chunks': {dim: int(size) for dim, size in (item.split('=') for item in args.chunks)} if args.chunks else None,
+               'compression': None if args.no_compression else 'zlib',
+               'complevel': args.complevel}
+
+    results = {'setup': vars(args), 'reads': [], 'variables': []}
+    for level in args.levels:
+        default = 'GAPMAP' if level.lower() == 'l1beta' else 'HARP2'
+        for instrument in (args.instruments if level.lower() == 'l1c' else [default]):
+            paths = writeGranules(args.workdir, level, instrument, args.rows, args.cols, options)
+            file_mb = os.path.getsize(paths[0]) / 1e6
+            for case, func, func_args in readCases(level, instrument, paths, args.rows, args.cols):
+                stats = runIsolated(func, func_args, repeat=args.repeat)
+                stats.pop('output', None)
+                row = {'level': level, 'instrument': instrument, 'case': case, 'file_mb': file_mb, **stats}
+                results['reads'].append(row)
+                if 'error' in stats:
+                    print(f"...{level} {instrument:<8} {case:<28} failed\n{stats['error']}")
+                else:
+                    print(f"...{level} {instrument:<8} {case:<28} {stats['best_s']:.3f} s  {stats['mb_per_s']:.1f} MB/s")
+            for row in variableDecodeTimes(paths[0]):
+                results['variables'].append({'level': level, 'instrument': instrument, **row})
+
+    print()
+    printTable(results['reads'], ['level', 'instrument', 'case', 'file_mb', 'decoded_mb', 'best_s', 'median_s',
+                                  'mb_per_s', 'peak_rss_mb'])
+    print()
+    printTable(results['variables'], ['level', 'instrument', 'group', 'variable', 'shape', 'decoded_mb', 'time_s',
+                                      'mb_per_s'])
+    if args.json:
+        saveJSON(results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""
+Benchmarks the rendering and regridding stages of nasa_pace_data_reader on synthetic swaths.
+
+Every stage (plotRGB, meshgridRGB, GridRGB, projectedRGB with each projection, projectVar
+and L2.projectVar) runs in its own process on synthetic granules of increasing size. The
+script reports the wall time of the first (cold index cache) and best run, the peak RSS
+increase of the stage and, against a stored reference, the fraction of output pixels that
+are unchanged. The output of the regridding stages is the regridded array, the output of
+the map stages is the rendered RGBA canvas.
+
+Example:
+    python benchmarks/bench_render.py --sizes 130x130 260x260 519x519 --save-reference ref/
+    python benchmarks/bench_render.py --sizes 130x130 260x260 519x519 --reference ref/ --json render.json
+"""
+
+# Standard library imports for the command line.
+import os
+import argparse
+import tempfile
+
+# Third-party imports for array handling and headless rendering.
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib import pyplot as plt
+
+# Local imports for the readers, the plotting class, the granule generator and the benchmark helpers.
+from nasa_pace_data_reader import L1, L2, plot, synthetic
+from common import runIsolated, printTable, saveJSON
+
+# The HARP2 views used for the RGB composites.
+RGB_VIEWS = [36, 4, 84]
+
+
+def loadL1C(path, cache):
+    """Reads a granule and prepares the Plot instance, its RGB and the geolocation."""
+    plt_ = plot.Plot(L1.L1C().read(path))
+    if not cache:
+        plt_.regridCache = None
+    plt_.plotRGB(viewAngleIdx=RGB_VIEWS, returnRGB=True, plot=False)
+    return plt_
+
+
+def loadL2(path, cache):
+    """Reads an L2 granule, the reader keeps the data for projectVar."""
+    reader = L2.L2()
+    reader.read(path)
+    return reader
+
+
+def renderedCanvas(fig):
+    """Draws a figure and returns its RGBA pixels."""
+    fig.canvas.draw()
+    pixels = np.array(fig.canvas.buffer_rgba())
+    plt.close('all')
+    return pixels
+
+
+def stagePlotRGB(plt_):
+    plt_.plotRGB(viewAngleIdx=RGB_VIEWS, returnRGB=True, plot=False)
+    return plt_.rgb
+
+
+def stageMeshgridRGB(plt_):
+    return plt_.meshgridRGB(plt_.data['longitude'], plt_.data['latitude'])[0]
+
+
+def stageGridRGB(plt_):
+    lon = plt_.data['longitude']
+    dateline = bool(np.abs(lon.max() - lon.min()) > 180)
+    return plt_.GridRGB(lon, plt_.data['latitude'], dateline=dateline)[0]
+
+
+def stageProjectedNone(plt_):
+    return plt_.projectedRGB(rgb=plt_.rgb, proj='None', viewAngleIdx=RGB_VIEWS, returnRGB=True)[0]
+
+
+def stageProjectedPlateCarree(plt_):
+    fig = plt_.projectedRGB(rgb=plt_.rgb, proj='PlateCarree', viewAngleIdx=RGB_VIEWS, returnRGB=True)[0]
+    return renderedCanvas(fig)
+
+
+def stageProjectedOrthographic(plt_):
+    fig = plt_.projectedRGB(rgb=plt_.rgb, proj='Orthographic', viewAngleIdx=RGB_VIEWS, returnRGB=True)[0]
+    return renderedCanvas(fig)
+
+
+def stageProjectVar(plt_):
+    plt_.projectVar('i', viewAngle=0, dpi=100)
+    return renderedCanvas(plt.gcf())
+
+
+def stageL2ProjectVar(reader):
+    reader.projectVar('aot', wavelength=550, dpi=100)
+    return renderedCanvas(plt.gcf())
+
+
+# The benchmarked stages: (name, setup, stage).
+STAGES = [
+    ('plotRGB', loadL1C, stagePlotRGB),
+    ('meshgridRGB', loadL1C, stageMeshgridRGB),
+    ('GridRGB', loadL1C, stageGridRGB),
+    ("projectedRGB(proj='None')", loadL1C, stageProjectedNone),
+    ("projectedRGB(proj='PlateCarree')", loadL1C, stageProjectedPlateCarree),
+    ("projectedRGB(proj='Orthographic')", loadL1C, stageProjectedOrthographic),
+    ('projectVar', loadL1C, stageProjectVar),
+    ('L2.projectVar', loadL2, stageL2ProjectVar),
+]
+
+
+def referencePath(directory, stage, size):
+    """Returns the file holding the reference output of a stage."""
+    name = ''.join(c if c.isalnum() else '_' for c in stage).strip('_')
+    return os.path.join(directory, f'{name}-{size}.npy')
+
+
+def compareOutput(output, reference):
+    """
+    Compares a stage output with its reference.
+
+    Args:
+        output (np.ndarray): The output of this run.
+        reference (np.ndarray): The stored reference output.
+
+    Returns:
+        dict: The fraction of identical pixels and the largest absolute difference, or a shape mismatch note.
+    """
+    output = np.ma.getdata(output)
+    if output.shape != reference.shape:
+        return {'equal_frac': 0.0, 'max_abs_diff': float('nan'), 'note': f'shape {output.shape} != {reference.shape}'}
+    equal = output == reference
+    if equal.ndim == 3:
+        # a pixel is equal when all its channels are
+        equal = equal.all(axis=-1)
+    difference = np.abs(output.astype(np.float64) - reference.astype(np.float64))
+    return {'equal_frac': float(equal.mean()), 'max_abs_diff': float(np.nanmax(difference)) if difference.size else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the rendering and regridding stages of nasa_pace_data_reader.')
+    parser.add_argument('--sizes', nargs='+', default=['130x130', '260x260', '519x519'], help='swath sizes as ROWSxCOLS')
+    parser.add_argument('--stages', nargs='+', default=None, help='a subset of the stage names')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--dateline', action='store_true', help='centre the swaths on the antimeridian')
+    parser.add_argument('--no-cache', action='store_true', help='disable the regridding index cache')
+    parser.add_argument('--reference', default=None, help='directory with reference outputs to compare against')
+    parser.add_argument('--save-reference', default=None, help='directory to store the outputs as the new reference')
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'pace-bench'))
+    parser.add_argument('--json', default=None, help='save the results to this JSON file')
+    args = parser.parse_args()
+
+    stages = [stage for stage in STAGES if args.stages is None or stage[0] in args.stages]
+    lon_center = 180.0 if args.dateline else 0.0
+
+    results = {'setup': vars(args), 'stages': []}
+    for size in args.sizes:
+        rows, cols = (int(n) for n in size.lower().split('x'))
+        label = f'{size}-dateline' if args.dateline else size
+        directory = os.path.join(args.workdir, f'render-{size}-{"dateline" if args.dateline else "centre"}')
+        paths = {'L1C': os.path.join(directory, synthetic.granuleName('HARP2', 'L1C', suffix='5km')),
+                 'L2': os.path.join(directory, synthetic.granuleName('HARP2', 'L2', suffix='GRASP'))}
+        if not os.path.exists(paths['L1C']):
+            print(f'...Writing synthetic HARP2 L1C and L2 granules ({size})')
+            synthetic.writeL1C(directory, rows=rows, cols=cols, lon_center=lon_center)
+            synthetic.writeL2(directory, rows=rows, cols=cols, lon_center=lon_center)
+
+        for name, setup, stage in stages:
+            path = paths['L2'] if setup is loadL2 else paths['L1C']
+            stats = runIsolated(stage, (path, not args.no_cache), repeat=args.repeat, setup=setup)
+            output = stats.pop('output', None)
+            row = {'size': size, 'stage': name, 'status': 'failed' if 'error' in stats else 'ok', **stats}
+            if 'error' in stats:
+                print(f'...{size:<9} {name:<34} failed\n{stats["error"]}')
+                results['stages'].append(row)
+                continue
+
+            if output is not None and args.save_reference:
+                os.makedirs(args.save_reference, exist_ok=True)
+                np.save(referencePath(args.save_reference, name, label), np.ma.getdata(output))
+            if output is not None and args.reference:
+                reference = referencePath(args.reference, name, label)
+                if os.path.exists(reference):
+                    row.update(compareOutput(output, np.load(reference)))
+            results['stages'].append(row)
+            print(f"...{size:<9} {name:<34} first {stats['first_s']:.3f} s  best {stats['best_s']:.3f} s  "
+                  f"peak RSS +{stats['peak_rss_mb']:.1f} MB")
+
+    print()
+    printTable(results['stages'], ['size', 'stage', 'status', 'first_s', 'best_s', 'median_s', 'peak_rss_mb', 'equal_frac',
+                                   'max_abs_diff'])
+    if args.json:
+        saveJSON(results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+"""
+Shared helpers for the nasa_pace_data_reader benchmark scripts.
+
+Every benchmark case runs in a freshly spawned process, so its peak RSS is not inflated by
+earlier cases and the page cache is the only state shared between cases.
+"""
+
+# Standard library imports for timing, memory accounting and isolation.
+import gc
+import io
+import json
+import time
+import resource
+import traceback
+import multiprocessing
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
+
+# Third-party imports for array handling.
+import numpy as np
+
+
+def currentRSS():
+    """
+    Returns the resident set size of this process in bytes.
+
+    Returns:
+        int: The RSS, 0 if /proc is not available.
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def resetPeakRSS():
+    """
+    Resets the peak RSS of this process to its current RSS, so the next peak belongs to one stage.
+
+    Returns:
+        bool: False if the kernel does not allow the reset, peakRSS then reports the process-wide peak.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peakRSS():
+    """
+    Returns the peak resident set size of this process in bytes.
+
+    Returns:
+        int: The peak RSS since the last resetPeakRSS, or since the process started.
+    """
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def decodedBytes(data):
+    """
+    Sums the size of all arrays in a reader output.
+
+    Args:
+        data: A dict, Granule, list or array as returned by a reader.
+
+    Returns:
+        int: The number of bytes held by the decoded arrays.
+    """
+    if isinstance(data, np.ndarray):
+        return np.ma.getdata(data).nbytes
+    if hasattr(data, 'items'):
+        return sum(decodedBytes(value) for _, value in data.items())
+    if isinstance(data, (list, tuple)):
+        return sum(decodedBytes(value) for value in data)
+    return 0
+
+
+def runCase(func, args, repeat, setup=None):
+    """
+    Runs one benchmark case in the current process.
+
+    Args:
+        func (callable): The function to time, it returns the data whose size is reported.
+        args (tuple): The arguments of func, or of setup if given.
+        repeat (int): The number of timed runs.
+        setup (callable, optional): An untimed function whose result is passed to func instead of args,
+                                    e.g. reading the granule a plotting stage works on. Defaults to None.
+
+    Returns:
+        dict: The run times in seconds, the decoded bytes, the RSS in bytes and the output of the
+              last run, or the formatted error if the case failed.
+    """
+    try:
+        # the readers print progress messages, keep them out of the report
+        with redirect_stdout(io.StringIO()):
+            if setup is not None:
+                args = (setup(*args),)
+        gc.collect()
+        resetPeakRSS()
+        baseline = currentRSS()
+        times = []
+        nbytes = 0
+        for _ in range(repeat):
+            with redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                data = func(*args)
+                times.append(time.perf_counter() - start)
+            nbytes = decodedBytes(data)
+            output = data if setup is not None else None
+            del data
+            gc.collect()
+        return {'times': times, 'bytes': nbytes, 'baseline_rss': baseline, 'peak_rss': peakRSS(), 'output': output}
+    except Exception:
+        return {'error': traceback.format_exc(limit=-3)}
+
+
+def runIsolated(func, args=(), repeat=3, setup=None):
+    """
+    Runs one benchmark case in a new process and collects its statistics.
+
+    Args:
+        func (callable): A module-level function to time.
+        args (tuple, optional): The arguments of func (or setup). Defaults to ().
+        repeat (int, optional): The number of timed runs. Defaults to 3.
+        setup (callable, optional): A module-level function run once before the timed runs. Defaults to None.
+
+    Returns:
+        dict: The first, best and median time, the decoded bytes, the throughput in MB/s, the
+              peak RSS increase over the process baseline in MB and the output of the last run
+              when a setup is given. Holds only 'error' if the case failed.
+    """
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        result = executor.submit(runCase, func, args, repeat, setup).result()
+    if 'error' in result:
+        return result
+    best = min(result['times'])
+    return {
+        'first_s': result['times'][0],
+        'best_s': best,
+        'median_s': float(np.median(result['times'])),
+        'decoded_mb': result['bytes'] / 1e6,
+        'mb_per_s': result['bytes'] / 1e6 / best if best > 0 else float('nan'),
+        'peak_rss_mb': max(result['peak_rss'] - result['baseline_rss'], 0) / 1e6,
+        'output': result['output'],
+    }
+
+
+def printTable(rows, columns):
+    """
+    Prints a list of result dictionaries as an aligned table.
+
+    Args:
+        rows (list): The results, one dict per row.
+        columns (list): The keys to print, in order.
+    """
+    widths = [max(len(column), *(len(formatValue(row.get(column))) for row in rows)) for column in columns]
+    print('  '.join(column.ljust(width) for column, width in zip(columns, widths)))
+    print('  '.join('-' * width for width in widths))
+    for row in rows:
+        print('  '.join(formatValue(row.get(column)).ljust(width) for column, width in zip(columns, widths)))
+
+
+def formatValue(value):
+    """Formats a table cell."""
+    if isinstance(value, float):
+        return f'{value:.3f}'
+    return '' if value is None else str(value)
+
+
+def saveJSON(results, path):
+    """
+    Writes the results to a JSON file.
+
+    Args:
+        results (dict): The results to store.
+        path (str): The output path.
+    """
+    with open(path, 'w') as output:
+        json.dump(results, output, indent=2)
+    print(f'...Results saved at {path}')
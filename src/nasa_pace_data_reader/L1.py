@@ -2,11 +2,16 @@
 import os
 import datetime
 
-# Third-party imports for handling NetCDF files.
-from netCDF4 import Dataset # type: ignore
+# Local imports for the shared NetCDF handles.
+from .handles import HANDLE_POOL
+from .parallel import BlockReader
 
-# Local imports for custom exceptions.
-from .exceptions import InstrumentMismatchError, VariableNotFoundError, InvalidFileError
+# Local imports for custom exceptions and lazy granule containers.
+from .exceptions import InstrumentMismatchError, VariableNotFoundError, InvalidFileError, EmptySubsetError
+from .granule import Granule, readVariable
+from .subset import Subset, selectNames
+from .batch import readMany
+from .profiling import span, profiled
 
 class L1C:
     """
@@ -145,15 +150,57 @@ class L1C:
             """
             self.var_units[var] = units  
 
-    def read(self, filename):
+    def checkVariables(self, variables, filename):
+        """
+        Checks that the requested variables are known to the reader.
+
+        Args:
+            variables (list): The requested variable names, None for all variables.
+            filename (str): The file being read, used in the error message.
+
+        Raises:
+            VariableNotFoundError: If a requested variable is not a geolocation or observation variable.
+        """
+        unknown = [var for var in variables or [] if var not in self.geoNames + self.obsNames]
+        if unknown:
+            raise VariableNotFoundError(f"Variable(s) {unknown} not available for {self.instrument} in {filename}")
+
+    @profiled('L1C.read')
+    def read(self, filename, lazy=False, variables=None, view_indices=None, wavelength_indices=None,
+             bbox=None, arrays='masked', cache_dir=None, workers=None):
         """
         Reads the data from a specified L1C file.
 
         Args:
             filename (str): The path to the L1C file.
+            lazy (bool, optional): If True, return a Granule backed by the open file where the
+                                   geolocation and observation variables are only decoded when
+                                   indexed. Defaults to False.
+            variables (list, optional): The geolocation and observation variables to read. Latitude and
+                                        longitude are always read. Defaults to all variables.
+            view_indices (list, optional): The view indices to read, the returned views (and the view
+                                           angles, F0 and wavelengths) are renumbered from 0. Defaults to all views.
+            wavelength_indices (list or dict, optional): The band indices to read, or a dict mapping band
+                                                         dimension names to indices. Defaults to all bands.
+            bbox (tuple, optional): (lon_min, lon_max, lat_min, lat_max) in degrees. Only the smallest
+                                    row/column window covering the box is read and its slices are stored
+                                    under '_window'. Use lon_min > lon_max for a box crossing the
+                                    antimeridian. Defaults to the full swath.
+            arrays (str, optional): The array type of the variables: 'masked' for numpy masked arrays,
+                                    'nan' for float32 arrays with NaN at the fill values, 'bitmask' for
+                                    the raw values plus shared packed validity masks under '_masks', or
+                                    'packed' for a PackedArray of the raw integers of variables with a
+                                    scale_factor/add_offset, other variables are read as with 'masked'.
+                                    Defaults to 'masked'.
+            cache_dir (str, optional): A directory caching the decoded variables as uncompressed files, the
+                                       variables are then returned as read-only memory maps and later reads of
+                                       the granule, from any process, skip the decompression. Defaults to None.
+            workers (int, optional): The number of worker processes reading the large variables, and blocks
+                                     of rows of each, concurrently with their own file handles. Ignored when
+                                     lazy. Defaults to None, the variables are read one after the other.
 
         Returns:
-            dict: A dictionary containing the data extracted from the file.
+            dict: A dictionary containing the data extracted from the file (a Granule if lazy).
                   Returns None if the file does not match the instrument.
         """
         
@@ -162,14 +209,19 @@ class L1C:
 
         if not self.checkFile(filename):
             raise InstrumentMismatchError(f'Error: {filename} does not contain {self.instrument} data.')
+        self.checkVariables(variables, filename)
 
-        try:
-            dataNC = Dataset(filename, 'r')
-        except FileNotFoundError:
-            raise InvalidFileError(f"Error: File not found at {filename}")
+        with span('open', file=filename):
+            dataNC = HANDLE_POOL.open(filename)
         
-        data = {}
-
+        data = Granule(dataNC, filename, HANDLE_POOL) if lazy else {}
+        subset = Subset(view_indices, wavelength_indices)
+        masks = {} if arrays == 'bitmask' else None
+        if masks is not None:
+            data['_masks'] = masks
+        blocks = BlockReader(filename, workers) if workers and not lazy else None
+
+        keep_open = False
         try:
 
             # get the date time from the filename
@@ -181,56 +233,98 @@ class L1C:
             geo_data = dataNC.groups['geolocation_data']
             sensor_data = dataNC.groups['sensor_views_bands']
 
+            # Restrict the read to the rows and columns covering the bounding box
+            if bbox is not None:
+                window = subset.clip(geo_data.variables['latitude'], geo_data.variables['longitude'], bbox)
+                if window is None:
+                    raise EmptySubsetError(f'Error: No pixels of {filename} fall inside the bounding box {bbox}')
+                data['_window'] = window
+
             # FIXME: This is just a place holder, needs to be updated
             # Read the time from the L1C file
             
             # Define the variable names
-            geo_names = self.geoNames
+            geo_names = selectNames(self.geoNames, variables)
 
             # Read the variables
             for var in geo_names:
                 if var not in geo_data.variables:
                     raise VariableNotFoundError(f"Variable '{var}' not found in {filename}")
-                data[var] = geo_data.variables[var][:]
+                data[var] = readVariable(geo_data.variables[var], lazy, subset, arrays, masks, cache_dir=cache_dir,
+                                         blocks=blocks)
 
             # Read the data
-            obs_names = self.obsNames
+            obs_names = selectNames(self.obsNames, variables)
 
             data['_units'] = {}
             for var in obs_names:
                 if var not in obs_data.variables:
                     raise VariableNotFoundError(f"Variable '{var}' not found in {filename}")
-                data[var] = obs_data.variables[var][:]
+                data[var] = readVariable(obs_data.variables[var], lazy, subset, arrays, masks, cache_dir=cache_dir,
+                                         blocks=blocks)
 
                 # read the units for the variable
                 data['_units'][var] = obs_data.variables[var].units
                 self.unit(var, obs_data.variables[var].units)
 
             # read the F0 and unit
-            data['F0'] = sensor_data.variables[self.F0Str][:]
+            data['F0'] = readVariable(sensor_data.variables[self.F0Str], subset=subset,
+                                      arrays=arrays, masks=masks, name='F0',
+                                      cache_dir=cache_dir)
             data['_units']['F0'] = sensor_data.variables[self.F0Str].units
-            self.unit(var, obs_data.variables[var].units)
+            self.unit('F0', sensor_data.variables[self.F0Str].units)
 
             # read the band angles and wavelengths
-            data['view_angles'] = sensor_data.variables[self.VAStr][:]
-            data['intensity_wavelength'] = sensor_data.variables[self.wavelengthsStr][:]
+            data['view_angles'] = readVariable(sensor_data.variables[self.VAStr], subset=subset,
+                                               arrays=arrays, masks=masks, name='view_angles',
+                                               cache_dir=cache_dir)
+            data['intensity_wavelength'] = readVariable(sensor_data.variables[self.wavelengthsStr], subset=subset,
+                                                        arrays=arrays, masks=masks, name='intensity_wavelength',
+                                                        cache_dir=cache_dir)
 
             # Polarization based F0 might be needed for SPEXone, since their spectral response is polarization dependent
             if self.instrument == 'SPEXone':
-                data['polarization_wavelength'] = sensor_data.variables[self.PolWav][:]
-                data['polarization_f0'] = sensor_data.variables[self.PolF0][:]
-
-            # close the netCDF file
-            dataNC.close()
-
+                data['polarization_wavelength'] = readVariable(sensor_data.variables[self.PolWav], subset=subset,
+                                                               arrays=arrays, masks=masks, name='polarization_wavelength',
+                                                               cache_dir=cache_dir)
+                data['polarization_f0'] = readVariable(sensor_data.variables[self.PolF0], subset=subset,
+                                                       arrays=arrays, masks=masks, name='polarization_f0',
+                                                       cache_dir=cache_dir)
+
+            # decode the variables read by the workers
+            if blocks is not None:
+                blocks.resolve(data)
+
+            # a lazy granule keeps the file open until closed by the caller
+            keep_open = lazy
             return data
 
         except KeyError as e:
             raise VariableNotFoundError(f"Missing variable in {filename}: {e}")
 
-    
-            # close the netCDF file
-            dataNC.close()
+        finally:
+            # release the file after reading, also when the read failed
+            if blocks is not None:
+                blocks.close()
+            if not keep_open:
+                HANDLE_POOL.release(dataNC)
+
+    def read_many(self, filenames, workers=None, backend='process', ordered=True, **kwargs):
+        """
+        Reads several L1C files concurrently.
+
+        Args:
+            filenames (list): The paths to the L1C files.
+            workers (int, optional): The number of workers. Defaults to the number of CPUs.
+            backend (str, optional): 'process' or 'thread'. Defaults to 'process'.
+            ordered (bool, optional): If True, results are yielded in the order of filenames,
+                                      otherwise as they complete. Defaults to True.
+            **kwargs: Additional keyword arguments for read, e.g. variables or bbox.
+
+        Returns:
+            generator: One batch.ReadResult per file with either the data or the captured error.
+        """
+        return readMany(self, filenames, workers=workers, backend=backend, ordered=ordered, **kwargs)
 
         
 class L1B:
@@ -268,6 +362,21 @@ class L1B:
                 units (str): The unit string.
             """
             self.var_units[var] = units  
+
+    def checkVariables(self, variables, filename):
+        """
+        Checks that the requested variables are known to the reader.
+
+        Args:
+            variables (list): The requested variable names, None for all variables.
+            filename (str): The file being read, used in the error message.
+
+        Raises:
+            VariableNotFoundError: If a requested variable is not a geolocation or observation variable.
+        """
+        unknown = [var for var in variables or [] if var not in self.geoNames + self.obsNames]
+        if unknown:
+            raise VariableNotFoundError(f"Variable(s) {unknown} not available for {self.instrument} in {filename}")
     
     def checkFile(self, filename):
         """
@@ -304,15 +413,35 @@ class L1B:
                 self.wavelengthsStr = 'intensity_wavelength'
         
 
-    def read(self, filename):
+    @profiled('L1B.read')
+    def read(self, filename, lazy=False, variables=None, view_indices=None, wavelength_indices=None,
+             arrays='masked', cache_dir=None, workers=None):
         """
         Reads data from the given L1B file.
 
         Args:
             filename (str): The path to the L1B file.
+            lazy (bool, optional): If True, return a Granule where the geolocation and observation
+                                   variables are only decoded when indexed. Defaults to False.
+            variables (list, optional): The geolocation and observation variables to read. Latitude and
+                                        longitude are always read. Defaults to all variables.
+            view_indices (list, optional): The view indices to read. Defaults to all views.
+            wavelength_indices (list or dict, optional): The band indices to read. Defaults to all bands.
+            arrays (str, optional): The array type of the variables: 'masked' for numpy masked arrays,
+                                    'nan' for float32 arrays with NaN at the fill values, 'bitmask' for
+                                    the raw values plus shared packed validity masks under '_masks', or
+                                    'packed' for a PackedArray of the raw integers of variables with a
+                                    scale_factor/add_offset, other variables are read as with 'masked'.
+                                    Defaults to 'masked'.
+            cache_dir (str, optional): A directory caching the decoded variables as uncompressed files, the
+                                       variables are then returned as read-only memory maps and later reads of
+                                       the granule, from any process, skip the decompression. Defaults to None.
+            workers (int, optional): The number of worker processes reading the large variables, and blocks
+                                     of rows of each, concurrently with their own file handles. Ignored when
+                                     lazy. Defaults to None, the variables are read one after the other.
 
         Returns:
-            dict: A dictionary containing the read data.
+            dict: A dictionary containing the read data (a Granule if lazy).
         """
         
 
@@ -320,14 +449,19 @@ class L1B:
 
         if not self.checkFile(filename):
             raise InstrumentMismatchError(f'Error: {filename} does not contain {self.instrument} data.')
+        self.checkVariables(variables, filename)
 
-        try:
-            dataNC = Dataset(filename, 'r')
-        except FileNotFoundError:
-            raise InvalidFileError(f"Error: File not found at {filename}")
+        with span('open', file=filename):
+            dataNC = HANDLE_POOL.open(filename)
 
-        data = {}
+        data = Granule(dataNC, filename, HANDLE_POOL) if lazy else {}
+        subset = Subset(view_indices, wavelength_indices)
+        masks = {} if arrays == 'bitmask' else None
+        if masks is not None:
+            data['_masks'] = masks
+        blocks = BlockReader(filename, workers) if workers and not lazy else None
 
+        keep_open = False
         try:
 
             # Access the 'observation_data' & 'geolocation_data' group
@@ -339,22 +473,24 @@ class L1B:
             # Read the time from the L1C file
             
             # Define the variable names
-            geo_names = self.geoNames
+            geo_names = selectNames(self.geoNames, variables)
 
             # Read the variables
             for var in geo_names:
                 if var not in geo_data.variables:
                     raise VariableNotFoundError(f"Variable '{var}' not found in {filename}")
-                data[var] = geo_data.variables[var][:]
+                data[var] = readVariable(geo_data.variables[var], lazy, subset, arrays, masks, cache_dir=cache_dir,
+                                         blocks=blocks)
 
             # Read the data
-            obs_names = self.obsNames
+            obs_names = selectNames(self.obsNames, variables)
 
             data['_units'] = {}
             for var in obs_names:
                 if var not in obs_data.variables:
                     raise VariableNotFoundError(f"Variable '{var}' not found in {filename}")
-                data[var] = obs_data.variables[var][:]
+                data[var] = readVariable(obs_data.variables[var], lazy, subset, arrays, masks, cache_dir=cache_dir,
+                                         blocks=blocks)
 
                 # read the units for the variable
                 data['_units'][var] = obs_data.variables[var].units
@@ -366,24 +502,36 @@ class L1B:
             # self.unit(var, obs_data.variables[var].un1its) # FIXME: This is not available in L1B
 
             # read the band angles and wavelengths
-            data['view_angles'] = sensor_data.variables['sensor_view_angle'][:]
-            data['intensity_wavelength'] = sensor_data.variables[self.wavelengthsStr][:]
-            data['F0'] = sensor_data.variables['intensity_f0'][:]
+            data['view_angles'] = readVariable(sensor_data.variables['sensor_view_angle'], subset=subset,
+                                               arrays=arrays, masks=masks, name='view_angles',
+                                               cache_dir=cache_dir)
+            data['intensity_wavelength'] = readVariable(sensor_data.variables[self.wavelengthsStr], subset=subset,
+                                                        arrays=arrays, masks=masks, name='intensity_wavelength',
+                                                        cache_dir=cache_dir)
+            data['F0'] = readVariable(sensor_data.variables['intensity_f0'], subset=subset,
+                                      arrays=arrays, masks=masks, name='F0',
+                                      cache_dir=cache_dir)
 
             # FIXME: Polarization based F0 might be needed for SPEXone, since their spectral response is polarization dependent
 
 
-            # close the netCDF file
-            dataNC.close()
+            # decode the variables read by the workers
+            if blocks is not None:
+                blocks.resolve(data)
 
+            # a lazy granule keeps the file open until closed by the caller
+            keep_open = lazy
             return data
 
         except KeyError as e:
             raise VariableNotFoundError(f"Missing variable in {filename}: {e}")
 
-    
-            # close the netCDF file
-            dataNC.close()
+        finally:
+            # release the file after reading, also when the read failed
+            if blocks is not None:
+                blocks.close()
+            if not keep_open:
+                HANDLE_POOL.release(dataNC)
 class L1beta:
     """
     A class for reading NASA PACE Level 1 beta data files, specifically for the GAPMAP instrument.
@@ -395,26 +543,30 @@ class L1beta:
         self.product = 'L1beta'        # Default product
         
 
-    def read(self, filename):
+    @profiled('L1beta.read')
+    def read(self, filename, arrays='masked', cache_dir=None):
         """
         Reads data from the given L1beta file.
         
         Args:
             filename (str): The path to the L1beta file.
+            arrays (str, optional): The array type of the variables: 'masked' for numpy masked arrays,
+                                    'nan' for float32 arrays with NaN at the fill values, 'bitmask' for
+                                    the raw values plus shared packed validity masks under '_masks', or
+                                    'packed' for a PackedArray of the raw integers of variables with a
+                                    scale_factor/add_offset, other variables are read as with 'masked'.
+                                    Defaults to 'masked'.
+            cache_dir (str, optional): A directory caching the decoded variables as uncompressed files, the
+                                       variables are then returned as read-only memory maps and later reads of
+                                       the granule, from any process, skip the decompression. Defaults to None.
             
         Returns:
             dict: A dictionary containing the read data.
         """
         print(f'Reading {self.instrument} data from {filename}')
 
-        try:
-            dataNC = Dataset(filename, 'r')
-        except FileNotFoundError:
-            raise InvalidFileError(f"Error: File not found at {filename}")
-
-        # define the groups
-        img_data = dataNC.groups['IMAGE_DATA']
-        nav_data = dataNC.groups['NAVIGATION']
+        with span('open', file=filename):
+            dataNC = HANDLE_POOL.open(filename)
 
         # define the variables
         img_data_vars = ['image_0', 'image_45', 'image_90', 'image_135', 'Latitude', 'Longitude', 'Surface_Altitude']
@@ -422,28 +574,33 @@ class L1beta:
 
         # define output dict
         data = {}
+        masks = {} if arrays == 'bitmask' else None
+        if masks is not None:
+            data['_masks'] = masks
 
         try:
 
+            # define the groups
+            img_data = dataNC.groups['IMAGE_DATA']
+            nav_data = dataNC.groups['NAVIGATION']
+
             # load the variables from the group img_data
             for key_ in img_data_vars:
                 if key_ not in img_data.variables:
                     raise VariableNotFoundError(f"Variable '{key_}' not found in {filename}")
-                data[key_] = img_data.variables[key_][:]
+                data[key_] = readVariable(img_data.variables[key_], arrays=arrays, masks=masks, cache_dir=cache_dir)
             
             for key_ in nav_data_vars:
                 if key_ not in nav_data.variables:
                     raise VariableNotFoundError(f"Variable '{key_}' not found in {filename}")
-                data[key_] = nav_data.variables[key_][:]
-
-            # close the netCDF file
-            dataNC.close()
+                data[key_] = readVariable(nav_data.variables[key_], arrays=arrays, masks=masks, cache_dir=cache_dir)
 
         except KeyError as e:
             raise VariableNotFoundError(f"Missing variable in {filename}: {e}")
-    
-            # close the netCDF file
-            dataNC.close()
+
+        finally:
+            # release the file after reading, also when the read failed
+            HANDLE_POOL.release(dataNC)
     
         # return the data
         return data
\ No newline at end of file
@@ -1,22 +1,24 @@
-# Standard library and third-party imports for data handling, plotting, and scientific computation.
+# Standard library and third-party imports for data handling.
 import os
 import datetime
 import numpy as np
-from netCDF4 import Dataset
-from scipy import interpolate
 
-# Matplotlib and related imports for plotting.
-from matplotlib import pyplot as plt
-import matplotlib.ticker as mticker
-from mpl_toolkits.axes_grid1 import make_axes_locatable
-
-# Cartopy imports for geographical plotting.
-import cartopy.crs as ccrs
-import cartopy.feature as cfeature
-from cartopy.mpl.gridliner import LONGITUDE_FORMATTER, LATITUDE_FORMATTER
-
-# Local imports for custom exceptions.
-from .exceptions import InstrumentMismatchError, VariableNotFoundError, InvalidFileError
+# Matplotlib and cartopy are only imported when a variable is plotted, so reading jobs do not pay for them.
+from .lazyimport import LazyModule
+maxes = LazyModule('matplotlib.axes')
+ccrs = LazyModule('cartopy.crs')
+axes_grid1 = LazyModule('mpl_toolkits.axes_grid1')
+
+# Local imports for custom exceptions and lazy granule containers.
+from .exceptions import InstrumentMismatchError, VariableNotFoundError, InvalidFileError, EmptySubsetError
+from .granule import Granule, readVariable
+from .subset import Subset, selectNames
+from .batch import readMany
+from .profiling import span, profiled
+from .handles import HANDLE_POOL
+from .parallel import BlockReader
+from .backgrounds import BACKGROUND_CACHE, drawFeatures
+from .figures import DARK_STYLE, newFigure, showFigure, darkAxes
 
 class L2:
     """
@@ -29,6 +31,7 @@ class L2:
         self.instrument = 'HARP2'   # Default instrument
         self.product = 'GRASP-Anin' # Default product
         self.var_units = {}
+        self.backgroundCache = BACKGROUND_CACHE  # shared cache of rendered map features, None to draw vectors
         self.setInstrument()
 
     def setInstrument(self, instrument=None):
@@ -56,33 +59,65 @@ class L2:
                 
                 self.diagnosticNames = ['chi2', 'n_iter', 'quality_flag']
 
-    def read(self, filename):
+    @profiled('L2.read')
+    def read(self, filename, lazy=False, variables=None, wavelength_indices=None, bbox=None, arrays='masked',
+             cache_dir=None, workers=None):
         """
         Reads data from a specified L2 file.
 
         Args:
             filename (str): The path to the L2 file.
+            lazy (bool, optional): If True, return a Granule backed by the open file where the
+                                   diagnostic, geolocation and geophysical variables are only
+                                   decoded when indexed. Defaults to False.
+            variables (list, optional): The diagnostic and geophysical variables to read, e.g. ['aot', 'chi2'].
+                                        Latitude and longitude are always read. Defaults to all variables.
+            wavelength_indices (list, optional): The wavelength indices to read, the returned wavelengths
+                                                 are renumbered from 0. Defaults to all wavelengths.
+            bbox (tuple, optional): (lon_min, lon_max, lat_min, lat_max) in degrees. Only the smallest
+                                    row/column window covering the box is read and its slices are stored
+                                    under '_window'. Use lon_min > lon_max for a box crossing the
+                                    antimeridian. Defaults to the full swath.
+            arrays (str, optional): The array type of the variables: 'masked' for numpy masked arrays,
+                                    'nan' for float32 arrays with NaN at the fill values, 'bitmask' for
+                                    the raw values plus shared packed validity masks under '_masks', or
+                                    'packed' for a PackedArray of the raw integers of variables with a
+                                    scale_factor/add_offset, other variables are read as with 'masked'.
+                                    Defaults to 'masked'.
+            cache_dir (str, optional): A directory caching the decoded variables as uncompressed files, the
+                                       variables are then returned as read-only memory maps and later reads of
+                                       the granule, from any process, skip the decompression. Defaults to None.
+            workers (int, optional): The number of worker processes reading the large variables, and blocks
+                                     of rows of each, concurrently with their own file handles. Ignored when
+                                     lazy. Defaults to None, the variables are read one after the other.
 
         Returns:
-            dict: A dictionary containing the data from the file.
+            dict: A dictionary containing the data from the file (a Granule if lazy).
         """
         
 
         print(f'Reading {self.instrument}-{self.product} products from {filename}...')
 
-        if not self.checkFile(filename):
-            raise InstrumentMismatchError(f'Error: {filename} does not contain {self.instrument}-{self.product} L2 file.')
+        self.checkVariables(variables, filename)
 
-        try:
-            dataNC = Dataset(filename, 'r')
-        except FileNotFoundError:
-            raise InvalidFileError(f"Error: File not found at {filename}")
+        # The file is opened once, for the product check and the reads.
+        with span('open', file=filename):
+            dataNC = HANDLE_POOL.open(filename)
 
-        data = {}
+        data = Granule(dataNC, filename, HANDLE_POOL) if lazy else {}
         data['_units'] = {}
+        subset = Subset(wavelength_indices=wavelength_indices)
+        masks = {} if arrays == 'bitmask' else None
+        if masks is not None:
+            data['_masks'] = masks
+        blocks = BlockReader(filename, workers) if workers and not lazy else None
 
+        keep_open = False
         try:
 
+            if not self.checkTitle(dataNC):
+                raise InstrumentMismatchError(f'Error: {filename} does not contain {self.instrument}-{self.product} L2 file.')
+
             # HACK: get the date time from the filename 
             data['date_time'] = dataNC.date_created
 
@@ -92,49 +127,84 @@ class L2:
             sensor_data = dataNC.groups['sensor_band_parameters']
             diagnostic_data = dataNC.groups['diagnostic_data']
 
+            # Restrict the read to the rows and columns covering the bounding box
+            if bbox is not None:
+                window = subset.clip(geo_data.variables['latitude'], geo_data.variables['longitude'], bbox)
+                if window is None:
+                    raise EmptySubsetError(f'Error: No pixels of {filename} fall inside the bounding box {bbox}')
+                data['_window'] = window
+
             # Read diagnostic data.
-            for var in self.diagnosticNames:
+            for var in selectNames(self.diagnosticNames, variables):
                 if var not in diagnostic_data.variables:
                     raise VariableNotFoundError(f"Variable '{var}' not found in {filename}")
-                data[var] = diagnostic_data.variables[var][:]
+                data[var] = readVariable(diagnostic_data.variables[var], lazy, subset, arrays, masks, cache_dir=cache_dir,
+                                         blocks=blocks)
 
             # Read geolocation data.
-            geo_names = self.geoNames
+            geo_names = selectNames(self.geoNames, variables)
             for var in geo_names:
                 if var not in geo_data.variables:
                     raise VariableNotFoundError(f"Variable '{var}' not found in {filename}")
-                data[var] = geo_data.variables[var][:]
+                data[var] = readVariable(geo_data.variables[var], lazy, subset, arrays, masks, cache_dir=cache_dir,
+                                         blocks=blocks)
 
             # Read geophysical data.
-            geophysical_names = self.geophysicalNames
+            geophysical_names = selectNames(self.geophysicalNames, variables)
             data['_units'] = {}
             for var in geophysical_names:
                 if var not in geophysical_data.variables:
                     raise VariableNotFoundError(f"Variable '{var}' not found in {filename}")
-                data[var] = geophysical_data.variables[var][:]
+                data[var] = readVariable(geophysical_data.variables[var], lazy, subset, arrays, masks, cache_dir=cache_dir,
+                                         blocks=blocks)
                 # Store the units for each variable.
                 data['_units'][var] = geophysical_data.variables[var].units
                 self.unit(var, geophysical_data.variables[var].units)
 
             # Read sensor band parameters.
-            data['wavelengths'] = sensor_data.variables['wavelength'][:]
+            data['wavelengths'] = readVariable(sensor_data.variables['wavelength'], subset=subset,
+                                               arrays=arrays, masks=masks, name='wavelengths',
+                                               cache_dir=cache_dir)
             data['_units']['wavelengths'] = sensor_data.variables['wavelength'].units
-            self.unit(var, geophysical_data.variables[var].units)
-
-            # Close the NetCDF file.
-            dataNC.close()
+            self.unit('wavelengths', sensor_data.variables['wavelength'].units)
 
             # Store the data dictionary in the class instance.
             self.l2_dict = data
 
+            # decode the variables read by the workers
+            if blocks is not None:
+                blocks.resolve(data)
+
+            # A lazy granule keeps the file open until closed by the caller.
+            keep_open = lazy
             return data
 
         except KeyError as e:
             raise VariableNotFoundError(f"Missing variable in {filename}: {e}")
 
-    
-            # close the netCDF file
-            dataNC.close()
+        finally:
+            # Release the file after reading, also when the read failed.
+            if blocks is not None:
+                blocks.close()
+            if not keep_open:
+                HANDLE_POOL.release(dataNC)
+
+    def read_many(self, filenames, workers=None, backend='process', ordered=True, **kwargs):
+        """
+        Reads several L2 files concurrently.
+
+        Args:
+            filenames (list): The paths to the L2 files.
+            workers (int, optional): The number of workers. Defaults to the number of CPUs.
+            backend (str, optional): 'process' or 'thread'. Defaults to 'process'.
+            ordered (bool, optional): If True, results are yielded in the order of filenames,
+                                      otherwise as they complete. Defaults to True.
+            **kwargs: Additional keyword arguments for read, e.g. variables or bbox.
+
+        Returns:
+            generator: One batch.ReadResult per file with either the data or the captured error.
+        """
+        return readMany(self, filenames, workers=workers, backend=backend, ordered=ordered, **kwargs)
 
     def unit(self, var, units):
             """
@@ -145,6 +215,22 @@ class L2:
                 units (str): The unit string.
             """
             self.var_units[var] = units 
+
+    def checkVariables(self, variables, filename):
+        """
+        Checks that the requested variables are known to the reader.
+
+        Args:
+            variables (list): The requested variable names, None for all variables.
+            filename (str): The file being read, used in the error message.
+
+        Raises:
+            VariableNotFoundError: If a requested variable is not a geolocation, geophysical or diagnostic variable.
+        """
+        known = self.geoNames + self.geophysicalNames + self.diagnosticNames
+        unknown = [var for var in variables or [] if var not in known]
+        if unknown:
+            raise VariableNotFoundError(f"Variable(s) {unknown} not available for {self.l2product} in {filename}")
     
     def checkFile(self, filename):
         """
@@ -157,29 +243,34 @@ class L2:
             bool: True if the file is a valid L2 file, False otherwise.
         """
         try:
-            dataNC = Dataset(filename, 'r')
-            # Check for the presence and correctness of the 'title' attribute.
-            if 'title' not in dataNC.ncattrs():
-                dataNC.close()
-                return False
-            else:
-                if dataNC.title != 'PACE HARP2 Level-2 data':
-                    dataNC.close()
-                    return False
-            dataNC.close()
-            return True
+            with HANDLE_POOL.dataset(filename) as dataNC:
+                return self.checkTitle(dataNC)
         except:
             return False
+
+    def checkTitle(self, dataNC):
+        """
+        Checks if an open file is a valid L2 file for the specified product.
+
+        Args:
+            dataNC (netCDF4.Dataset): The open file.
+
+        Returns:
+            bool: True if the 'title' attribute matches the product, False otherwise.
+        """
+        # Check for the presence and correctness of the 'title' attribute.
+        return 'title' in dataNC.ncattrs() and dataNC.title == 'PACE HARP2 Level-2 data'
     
 
     # Plotting functions
+    @profiled('L2.projectVar')
     def projectVar(self, var, wavelength=None,
                    proj='PlateCarree', dpi=300,
                    noAxisTicks=False,
                    black_background=False, ax=None, fig=None,
                    chi2Mask=None, saveFig=False, rgb_extent=None,
                    horizontalColorbar=False, limitTriangle= [0, 0],
-                   savePath=None, aod_mask=None,
+                   savePath=None, aod_mask=None, noShow=False,
                 **kwargs):
         """
         Plots a specified variable on a geographical projection.
@@ -198,12 +289,13 @@ class L2:
             rgb_extent (list, optional): The extent of the plot. Defaults to None.
             horizontalColorbar (bool, optional): If True, a horizontal colorbar is used. Defaults to False.
             limitTriangle (list, optional): Specifies if triangles should be added to the colorbar limits. Defaults to [0, 0].
+            noShow (bool, optional): If True, the figure is built outside pyplot and not displayed. Defaults to False.
             **kwargs: Additional keyword arguments for the plotting function.
         """
         assert proj in ['PlateCarree', 'Orthographic'], 'Error: Invalid projection.'
         
-        lat = self.l2_dict['latitude']
-        lon = self.l2_dict['longitude']
+        lat = self.l2_dict['latitude'][:]
+        lon = self.l2_dict['longitude'][:]
 
         # Set the wavelength for the plot.
         if wavelength is None:
@@ -224,18 +316,13 @@ class L2:
 
         # Create the plot figure and axes.
         if ax is None:
-            fig = plt.figure(figsize=(3, 3), dpi=dpi)
+            fig = newFigure(figsize=(3, 3), dpi=dpi, show=not noShow)
             ax = fig.add_subplot(1, 1, 1, projection=ccrs.PlateCarree())
+        elif fig is None:
+            fig = ax.figure
         if black_background:
-            # Configure plot for a black background.
-            fig.patch.set_facecolor('black')
-            plt.rcParams['text.color'] = 'tan'
-            plt.rcParams['axes.labelcolor'] = 'grey'
-            plt.rcParams['xtick.color'] = 'tan'
-            plt.rcParams['ytick.color'] = 'tan'
-            plt.rcParams['axes.titlecolor'] = 'white'
-            plt.rcParams['axes.edgecolor'] = 'tan'
-            plt.rcParams['axes.facecolor'] = 'tan'
+            # Configure plot for a black background, the axes are coloured once they are drawn up.
+            fig.patch.set_facecolor(DARK_STYLE['figure'])
 
         if var in ['chi2', 'n_iter', 'quality_flag',
                     'reff_coarse', 'reff_fine', 'vd',
@@ -243,13 +330,6 @@ class L2:
             ax.set_title(f'{var}')
         else:
             ax.set_title(f'{var} at {wavelength} nm')
-        ax.coastlines()
-        # Add geographical features to the plot.
-        ax.add_feature(cfeature.LAND, alpha=0.5)
-        ax.add_feature(cfeature.OCEAN, alpha=0.5)
-        ax.add_feature(cfeature.LAKES, alpha=0.1)
-        ax.add_feature(cfeature.RIVERS, alpha=0.1)
-
         # Plot the data.
         if chi2Mask is not None:
             data = np.ma.masked_where(chi2Mask, data)
@@ -262,13 +342,19 @@ class L2:
             im = ax.imshow(data, origin='lower', extent=rgb_extent, transform=ccrs.PlateCarree(), **kwargs)
         else:
             im = ax.pcolormesh(lon, lat, data, transform=ccrs.PlateCarree(), **kwargs)
+
+        # Add geographical features to the plot, once the extent of the data is set.
+        with span('features'):
+            drawFeatures(ax, [('land', {'alpha': 0.5}), ('ocean', {'alpha': 0.5})], self.backgroundCache)
+            drawFeatures(ax, ['coastline', ('lakes', {'alpha': 0.1}), ('rivers', {'alpha': 0.1})],
+                         self.backgroundCache)
         
         # Add a colorbar.
-        divider = make_axes_locatable(ax)
+        divider = axes_grid1.make_axes_locatable(ax)
         if horizontalColorbar:
-            ax_cb = divider.new_vertical(size="5%", pad=0.65, axes_class=plt.Axes)
+            ax_cb = divider.new_vertical(size="5%", pad=0.65, axes_class=maxes.Axes)
         else:
-            ax_cb = divider.new_horizontal(size="5%", pad=0.1, axes_class=plt.Axes)
+            ax_cb = divider.new_horizontal(size="5%", pad=0.1, axes_class=maxes.Axes)
 
         fig.add_axes(ax_cb)
 
@@ -278,49 +364,47 @@ class L2:
             if 'vmax' in kwargs or 'vmin' in kwargs:
                 if 'vmax' in kwargs and 'vmin' in kwargs:
                     if limitTriangle[0] and limitTriangle[1]:
-                        plt.colorbar(im, cax=ax_cb, orientation=orientation, extend='both')
+                        fig.colorbar(im, cax=ax_cb, orientation=orientation, extend='both')
                     elif limitTriangle[0]:
-                        plt.colorbar(im, cax=ax_cb, orientation=orientation, extend='min')
+                        fig.colorbar(im, cax=ax_cb, orientation=orientation, extend='min')
                     elif limitTriangle[1]:
-                        plt.colorbar(im, cax=ax_cb, orientation=orientation, extend='max')
+                        fig.colorbar(im, cax=ax_cb, orientation=orientation, extend='max')
             else:
-                plt.colorbar(im, cax=ax_cb, orientation=orientation)
+                fig.colorbar(im, cax=ax_cb, orientation=orientation)
         else:
             if 'vmax' in kwargs or 'vmin' in kwargs:
                 if limitTriangle[0] and limitTriangle[1]:
-                    plt.colorbar(im, cax=ax_cb, orientation=orientation, extend='both')
+                    fig.colorbar(im, cax=ax_cb, orientation=orientation, extend='both')
                 elif limitTriangle[0]:
-                    plt.colorbar(im, cax=ax_cb, orientation=orientation, extend='min')
+                    fig.colorbar(im, cax=ax_cb, orientation=orientation, extend='min')
                 elif limitTriangle[1]:
-                    plt.colorbar(im, cax=ax_cb, orientation=orientation, extend='max')
+                    fig.colorbar(im, cax=ax_cb, orientation=orientation, extend='max')
             else:
-                plt.colorbar(im, cax=ax_cb)
+                fig.colorbar(im, cax=ax_cb)
 
         # Set the colorbar label.
         if var not in ['chi2', 'n_iter', 'quality_flag']:
-            plt.colorbar(im, cax=ax_cb, orientation=orientation).set_label(self.var_units[var])
+            fig.colorbar(im, cax=ax_cb, orientation=orientation).set_label(self.var_units[var])
 
         if black_background:
-            # Reset plot parameters to default.
-            plt.rcParams['text.color'] = 'black'
-            plt.rcParams['axes.labelcolor'] = 'black'
-            plt.rcParams['xtick.color'] = 'black'
-            plt.rcParams['ytick.color'] = 'black'
-            plt.rcParams['axes.titlecolor'] = 'black'
-            plt.rcParams['axes.edgecolor'] = 'black'
-            plt.rcParams['axes.facecolor'] = 'white'
+            # Colour the map title and the colorbar for the black background.
+            darkAxes(ax, face=False)
+            darkAxes(ax_cb)
 
         # Save the figure if requested.
         if saveFig:
             if savePath is None:
-                fig.savefig(f'{var}_wavelength_{wavelength}_nm.png', dpi=dpi, transparent=True)
+                with span('savefig'):
+                    fig.savefig(f'{var}_wavelength_{wavelength}_nm.png', dpi=dpi, transparent=True)
             else:
                 # make sure the path exists
                 if not os.path.exists(savePath):
                     os.makedirs(savePath)
                 full_path = os.path.join(savePath, f'{var}_wavelength_{wavelength}_nm.png')
-                fig.savefig(full_path, dpi=dpi, transparent=True)
+                with span('savefig'):
+                    fig.savefig(full_path, dpi=dpi, transparent=True)
         
-        plt.show()
+        if not noShow:
+            showFigure(fig)
 
 
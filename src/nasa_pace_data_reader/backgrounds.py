@@ -0,0 +1,379 @@
+"""
+Cached map backgrounds for the NASA PACE Data Reader library.
+
+Adding ``cfeature.COASTLINE``, ``LAND``, ``OCEAN``, ``stock_img()`` and friends to a map makes
+cartopy clip and re-project the Natural Earth geometries on every draw. The plotting methods
+instead draw their map features through :func:`drawFeatures`, which renders them once per
+projection, extent, size and feature set into an RGBA raster and places that raster on the
+axes. Features drawn under the data (stock image, land, ocean) and over it (coastlines, lakes,
+rivers, borders) are separate layers, and the layers are reused across granules and panels::
+
+    from nasa_pace_data_reader import backgrounds
+    backgrounds.setCacheDir('/scratch/pace-backgrounds')   # also keep the layers on disk
+    backgrounds.setOffline('/data/natural_earth')          # never download Natural Earth data
+
+In offline mode the Natural Earth shapefiles are only looked up locally, in cartopy's data
+directory or the given one, and features without local data are left out with a message.
+Setting a plot's ``backgroundCache`` to None draws the features as vectors again.
+"""
+
+# Standard library imports for the cache keys and files.
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Third-party imports for array handling.
+import numpy as np
+
+# Cartopy and matplotlib are only imported when a background is drawn.
+from .lazyimport import LazyModule
+cartopy = LazyModule('cartopy')
+cartopy_io = LazyModule('cartopy.io')
+ccrs = LazyModule('cartopy.crs')
+cfeature = LazyModule('cartopy.feature')
+shapereader = LazyModule('cartopy.io.shapereader')
+mfigure = LazyModule('matplotlib.figure')
+backend_agg = LazyModule('matplotlib.backends.backend_agg')
+
+# Local imports for the opt-in profiling spans.
+from .profiling import span
+
+# The Natural Earth features by name: (category, Natural Earth name, default style).
+NATURAL_EARTH = {
+    'land': ('physical', 'land', {'edgecolor': 'none', 'facecolor': (0.9375, 0.9375, 0.859375)}),
+    'ocean': ('physical', 'ocean', {'edgecolor': 'none', 'facecolor': (0.59375, 0.71484375, 0.8828125)}),
+    'lakes': ('physical', 'lakes', {'edgecolor': 'none', 'facecolor': (0.59375, 0.71484375, 0.8828125)}),
+    'rivers': ('physical', 'rivers_lake_centerlines', {'edgecolor': (0.59375, 0.71484375, 0.8828125),
+                                                       'facecolor': 'none'}),
+    'coastline': ('physical', 'coastline', {'edgecolor': 'black', 'facecolor': 'none'}),
+    'borders': ('cultural', 'admin_0_boundary_lines_land', {'edgecolor': 'black', 'facecolor': 'none'}),
+}
+
+# The background images by name, as passed to GeoAxes.background_img. 'stock' is cartopy's bundled image.
+IMAGES = {'bluemarble': 'BlueMarble', 'relief': 'NaturalEarthRelief'}
+
+# The features drawn under the data, all others are drawn over it.
+UNDERLAYS = ['stock', 'bluemarble', 'relief', 'land', 'ocean']
+
+# The Natural Earth resolutions, coarsest first.
+RESOLUTIONS = ['110m', '50m', '10m']
+
+# If True, Natural Earth data is never downloaded.
+OFFLINE = False
+
+# The geometries loaded so far, by shapefile path.
+_geometries = {}
+
+
+def setOffline(data_dir=None, offline=True):
+    """
+    Restricts the map features to locally available Natural Earth data.
+
+    Args:
+        data_dir (str, optional): A directory holding the shapefiles in cartopy's layout,
+                                  shapefiles/natural_earth/<category>/ne_<resolution>_<name>.shp.
+                                  Defaults to None, only cartopy's data directory is used.
+        offline (bool, optional): False to allow downloads again. Defaults to True.
+    """
+    global OFFLINE
+    OFFLINE = offline
+    if data_dir is not None:
+        cartopy.config['pre_existing_data_dir'] = data_dir
+
+
+def localNaturalEarth(resolution, category, name):
+    """
+    Finds a Natural Earth shapefile on disk.
+
+    Args:
+        resolution (str): '110m', '50m' or '10m'.
+        category (str): 'physical' or 'cultural'.
+        name (str): The Natural Earth name, e.g. 'coastline'.
+
+    Returns:
+        str: The path to the shapefile, None if it is not available locally.
+    """
+    downloader = cartopy_io.Downloader.from_config(('shapefiles', 'natural_earth', resolution, category, name))
+    format_dict = {'config': cartopy.config, 'category': category, 'name': name, 'resolution': resolution}
+    for path in [downloader.pre_downloaded_path(format_dict), downloader.target_path(format_dict)]:
+        if path is not None and path.exists():
+            return str(path)
+    return None
+
+
+def naturalEarth(resolution, category, name):
+    """
+    Returns the path to a Natural Earth shapefile, downloading it unless in offline mode.
+
+    In offline mode another locally available resolution is used if the requested one is missing.
+
+    Args:
+        resolution (str): '110m', '50m' or '10m'.
+        category (str): 'physical' or 'cultural'.
+        name (str): The Natural Earth name, e.g. 'coastline'.
+
+    Returns:
+        str: The path to the shapefile.
+
+    Raises:
+        FileNotFoundError: In offline mode, if no resolution of the data is available locally.
+    """
+    if not OFFLINE:
+        return str(shapereader.natural_earth(resolution=resolution, category=category, name=name))
+    candidates = [resolution] + [other for other in RESOLUTIONS if other != resolution]
+    for candidate in candidates:
+        path = localNaturalEarth(candidate, category, name)
+        if path is not None:
+            return path
+    raise FileNotFoundError(f'Error: Natural Earth {category}/{name} is not available offline')
+
+
+def geometries(path):
+    """Returns the geometries of a shapefile, read once."""
+    if path not in _geometries:
+        _geometries[path] = tuple(shapereader.Reader(path).geometries())
+    return _geometries[path]
+
+
+def normalizeFeatures(features):
+    """
+    Converts a feature list to a hashable tuple.
+
+    Args:
+        features (list): Feature names, or (name, style) pairs where style holds matplotlib
+                         keyword arguments such as edgecolor, linewidth or alpha.
+
+    Returns:
+        tuple: ((name, ((key, value), ...)), ...)
+    """
+    normalized = []
+    for feature in features:
+        name, style = (feature, {}) if isinstance(feature, str) else feature
+        name = name.lower()
+        assert name in NATURAL_EARTH or name in IMAGES or name == 'stock', f'Error: unknown map feature {name}'
+        normalized.append((name, tuple(sorted((key, repr(value) if isinstance(value, (list, np.ndarray)) else value)
+                                              for key, value in dict(style).items()))))
+    return tuple(normalized)
+
+
+def addFeature(ax, name, style, resolution='110m', zorder=None):
+    """
+    Draws one feature on map axes as vectors.
+
+    Args:
+        ax (cartopy.mpl.geoaxes.GeoAxes): The map axes.
+        name (str): The feature name, see NATURAL_EARTH and IMAGES, or 'stock'.
+        style (dict): Matplotlib keyword arguments overriding the default style.
+        resolution (str, optional): The Natural Earth resolution. Defaults to '110m'.
+        zorder (float, optional): The drawing order. Defaults to None.
+
+    Returns:
+        bool: True if the feature was drawn, False if its data is not available.
+    """
+    extra = {} if zorder is None else {'zorder': zorder}
+    try:
+        if name == 'stock':
+            ax.stock_img(**extra)
+        elif name in IMAGES:
+            ax.background_img(name=IMAGES[name], resolution='high', **extra)
+        else:
+            category, ne_name, default = NATURAL_EARTH[name]
+            path = naturalEarth(resolution, category, ne_name)
+            ax.add_feature(cfeature.ShapelyFeature(geometries(path), ccrs.PlateCarree(), **{**default, **style}),
+                           **extra)
+    except Exception as e:
+        print(f'...Map feature {name} is not available: {e}')
+        return False
+    return True
+
+
+class BackgroundCache:
+    """
+    A least-recently-used cache of map feature layers rendered as RGBA rasters.
+    """
+
+    def __init__(self, maxsize=32, cache_dir=None):
+        """
+        Initializes the cache.
+
+        Args:
+            maxsize (int, optional): The number of layers kept in memory. Defaults to 32.
+            cache_dir (str, optional): A directory where the layers are also stored as .npy files,
+                                       shared by later sessions. Defaults to None.
+        """
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._layers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._layers)
+
+    def __repr__(self):
+        return f'<BackgroundCache {len(self)} layers, {self.hits} hits, {self.misses} misses>'
+
+    @staticmethod
+    def key(projection, extent, size, features, resolution='110m'):
+        """
+        Builds the cache key of a layer.
+
+        Returns:
+            str: A digest of the projection, extent, pixel size, features and resolution.
+        """
+        parts = (projection.proj4_init, tuple(round(float(e), 6) for e in extent), tuple(int(s) for s in size),
+                 normalizeFeatures(features), resolution, OFFLINE)
+        return hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+
+    def layer(self, projection, extent, size, features, resolution='110m'):
+        """
+        Returns a rendered layer, rendering it on the first request.
+
+        Args:
+            projection (cartopy.crs.Projection): The map projection.
+            extent (list): [x_min, x_max, y_min, y_max] in projection coordinates.
+            size (tuple): The (width, height) of the raster in pixels.
+            features (list): The features of the layer, see normalizeFeatures.
+            resolution (str, optional): The Natural Earth resolution. Defaults to '110m'.
+
+        Returns:
+            np.ndarray: Read-only uint8 array of shape (height, width, 4), the first row at the top.
+        """
+        key = self.key(projection, extent, size, features, resolution)
+        with self._lock:
+            layer = self._layers.get(key)
+            if layer is not None:
+                self._layers.move_to_end(key)
+                self.hits += 1
+                return layer
+
+        # rendered outside the lock, two threads may render the same layer once each
+        path = os.path.join(self.cache_dir, f'{key}.npy') if self.cache_dir is not None else None
+        if path is not None and os.path.exists(path):
+            layer = np.load(path)
+            hit = True
+        else:
+            hit = False
+            layer = renderLayer(projection, extent, size, features, resolution)
+            if path is not None:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp.npy'
+                np.save(temporary, layer)
+                os.replace(temporary, path)
+
+        layer.flags.writeable = False
+        with self._lock:
+            self.hits += hit
+            self.misses += not hit
+            self._layers[key] = layer
+            while len(self._layers) > self.maxsize:
+                self._layers.popitem(last=False)
+        return layer
+
+    def clear(self):
+        """Drops the layers held in memory."""
+        with self._lock:
+            self._layers.clear()
+
+
+def renderLayer(projection, extent, size, features, resolution='110m'):
+    """
+    Renders map features into an RGBA raster with an off-screen figure.
+
+    Args:
+        projection (cartopy.crs.Projection): The map projection.
+        extent (list): [x_min, x_max, y_min, y_max] in projection coordinates.
+        size (tuple): The (width, height) of the raster in pixels.
+        features (list): The features, see normalizeFeatures.
+        resolution (str, optional): The Natural Earth resolution. Defaults to '110m'.
+
+    Returns:
+        np.ndarray: uint8 array of shape (height, width, 4), transparent where no feature is drawn.
+    """
+    width, height = (int(s) for s in size)
+    with span('background', features=len(features)):
+        fig = mfigure.Figure(figsize=(width/100, height/100), dpi=100)
+        canvas = backend_agg.FigureCanvasAgg(fig)
+        fig.patch.set_alpha(0)
+        ax = fig.add_axes([0, 0, 1, 1], projection=projection)
+        ax.set_axis_off()
+        ax.patch.set_alpha(0)
+        # fill the whole raster with the extent, it is placed on an axes box of the same shape
+        ax.set_aspect('auto')
+        for name, style in normalizeFeatures(features):
+            addFeature(ax, name, dict(style), resolution)
+        # limits in projection coordinates, set_extent fails on the corners of global views
+        ax.set_xlim(extent[:2])
+        ax.set_ylim(extent[2:])
+        canvas.draw()
+        return np.array(canvas.buffer_rgba())
+
+
+def drawFeatures(ax, features, cache=None, extent=None, resolution='110m', zorder=None, image=None):
+    """
+    Draws map features on map axes, as a cached raster layer when a cache is given.
+
+    Call it after the data is plotted, so the extent of the axes is known.
+
+    Args:
+        ax (cartopy.mpl.geoaxes.GeoAxes): The map axes.
+        features (list): Feature names or (name, style) pairs, see normalizeFeatures.
+        cache (BackgroundCache, optional): The layer cache, None to draw the features as vectors.
+                                           Defaults to None.
+        extent (list, optional): [x_min, x_max, y_min, y_max] in the projection of the axes.
+                                 Defaults to the current extent of the axes.
+        resolution (str, optional): The Natural Earth resolution. Defaults to '110m'.
+        zorder (float, optional): The drawing order. Defaults to -1 for layers made only of
+                                  UNDERLAYS and 2 otherwise.
+        image (matplotlib.image.AxesImage, optional): A layer returned by an earlier call, updated
+                                                      in place for the new extent. Defaults to None.
+
+    Returns:
+        matplotlib.image.AxesImage: The layer, None if the features are drawn as vectors.
+    """
+    features = normalizeFeatures(features)
+    if not features:
+        return None
+    if zorder is None:
+        zorder = -1 if all(name in UNDERLAYS for name, _ in features) else 2
+
+    if cache is None:
+        for name, style in features:
+            addFeature(ax, name, dict(style), resolution, zorder)
+        return None
+
+    extent = list(ax.get_extent(crs=ax.projection)) if extent is None else list(extent)
+    ax.apply_aspect()
+    window = ax.get_window_extent()
+    size = (max(int(round(window.width)), 1), max(int(round(window.height)), 1))
+    layer = cache.layer(ax.projection, extent, size, features, resolution)
+    if image is not None:
+        image.set_data(layer)
+        image.set_extent(extent)
+    else:
+        image = ax.imshow(layer, origin='upper', extent=extent, transform=ax.projection, zorder=zorder,
+                          interpolation='nearest')
+    # imshow resets the limits to the image, keep the view of the data
+    ax.set_xlim(extent[:2])
+    ax.set_ylim(extent[2:])
+    return image
+
+
+# The cache used by the plotting methods.
+BACKGROUND_CACHE = BackgroundCache()
+
+
+def setCacheDir(cache_dir):
+    """
+    Also stores the rendered layers of BACKGROUND_CACHE as files in a directory.
+
+    Args:
+        cache_dir (str): The directory, None to keep the layers only in memory.
+
+    Returns:
+        BackgroundCache: The cache used by the plotting methods.
+    """
+    BACKGROUND_CACHE.cache_dir = cache_dir
+    return BACKGROUND_CACHE
@@ -0,0 +1,213 @@
+"""
+Multi-granule reading helpers for the NASA PACE Data Reader library.
+
+:func:`readMany` reads a list of granules concurrently with a thread or process pool and
+yields one :class:`ReadResult` per file, so one corrupt file does not abort a batch.
+:func:`iter_granules` streams granules in order while decoding the next few in the
+background, which overlaps reading with the caller's regridding and plotting.
+"""
+
+# Standard library imports for concurrency and error reporting.
+import os
+import threading
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import nullcontext
+
+# The netCDF-C/HDF5 libraries are not thread-safe, so threads must not call into them concurrently
+NETCDF_LOCK = threading.RLock()
+
+
+class ReadResult:
+    """
+    The outcome of reading a single granule.
+
+    Attributes:
+        path (str): The path to the granule.
+        data (dict): The data returned by the reader, None if the read failed.
+        error (Exception): The exception raised by the reader, None if the read succeeded.
+        traceback (str): The formatted traceback of the error, None if the read succeeded.
+    """
+
+    def __init__(self, path, data=None, error=None, traceback=None):
+        self.path = path
+        self.data = data
+        self.error = error
+        self.traceback = traceback
+
+    @property
+    def ok(self):
+        """bool: True if the granule was read without error."""
+        return self.error is None
+
+    def __repr__(self):
+        status = 'ok' if self.ok else f'failed: {self.error!r}'
+        return f'<ReadResult {self.path} ({status})>'
+
+
+def readOne(reader, path, kwargs, lock=None):
+    """
+    Reads one granule and captures any error instead of raising it.
+
+    Args:
+        reader: A reader instance such as L1.L1C() or L2.L2().
+        path (str): The path to the granule.
+        kwargs (dict): Keyword arguments passed on to reader.read.
+        lock (threading.RLock, optional): A lock held while reading, used by the thread backend. Defaults to None.
+
+    Returns:
+        ReadResult: The data or the captured error.
+    """
+    try:
+        with lock or nullcontext():
+            return ReadResult(path, data=reader.read(path, **kwargs))
+    except Exception as e:
+        return ReadResult(path, error=e, traceback=traceback.format_exc())
+
+
+def readMany(reader, paths, workers=None, backend='process', ordered=True, **kwargs):
+    """
+    Reads several granules concurrently.
+
+    Args:
+        reader: A reader instance such as L1.L1C() or L2.L2().
+        paths (list): The paths to the granules.
+        workers (int, optional): The number of workers. Defaults to the number of CPUs.
+        backend (str, optional): 'process' or 'thread'. The netCDF library is not thread-safe, so the
+                                 thread backend reads one file at a time while the caller keeps working.
+                                 Only the process backend decodes in parallel. Defaults to 'process'.
+        ordered (bool, optional): If True, results are yielded in the order of paths, otherwise
+                                  in the order they complete. Defaults to True.
+        **kwargs: Additional keyword arguments for reader.read, e.g. variables or bbox.
+
+    Yields:
+        ReadResult: One result per path.
+    """
+    assert backend in ['process', 'thread'], 'Error: backend must be "process" or "thread"'
+    if kwargs.get('lazy'):
+        raise ValueError('Error: lazy granules hold an open file and cannot be read in the background')
+
+    paths = [str(path) for path in paths]
+    workers = os.cpu_count() if workers is None else workers
+    executor_class = ProcessPoolExecutor if backend == 'process' else ThreadPoolExecutor
+    lock = NETCDF_LOCK if backend == 'thread' else None
+    return iterResults(executor_class(max_workers=workers), reader, paths, ordered, kwargs, lock, window=workers)
+
+
+def iterResults(executor, reader, paths, ordered, kwargs, lock=None, window=1):
+    """
+    Keeps a window of reads in flight and yields the results as they become available.
+
+    At most ``window`` granules are being read or waiting for the caller, so the results of a
+    long list do not pile up in memory. Closing the iterator early cancels the queued reads.
+
+    Args:
+        executor (concurrent.futures.Executor): The pool to read with, shut down when done.
+        reader: A reader instance such as L1.L1C() or L2.L2().
+        paths (list): The paths to the granules.
+        ordered (bool): If True, results are yielded in the order of paths.
+        kwargs (dict): Keyword arguments passed on to reader.read.
+        lock (threading.RLock, optional): The lock serialising netCDF calls of the thread backend.
+        window (int, optional): The number of reads in flight. Defaults to 1.
+
+    Yields:
+        ReadResult: One result per path.
+    """
+    def result(path, future):
+        try:
+            return future.result()
+        except Exception as e:
+            # the worker itself failed, e.g. a crashed process or an unpicklable result
+            return ReadResult(path, error=e, traceback=traceback.format_exc())
+
+    window = max(window, 1)
+    queued = iter(paths)
+    pending = {}
+    try:
+        for path in queued:
+            pending[executor.submit(readOne, reader, path, kwargs, lock)] = path
+            if len(pending) == window:
+                break
+        while pending:
+            if ordered:
+                done = [next(iter(pending))]
+                wait(done)
+            else:
+                done = wait(pending, return_when=FIRST_COMPLETED).done
+            for future in done:
+                path = pending.pop(future)
+                # top up the window before handing the result to the caller
+                for next_path in queued:
+                    pending[executor.submit(readOne, reader, next_path, kwargs, lock)] = next_path
+                    break
+                yield result(path, future)
+        # all reads are done, wait for the workers so a caller that exits right away does not race them
+        executor.shutdown(wait=True)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_granules(paths, reader, prefetch=2, backend='process', **kwargs):
+    """
+    Iterates over granules in order, decoding the next ones in the background.
+
+    At most ``prefetch`` granules are being read or waiting in memory while the caller
+    works on the current one, which bounds the memory use of long orbit sequences.
+
+    Args:
+        paths (list): The paths to the granules.
+        reader: A reader instance such as L1.L1C() or L2.L2().
+        prefetch (int, optional): The number of granules decoded ahead of the caller. Defaults to 2.
+        backend (str, optional): 'process' or 'thread'. Defaults to 'process'.
+        **kwargs: Additional keyword arguments for reader.read, e.g. variables or bbox.
+
+    Yields:
+        ReadResult: One result per path, in the order of paths.
+    """
+    assert backend in ['process', 'thread'], 'Error: backend must be "process" or "thread"'
+    assert prefetch >= 1, 'Error: prefetch must be at least 1'
+    if kwargs.get('lazy'):
+        raise ValueError('Error: lazy granules hold an open file and cannot be read in the background')
+
+    paths = [str(path) for path in paths]
+    executor_class = ProcessPoolExecutor if backend == 'process' else ThreadPoolExecutor
+    lock = NETCDF_LOCK if backend == 'thread' else None
+    return iterPrefetched(executor_class(max_workers=prefetch), reader, paths, prefetch, kwargs, lock)
+
+
+def iterPrefetched(executor, reader, paths, prefetch, kwargs, lock=None):
+    """
+    Keeps a sliding window of ``prefetch`` reads in flight and yields them in order.
+
+    Args:
+        executor (concurrent.futures.Executor): The pool to read with, shut down when done.
+        reader: A reader instance such as L1.L1C() or L2.L2().
+        paths (list): The paths to the granules.
+        prefetch (int): The size of the window.
+        kwargs (dict): Keyword arguments passed on to reader.read.
+        lock (threading.RLock, optional): The lock serialising netCDF calls of the thread backend.
+
+    Yields:
+        ReadResult: One result per path, in the order of paths.
+    """
+    pending = deque()
+    queued = iter(paths)
+    try:
+        for path in queued:
+            pending.append((path, executor.submit(readOne, reader, path, kwargs, lock)))
+            if len(pending) == prefetch:
+                break
+        while pending:
+            path, future = pending.popleft()
+            # top up the window before handing the current granule to the caller
+            for next_path in queued:
+                pending.append((next_path, executor.submit(readOne, reader, next_path, kwargs, lock)))
+                break
+            try:
+                result = future.result()
+            except Exception as e:
+                result = ReadResult(path, error=e, traceback=traceback.format_exc())
+            yield result
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
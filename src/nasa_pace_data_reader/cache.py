@@ -0,0 +1,469 @@
+"""
+An in-process cache of decoded variables for the NASA PACE Data Reader library.
+
+Interactive sessions often read the same granule again and again, and every read decompresses
+all variables. Once enabled, the cache keeps the decoded arrays of every read, keyed by file,
+modification time, variable and hyperslab, and evicts the least recently used ones beyond a
+byte budget::
+
+    from nasa_pace_data_reader import cache, L1
+    cache.enableCache(max_bytes=2*2**30)
+    l1c_dict = L1.L1C().read(fileName)      # decoded from the file
+    l1c_dict = L1.L1C().read(fileName)      # served from memory
+
+Cached arrays are shared between reads and are therefore read-only, copy them before
+modifying them in place. A file that changes on disk gets a new modification time, so its
+stale entries are never returned.
+
+Across processes, ``read(..., cache_dir=...)`` stores the decoded variables in a
+:class:`DiskCache` directory as uncompressed .npy files and returns read-only ``np.memmap``
+views of them. Later reads of the granule, from any process, map the files instead of
+decompressing the granule, and share the pages through the page cache.
+"""
+
+# Standard library imports for the LRU bookkeeping and the cache files.
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Third-party imports for array handling.
+import numpy as np
+
+# Local imports for the packed variables.
+from .packed import PackedArray
+
+
+def variableFile(variable):
+    """
+    Returns the path of the file holding a variable.
+
+    Args:
+        variable (netCDF4.Variable): The variable.
+
+    Returns:
+        str: The file path.
+    """
+    group = variable.group()
+    while group.parent is not None:
+        group = group.parent
+    return group.filepath()
+
+
+def variablePath(variable):
+    """Returns the full name of a variable, e.g. '/observation_data/i'."""
+    group = variable.group()
+    return f"{group.path.rstrip('/')}/{variable.name}"
+
+
+def hashableKey(key):
+    """
+    Converts a hyperslab index into a hashable tuple.
+
+    Args:
+        key: An index as passed to netCDF4, e.g. a tuple of slices, integers and index lists.
+
+    Returns:
+        tuple: The normalised index.
+    """
+    parts = []
+    for part in key if isinstance(key, tuple) else (key,):
+        if isinstance(part, slice):
+            parts.append(('slice', part.start, part.stop, part.step))
+        elif part is Ellipsis:
+            parts.append(('...',))
+        elif isinstance(part, (list, np.ndarray)):
+            parts.append(('index',) + tuple(np.asarray(part).ravel().tolist()))
+        else:
+            parts.append(int(part))
+    return tuple(parts)
+
+
+def arrayBytes(values):
+    """Returns the memory held by a decoded variable, including its mask."""
+    nbytes = values.nbytes
+    if np.ma.isMaskedArray(values) and values.mask is not np.ma.nomask:
+        nbytes += values.mask.nbytes
+    return nbytes
+
+
+def freeze(values):
+    """
+    Makes a decoded variable read-only.
+
+    Args:
+        values (np.ndarray or PackedArray): The variable.
+
+    Returns:
+        The same object, with its arrays flagged read-only.
+    """
+    if hasattr(values, 'raw'):
+        values.raw.flags.writeable = False
+    elif isinstance(values, np.ndarray):
+        values.flags.writeable = False
+        if np.ma.isMaskedArray(values) and values.mask is not np.ma.nomask:
+            values.mask.flags.writeable = False
+    return values
+
+
+class ArrayCache:
+    """
+    A least-recently-used cache of decoded variables bounded by their total size.
+    """
+
+    def __init__(self, max_bytes=2**30):
+        """
+        Initializes the cache.
+
+        Args:
+            max_bytes (int, optional): The memory budget in bytes. Defaults to 1 GiB.
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __repr__(self):
+        return (f'<ArrayCache {len(self)} arrays, {self.nbytes/1e6:.1f}/{self.max_bytes/1e6:.1f} MB, '
+                f'{self.hits} hits, {self.misses} misses>')
+
+    def key(self, variable, key, packed=False):
+        """
+        Builds the cache key of a hyperslab read.
+
+        Args:
+            variable (netCDF4.Variable): The variable.
+            key: The hyperslab index.
+            packed (bool, optional): True if the raw packed integers are read. Defaults to False.
+
+        Returns:
+            tuple: (path, mtime, size, variable, index, packed).
+        """
+        path = variableFile(variable)
+        stat = os.stat(path)
+        return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, variablePath(variable), hashableKey(key), packed)
+
+    def get(self, key):
+        """
+        Looks up a decoded variable.
+
+        Args:
+            key (tuple): The cache key.
+
+        Returns:
+            The read-only variable, or None if it is not cached.
+        """
+        with self._lock:
+            values = self._entries.get(key)
+            if values is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return values
+
+    def put(self, key, values):
+        """
+        Stores a decoded variable and evicts the least recently used ones beyond the budget.
+
+        Args:
+            key (tuple): The cache key.
+            values (np.ndarray or PackedArray): The decoded variable.
+
+        Returns:
+            The variable, now read-only. Variables larger than the budget are returned unchanged
+            and not stored.
+        """
+        nbytes = arrayBytes(values)
+        if nbytes > self.max_bytes:
+            return values
+        freeze(values)
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= arrayBytes(self._entries.pop(key))
+            self._entries[key] = values
+            self.nbytes += nbytes
+            self._evict()
+        return values
+
+    def resize(self, max_bytes):
+        """
+        Changes the memory budget, evicting arrays if it shrinks.
+
+        Args:
+            max_bytes (int): The new budget in bytes.
+        """
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.nbytes -= arrayBytes(evicted)
+
+    def clear(self):
+        """Drops all cached arrays."""
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+
+# The cache used by the readers, None while caching is disabled.
+ARRAY_CACHE = None
+
+
+def enableCache(max_bytes=2**30):
+    """
+    Enables caching of decoded variables for all readers.
+
+    Args:
+        max_bytes (int, optional): The memory budget in bytes. Defaults to 1 GiB.
+
+    Returns:
+        ArrayCache: The active cache.
+    """
+    global ARRAY_CACHE
+    if ARRAY_CACHE is None:
+        ARRAY_CACHE = ArrayCache(max_bytes)
+    else:
+        ARRAY_CACHE.resize(max_bytes)
+    return ARRAY_CACHE
+
+
+def disableCache():
+    """Disables caching and frees the cached arrays."""
+    global ARRAY_CACHE
+    if ARRAY_CACHE is not None:
+        ARRAY_CACHE.clear()
+    ARRAY_CACHE = None
+
+
+def isCached(variable, key=None, packed=False, cache_dir=None):
+    """
+    Checks whether a hyperslab read would be served by the array cache or the disk cache.
+
+    Args:
+        variable (netCDF4.Variable): The variable.
+        key (tuple, optional): The hyperslab index. Defaults to the full variable.
+        packed (bool, optional): True if the raw packed integers are read. Defaults to False.
+        cache_dir (str, optional): The disk cache directory. Defaults to None.
+
+    Returns:
+        bool: True if the read would not touch the file.
+    """
+    key = slice(None) if key is None else key
+    if ARRAY_CACHE is not None and ARRAY_CACHE.key(variable, key, packed) in ARRAY_CACHE:
+        return True
+    disk_cache = diskCache(cache_dir)
+    return disk_cache is not None and disk_cache.has(variable, key, packed)
+
+
+# The content fingerprints of the source files, by (path, mtime, size), the oldest are dropped beyond
+# FINGERPRINT_CACHE_SIZE entries.
+_fingerprints = OrderedDict()
+_fingerprints_lock = threading.Lock()
+FINGERPRINT_CACHE_SIZE = 1024
+
+
+def fingerprint(path, stat, block=2**16):
+    """
+    Hashes the size, the modification time and the first and last bytes of a file.
+
+    A granule rewritten in place gets a new modification time and therefore new cache entries,
+    even if its name, size and ends are unchanged. Copies share the entries of the original only
+    if the copy keeps the modification time, e.g. ``cp -p`` or ``rsync -t``.
+
+    Args:
+        path (str): The file path.
+        stat (os.stat_result): The file status.
+        block (int, optional): The number of bytes hashed at each end. Defaults to 64 KiB.
+
+    Returns:
+        str: The hexadecimal fingerprint.
+    """
+    identity = (path, stat.st_mtime_ns, stat.st_size)
+    with _fingerprints_lock:
+        if identity in _fingerprints:
+            _fingerprints.move_to_end(identity)
+            return _fingerprints[identity]
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f'{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    with open(path, 'rb') as source:
+        digest.update(source.read(block))
+        source.seek(max(stat.st_size - block, 0))
+        digest.update(source.read(block))
+
+    with _fingerprints_lock:
+        _fingerprints[identity] = digest.hexdigest()
+        while len(_fingerprints) > FINGERPRINT_CACHE_SIZE:
+            _fingerprints.popitem(last=False)
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """
+    A directory of decoded variables stored as uncompressed .npy files and read back as memory maps.
+
+    Every granule gets a subdirectory named after a fingerprint of its size, modification time
+    and content. Each cached read is stored as '<variable>-<index>.data.npy', a '.mask.npy' for masked values
+    and a '.json' sidecar with the shape, type, units and packing attributes of the variable.
+    The sidecar is written last, so a partly written entry is never used, and all files are
+    written under temporary names and renamed, so concurrent processes can share the directory.
+    """
+
+    def __init__(self, cache_dir):
+        """
+        Initializes the cache.
+
+        Args:
+            cache_dir (str): The cache directory, created if missing.
+        """
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def __repr__(self):
+        return f'<DiskCache {self.cache_dir}, {self.hits} hits, {self.misses} misses>'
+
+    def entry(self, variable, key, packed=False):
+        """
+        Returns the file prefix of a hyperslab read.
+
+        Args:
+            variable (netCDF4.Variable): The variable.
+            key: The hyperslab index.
+            packed (bool, optional): True if the raw packed integers are read. Defaults to False.
+
+        Returns:
+            str: The path of the entry without suffix.
+        """
+        path = os.path.abspath(variableFile(variable))
+        granule = fingerprint(path, os.stat(path))
+        index = hashlib.blake2b(repr((hashableKey(key), packed)).encode(), digest_size=8).hexdigest()
+        name = variablePath(variable).strip('/').replace('/', '.')
+        return os.path.join(self.cache_dir, granule, f'{name}-{index}')
+
+    def has(self, variable, key, packed=False):
+        """bool: True if the hyperslab read is stored, without mapping its files."""
+        return os.path.exists(f'{self.entry(variable, key, packed)}.json')
+
+    def get(self, variable, key, packed=False):
+        """
+        Looks up a decoded variable.
+
+        Returns:
+            np.ndarray or PackedArray: Read-only memory-mapped values, or None if not cached.
+        """
+        prefix = self.entry(variable, key, packed)
+        try:
+            with open(f'{prefix}.json') as sidecar:
+                meta = json.load(sidecar)
+            data = np.load(f'{prefix}.data.npy', mmap_mode='r')
+            mask = np.load(f'{prefix}.mask.npy', mmap_mode='r') if meta['masked'] else None
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self.restore(meta, data, mask)
+
+    def restore(self, meta, data, mask):
+        """Rebuilds a decoded variable from its memory-mapped files."""
+        packing = meta.get('packing')
+        if packing is not None:
+            attribute_type = np.dtype(packing['attribute_dtype']).type
+            return PackedArray(data, scale_factor=attribute_type(packing['scale_factor']),
+                               add_offset=attribute_type(packing['add_offset']),
+                               fill_values=tuple(data.dtype.type(value) for value in packing['fill_values']),
+                               valid_range=packing['valid_range'], name=meta['name'])
+        values = np.ma.MaskedArray(data, mask=np.ma.nomask if mask is None else mask, copy=False,
+                                   fill_value=meta['fill_value'])
+        return values
+
+    def put(self, variable, key, packed, values):
+        """
+        Stores a decoded variable.
+
+        Args:
+            variable (netCDF4.Variable): The variable.
+            key: The hyperslab index.
+            packed (bool): True if values holds the raw packed integers.
+            values (np.ndarray or PackedArray): The decoded values.
+
+        Returns:
+            The memory-mapped copy of values, or values itself if it cannot be stored,
+            e.g. strings or a full disk.
+        """
+        data = values.raw if packed else np.ma.getdata(values)
+        if data.dtype.kind not in 'biuf' or data.ndim == 0:
+            return values
+        mask = None if packed or np.ma.getmask(values) is np.ma.nomask else np.ma.getmaskarray(values)
+
+        meta = {'name': variable.name, 'variable': variablePath(variable), 'source': variableFile(variable),
+                'shape': list(data.shape), 'dtype': data.dtype.str, 'masked': mask is not None,
+                'units': getattr(variable, 'units', None), 'fill_value': None, 'packing': None}
+        if packed:
+            meta['packing'] = {'scale_factor': float(values.scale_factor), 'add_offset': float(values.add_offset),
+                               'attribute_dtype': values.dtype.str,
+                               'fill_values': [value.item() if hasattr(value, 'item') else value for value in values.fill_values],
+                               'valid_range': None if values.valid_range is None else
+                                              [None if value is None else np.asarray(value).item() for value in values.valid_range]}
+        elif '_FillValue' in variable.ncattrs():
+            meta['fill_value'] = np.asarray(variable.getncattr('_FillValue')).item()
+
+        prefix = self.entry(variable, key, packed)
+        try:
+            os.makedirs(os.path.dirname(prefix), exist_ok=True)
+            self._write(f'{prefix}.data.npy', lambda output: np.save(output, data))
+            if mask is not None:
+                self._write(f'{prefix}.mask.npy', lambda output: np.save(output, mask))
+            self._write(f'{prefix}.json', lambda output: output.write(json.dumps(meta, indent=1).encode()))
+        except OSError:
+            return values
+        return self.restore(meta, np.load(f'{prefix}.data.npy', mmap_mode='r'),
+                            None if mask is None else np.load(f'{prefix}.mask.npy', mmap_mode='r'))
+
+    @staticmethod
+    def _write(path, write):
+        # write under a unique temporary name and rename, so readers never see a partial file
+        temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(temporary, 'wb') as output:
+                write(output)
+            os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+
+# The disk caches in use, by directory.
+_disk_caches = {}
+
+
+def diskCache(cache_dir):
+    """
+    Returns the DiskCache of a directory.
+
+    Args:
+        cache_dir (str): The cache directory, None for no disk cache.
+
+    Returns:
+        DiskCache: The cache, None if cache_dir is None.
+    """
+    if cache_dir is None:
+        return None
+    cache_dir = os.path.abspath(cache_dir)
+    if cache_dir not in _disk_caches:
+        _disk_caches[cache_dir] = DiskCache(cache_dir)
+    return _disk_caches[cache_dir]
@@ -0,0 +1,354 @@
+"""
+A local SQLite index of PACE granules for the NASA PACE Data Reader library.
+
+Finding the granules of one instrument over a region and a time range used to mean globbing
+a directory and opening every file. :class:`Catalog` scans a directory tree once, reading only
+the global attributes, the dimensions and a decimated copy of the latitude and longitude of
+each granule, and stores the instrument, product level, observation time, footprint bounding
+box, dateline flag, shape and file size in a SQLite database. Later scans only revisit files
+whose modification time or size changed::
+
+    from nasa_pace_data_reader import catalog
+    cat = catalog.Catalog('/data/pace/catalog.sqlite')
+    cat.scan('/data/pace')
+    files = cat.paths(instrument='HARP2', level='L1C', start='2024-03-11', end='2024-03-18',
+                      bbox=(-10, 30, 30, 60))
+"""
+
+# Standard library imports for the index, the directory walk and the time handling.
+import os
+import fnmatch
+import sqlite3
+import datetime
+
+# Third-party imports for reading the headers and the decimated geolocation.
+import numpy as np
+from netCDF4 import Dataset # type: ignore
+
+# The geolocation variable names of the L1C, L1B and L2 files and of the L1beta files.
+LATITUDE_NAMES = ['latitude', 'Latitude']
+LONGITUDE_NAMES = ['longitude', 'Longitude']
+
+# The table holding one row per granule.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS granules (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    instrument TEXT,
+    level TEXT,
+    time TEXT,
+    lon_min REAL,
+    lon_max REAL,
+    lat_min REAL,
+    lat_max REAL,
+    dateline INTEGER,
+    shape TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS granules_search ON granules (instrument, level, time);
+CREATE INDEX IF NOT EXISTS granules_lat ON granules (lat_min, lat_max);
+"""
+
+# The columns returned by the queries.
+COLUMNS = ['path', 'mtime', 'size', 'instrument', 'level', 'time', 'lon_min', 'lon_max',
+           'lat_min', 'lat_max', 'dateline', 'shape']
+
+
+def parseName(filepath):
+    """
+    Extracts the instrument, product level and observation time from a PACE file name,
+    e.g. 'PACE_HARP2.20240311T051500.L1C.5km.nc'.
+
+    Args:
+        filepath (str): The path to the granule.
+
+    Returns:
+        tuple: (instrument, level, datetime.datetime), None for the fields the name does not hold.
+    """
+    fields = os.path.basename(filepath).split('.')
+    instrument = fields[0].split('_', 1)[1] if fields[0].startswith('PACE_') else None
+    try:
+        time = datetime.datetime.strptime(fields[1], '%Y%m%dT%H%M%S')
+    except (IndexError, ValueError):
+        time = None
+    level = fields[2] if len(fields) > 3 else None
+    return instrument, level, time
+
+
+def toTimestamp(value, end=False):
+    """
+    Converts a query time to the ISO string stored in the catalog.
+
+    Args:
+        value (datetime.datetime, datetime.date or str): The time, strings in ISO format,
+                                                         e.g. '2024-03-11' or '2024-03-11T05:15:00'.
+        end (bool, optional): True for the end of a time range, a date without a time is then the
+                              last second of that day. Defaults to False, its first second.
+
+    Returns:
+        str: The time as 'YYYY-mm-ddTHH:MM:SS'.
+    """
+    if isinstance(value, str):
+        try:
+            value = datetime.date.fromisoformat(value)
+        except ValueError:
+            value = datetime.datetime.fromisoformat(value)
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime(value.year, value.month, value.day)
+        if end:
+            value = value.replace(hour=23, minute=59, second=59)
+    return value.replace(tzinfo=None).isoformat(timespec='seconds')
+
+
+def findVariable(dataNC, names):
+    """
+    Finds the first variable with one of the given names in the root group or a subgroup.
+
+    Args:
+        dataNC (netCDF4.Dataset): The open file.
+        names (list): The candidate variable names.
+
+    Returns:
+        netCDF4.Variable: The variable, or None if the file has none of them.
+    """
+    for group in [dataNC] + list(dataNC.groups.values()):
+        for name in names:
+            if name in group.variables:
+                return group.variables[name]
+    return None
+
+
+def footprint(latitude, longitude):
+    """
+    Computes the bounding box of a swath.
+
+    The longitude range is the complement of the widest longitude gap, so a granule crossing
+    the antimeridian gets lon_min > lon_max, the convention used by the bbox of the readers.
+
+    Args:
+        latitude (np.ndarray): The (decimated) latitudes.
+        longitude (np.ndarray): The (decimated) longitudes.
+
+    Returns:
+        tuple: ((lon_min, lon_max, lat_min, lat_max), dateline), None if no value is valid.
+               dateline is True when the longitudes span more than 180 degrees, as in Plot.
+    """
+    lat = np.ma.filled(np.ma.asarray(latitude, dtype=np.float64), np.nan).ravel()
+    lon = np.ma.filled(np.ma.asarray(longitude, dtype=np.float64), np.nan).ravel()
+    valid = np.isfinite(lat) & np.isfinite(lon) & (np.abs(lat) <= 90)
+    if not valid.any():
+        return None
+    lat, lon = lat[valid], (lon[valid] + 180) % 360 - 180
+
+    dateline = bool(lon.max() - lon.min() > 180)
+    lons = np.unique(lon)
+    # the gaps between consecutive longitudes, the last one wraps around the antimeridian
+    gaps = np.diff(np.append(lons, lons[0] + 360))
+    widest = int(np.argmax(gaps))
+    if gaps[widest] < 10:
+        # the swath covers all longitudes, e.g. over a pole
+        lon_min, lon_max = -180.0, 180.0
+    elif widest == lons.size - 1:
+        lon_min, lon_max = float(lons[0]), float(lons[-1])
+    else:
+        lon_min, lon_max = float(lons[widest + 1]), float(lons[widest])
+    return (lon_min, lon_max, float(lat.min()), float(lat.max())), dateline
+
+
+def lonOverlap(a_min, a_max, b_min, b_max):
+    """
+    Checks whether two longitude ranges overlap, either of them may cross the antimeridian.
+
+    Returns:
+        bool: True if the ranges share a longitude.
+    """
+    def intervals(lon_min, lon_max):
+        return [(lon_min, lon_max)] if lon_min <= lon_max else [(lon_min, 180.0), (-180.0, lon_max)]
+    return any(a0 <= b1 and b0 <= a1 for a0, a1 in intervals(a_min, a_max) for b0, b1 in intervals(b_min, b_max))
+
+
+def describe(filepath, step=8):
+    """
+    Reads the catalog entry of a granule.
+
+    Only the global attributes, the dimensions and every step-th latitude and longitude
+    are read.
+
+    Args:
+        filepath (str): The path to the granule.
+        step (int, optional): The decimation of the geolocation along every dimension. Defaults to 8.
+
+    Returns:
+        dict: The instrument, level, time, footprint, dateline flag and shape of the granule.
+    """
+    instrument, level, time = parseName(filepath)
+    with Dataset(filepath, 'r') as dataNC:
+        attributes = dataNC.__dict__
+        instrument = instrument or attributes.get('instrument')
+        level = level or attributes.get('processing_level')
+        if time is None and 'time_coverage_start' in attributes:
+            time = datetime.datetime.fromisoformat(attributes['time_coverage_start'].rstrip('Z'))
+
+        entry = {'instrument': instrument, 'level': level, 'time': toTimestamp(time) if time else None,
+                 'lon_min': None, 'lon_max': None, 'lat_min': None, 'lat_max': None,
+                 'dateline': None, 'shape': None}
+
+        latitude = findVariable(dataNC, LATITUDE_NAMES)
+        longitude = findVariable(dataNC, LONGITUDE_NAMES)
+        if latitude is not None and longitude is not None:
+            entry['shape'] = 'x'.join(str(size) for size in latitude.shape)
+            decimate = tuple(slice(None, None, step) for _ in latitude.shape)
+            box = footprint(latitude[decimate], longitude[decimate])
+            if box is not None:
+                (entry['lon_min'], entry['lon_max'], entry['lat_min'], entry['lat_max']), entry['dateline'] = box
+    return entry
+
+
+class Catalog:
+    """
+    A SQLite index of the granules below one or more directories.
+    """
+
+    def __init__(self, path):
+        """
+        Opens or creates the catalog.
+
+        Args:
+            path (str): The SQLite file, ':memory:' for a catalog that is not stored.
+        """
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.create_function('lon_overlap', 4, lonOverlap, deterministic=True)
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM granules WHERE error IS NULL').fetchone()[0]
+
+    def close(self):
+        """Closes the database."""
+        self.connection.close()
+
+    def scan(self, root, pattern='*.nc', step=8, prune=True):
+        """
+        Adds the granules below a directory to the catalog.
+
+        Files already in the catalog with the same modification time and size are not opened.
+        Files that cannot be read are remembered with their error, so they are only retried
+        once they change.
+
+        Args:
+            root (str): The directory to scan recursively.
+            pattern (str, optional): The file name pattern, e.g. '*5km.nc'. Defaults to '*.nc'.
+            step (int, optional): The decimation of the geolocation used for the footprint. Defaults to 8.
+            prune (bool, optional): If True, remove the entries below root whose file no longer exists.
+                                    Defaults to True.
+
+        Returns:
+            dict: The number of added, updated, unchanged, failed and removed files.
+        """
+        root = os.path.abspath(root)
+        prefix = os.path.join(root, '')
+        known = {row['path']: (row['mtime'], row['size'])
+                 for row in self.connection.execute('SELECT path, mtime, size FROM granules WHERE substr(path, 1, ?) = ?',
+                                                    (len(prefix), prefix))}
+        counts = {'added': 0, 'updated': 0, 'unchanged': 0, 'failed': 0, 'removed': 0}
+        seen = set()
+
+        with self.connection:
+            for directory, _, files in os.walk(root):
+                for name in sorted(fnmatch.filter(files, pattern)):
+                    filepath = os.path.join(directory, name)
+                    stat = os.stat(filepath)
+                    seen.add(filepath)
+                    if known.get(filepath) == (stat.st_mtime, stat.st_size):
+                        counts['unchanged'] += 1
+                        continue
+
+                    try:
+                        entry = describe(filepath, step=step)
+                        entry['error'] = None
+                    except Exception as e:
+                        entry = dict.fromkeys(COLUMNS[3:], None)
+                        entry['error'] = f'{type(e).__name__}: {e}'
+                        counts['failed'] += 1
+                    counts['updated' if filepath in known else 'added'] += entry['error'] is None
+                    entry.update(path=filepath, mtime=stat.st_mtime, size=stat.st_size)
+                    self.connection.execute(
+                        f"INSERT OR REPLACE INTO granules ({', '.join(entry)}) VALUES ({', '.join('?' * len(entry))})",
+                        tuple(entry.values()))
+
+            if prune:
+                removed = [(filepath,) for filepath in known if filepath not in seen]
+                self.connection.executemany('DELETE FROM granules WHERE path = ?', removed)
+                counts['removed'] = len(removed)
+
+        print(f"...Catalog {self.path}: {counts['added']} added, {counts['updated']} updated, "
+              f"{counts['unchanged']} unchanged, {counts['failed']} failed, {counts['removed']} removed")
+        return counts
+
+    def query(self, instrument=None, level=None, start=None, end=None, bbox=None):
+        """
+        Finds the granules matching all given criteria.
+
+        Args:
+            instrument (str, optional): The instrument, e.g. 'HARP2' (case-insensitive). Defaults to None.
+            level (str, optional): The product level, e.g. 'L1C' (case-insensitive). Defaults to None.
+            start (datetime.datetime or str, optional): The earliest observation time. Defaults to None.
+            end (datetime.datetime or str, optional): The latest observation time, inclusive. A date without
+                                                      a time includes the whole day. Defaults to None.
+            bbox (tuple, optional): (lon_min, lon_max, lat_min, lat_max) in degrees, the footprint must
+                                    overlap it. A box crossing the antimeridian is given with
+                                    lon_min > lon_max, as for the readers. Defaults to None.
+
+        Returns:
+            list: One dict per granule with the catalog columns, sorted by time.
+        """
+        conditions, values = ['error IS NULL'], []
+        if instrument is not None:
+            conditions.append('instrument = ? COLLATE NOCASE')
+            values.append(instrument)
+        if level is not None:
+            conditions.append('level = ? COLLATE NOCASE')
+            values.append(level)
+        if start is not None:
+            conditions.append('time >= ?')
+            values.append(toTimestamp(start))
+        if end is not None:
+            conditions.append('time <= ?')
+            values.append(toTimestamp(end, end=True))
+        if bbox is not None:
+            lon_min, lon_max, lat_min, lat_max = bbox
+            assert lat_min <= lat_max, 'Error: bbox lat_min must not exceed lat_max'
+            conditions.append('lat_max >= ? AND lat_min <= ? AND lon_overlap(lon_min, lon_max, ?, ?)')
+            values += [lat_min, lat_max, lon_min, lon_max]
+
+        sql = f"SELECT {', '.join(COLUMNS)} FROM granules WHERE {' AND '.join(conditions)} ORDER BY time, path"
+        return [dict(row) for row in self.connection.execute(sql, values)]
+
+    def paths(self, **criteria):
+        """
+        Finds the files of the granules matching the criteria of query.
+
+        Returns:
+            list: The file paths, sorted by time.
+        """
+        return [row['path'] for row in self.query(**criteria)]
+
+    def failures(self):
+        """
+        Lists the files that could not be read during a scan.
+
+        Returns:
+            dict: The error message of every failed file.
+        """
+        return {row['path']: row['error'] for row in
+                self.connection.execute('SELECT path, error FROM granules WHERE error IS NOT NULL')}
@@ -17,3 +17,7 @@ class VariableNotFoundError(PACEException):
 class InvalidFileError(PACEException):
     """Raised when a file is not a valid or readable data file."""
     pass
+
+class EmptySubsetError(PACEException):
+    """Raised when a geographic subset does not contain any pixels of the granule."""
+    pass
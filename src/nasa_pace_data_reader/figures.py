@@ -0,0 +1,109 @@
+"""
+Figures without global state for the NASA PACE Data Reader library.
+
+The plotting methods build their figures here instead of through the pyplot state machine.
+Figures that are shown interactively are still created by pyplot, so ``plt.show()`` finds
+them, but with ``noShow=True`` a figure is a plain :class:`matplotlib.figure.Figure` on its
+own Agg canvas that no other thread can see. The plot style (tick directions, the math font
+and the colours of a black background) is set on the artists of each figure rather than in
+``plt.rcParams``, so several granules can be rendered concurrently::
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(lambda p: p.projectedRGB(noShow=True, saveFig=True, savePath=f'{p.data["date_time"]}.png'),
+                      plots))
+
+Agg and numpy release the GIL for most of the drawing and regridding work.
+"""
+
+# Matplotlib is only imported when a figure is built.
+from .lazyimport import LazyModule
+plt = LazyModule('matplotlib.pyplot')
+mfigure = LazyModule('matplotlib.figure')
+mtext = LazyModule('matplotlib.text')
+backend_agg = LazyModule('matplotlib.backends.backend_agg')
+
+# The style of the plotting methods, formerly set globally in plt.rcParams.
+PLOT_STYLE = {'tick_direction': 'in', 'ticks_all_sides': True, 'math_fontfamily': 'cm'}
+
+# The colours of figures drawn on a black background.
+DARK_STYLE = {'figure': 'black', 'title': 'white', 'tick': 'tan', 'label': 'grey', 'edge': 'tan', 'face': 'tan'}
+
+
+def newFigure(figsize=None, dpi=None, show=False):
+    """
+    Creates a figure, registered with pyplot only if it is going to be shown.
+
+    Args:
+        figsize (tuple, optional): The figure size in inches. Defaults to None, matplotlib's default.
+        dpi (float, optional): The resolution of the figure. Defaults to None, matplotlib's default.
+        show (bool, optional): True for a pyplot figure that plt.show() displays. Defaults to False.
+
+    Returns:
+        matplotlib.figure.Figure: The figure.
+    """
+    if show:
+        return plt.figure(figsize=figsize, dpi=dpi)
+    fig = mfigure.Figure(figsize=figsize, dpi=dpi)
+    backend_agg.FigureCanvasAgg(fig)
+    return fig
+
+
+def isPyplotFigure(fig):
+    """Returns True if a figure is managed by pyplot."""
+    return fig is not None and getattr(fig.canvas, 'manager', None) is not None
+
+
+def showFigure(fig):
+    """Shows a pyplot figure, figures outside pyplot are left alone."""
+    if isPyplotFigure(fig):
+        plt.show()
+
+
+def styleFigure(fig, font=None, axes=None):
+    """
+    Applies PLOT_STYLE to the axes and texts of a figure.
+
+    Call it once the figure is drawn up, texts added later keep matplotlib's defaults.
+
+    Args:
+        fig (matplotlib.figure.Figure): The figure.
+        font (str, optional): The font family of all texts. Defaults to None, matplotlib's default.
+        axes (list, optional): The axes to style. Defaults to all axes of the figure.
+    """
+    if fig is None:
+        return
+    axes = fig.axes if axes is None else axes
+    for ax in axes:
+        if PLOT_STYLE['ticks_all_sides']:
+            ax.tick_params(direction=PLOT_STYLE['tick_direction'], top=True, right=True)
+        else:
+            ax.tick_params(direction=PLOT_STYLE['tick_direction'])
+        # the labels of cartopy gridlines are only created when the figure is drawn
+        for gl in list(getattr(ax, '_gridliners', [])) + list(ax.artists):
+            if font and hasattr(gl, 'xlabel_style'):
+                gl.xlabel_style = {**gl.xlabel_style, 'fontfamily': font}
+                gl.ylabel_style = {**gl.ylabel_style, 'fontfamily': font}
+    for text in fig.findobj(mtext.Text):
+        text.set_math_fontfamily(PLOT_STYLE['math_fontfamily'])
+        if font:
+            text.set_fontfamily(font)
+
+
+def darkAxes(ax, face=True):
+    """
+    Colours an axes for a black figure background.
+
+    Args:
+        ax (matplotlib.axes.Axes): The axes, e.g. a map or its colorbar.
+        face (bool, optional): Whether to also colour the frame and the background of the axes.
+                               Defaults to True.
+    """
+    ax.title.set_color(DARK_STYLE['title'])
+    ax.tick_params(colors=DARK_STYLE['tick'])
+    ax.xaxis.label.set_color(DARK_STYLE['label'])
+    ax.yaxis.label.set_color(DARK_STYLE['label'])
+    if face:
+        ax.set_facecolor(DARK_STYLE['face'])
+        for spine in ax.spines.values():
+            spine.set_edgecolor(DARK_STYLE['edge'])
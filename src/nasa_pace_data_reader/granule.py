@@ -0,0 +1,376 @@
+"""
+Dataset-backed granule containers for the NASA PACE Data Reader library.
+
+The readers return a plain dictionary by default. When called with ``lazy=True`` they
+return a :class:`Granule` instead, which keeps the NetCDF file open and only decodes a
+variable when it is indexed, e.g. ``granule['i'][:, :, 36, 0]`` becomes a hyperslab read.
+
+The ``arrays`` option of the readers selects the array type of the variables:
+
+- ``'masked'`` (default): ``numpy.ma.MaskedArray`` as decoded by netCDF4, each with its own mask.
+- ``'nan'``: plain float32 ndarrays with NaN at the fill values.
+- ``'bitmask'``: plain ndarrays holding the raw fill values, plus one :class:`ValidityMask`
+  per fill pattern under ``data['_masks'][name]``. Variables with the same pattern, e.g. i, q,
+  u and dolp, share the same mask object. Indexing a lazy variable returns a MaskedArray of the
+  raw values instead, masked as its hyperslab.
+- ``'packed'``: integer variables with scale_factor/add_offset as :class:`packed.PackedArray`,
+  the raw integers decoded only when needed, other variables as ``'masked'``.
+"""
+
+# Standard library imports for the mapping interface.
+from collections.abc import MutableMapping
+
+# Third-party imports for array handling.
+import numpy as np
+
+# Local imports for hyperslab subsetting.
+from .subset import composeIndex, selectionShape
+from .profiling import span
+from .packed import isPacked, readPacked
+from . import cache
+
+# The array types the readers can return.
+ARRAY_TYPES = ['masked', 'nan', 'bitmask', 'packed']
+
+
+class ValidityMask:
+    """
+    A bit-packed boolean array marking the valid (not fill) values of one or more variables.
+    """
+
+    def __init__(self, valid):
+        """
+        Initializes the mask.
+
+        Args:
+            valid (np.ndarray): Boolean array, True where the value is valid.
+        """
+        self.shape = valid.shape
+        self.bits = np.packbits(valid, axis=None)
+
+    def __repr__(self):
+        return f'<ValidityMask {self.shape} ({self.bits.nbytes} bytes)>'
+
+    def __array__(self, dtype=None, copy=None):
+        valid = self.unpack()
+        return valid if dtype is None else valid.astype(dtype)
+
+    @property
+    def nbytes(self):
+        """int: The size of the packed bits."""
+        return self.bits.nbytes
+
+    def unpack(self):
+        """
+        Unpacks the mask.
+
+        Returns:
+            np.ndarray: Boolean array, True where the value is valid.
+        """
+        return np.unpackbits(self.bits, count=int(np.prod(self.shape))).view(bool).reshape(self.shape)
+
+    def matches(self, bits, shape):
+        """bool: True if the mask holds the given packed bits."""
+        return self.shape == shape and np.array_equal(self.bits, bits)
+
+    def apply(self, values, fill_value=np.nan):
+        """
+        Replaces the invalid values of a variable.
+
+        Args:
+            values (np.ndarray): The raw values of a variable sharing this mask.
+            fill_value (float, optional): The value for invalid entries. Defaults to NaN.
+
+        Returns:
+            np.ndarray: A float32 copy of values with fill_value at the invalid entries.
+        """
+        filled = np.array(values, dtype=np.float32)
+        filled[~self.unpack()] = fill_value
+        return filled
+
+
+def shareMask(masks, name, values):
+    """
+    Stores the validity mask of a variable, reusing an identical mask of another variable.
+
+    Args:
+        masks (dict): The masks of the granule, by variable name.
+        name (str): The variable name.
+        values (np.ma.MaskedArray): The decoded variable.
+    """
+    valid = ~np.ma.getmaskarray(values)
+    bits = np.packbits(valid, axis=None)
+    for mask in masks.values():
+        if mask.matches(bits, valid.shape):
+            masks[name] = mask
+            return
+    masks[name] = ValidityMask(valid)
+
+
+def convertArray(values, arrays='masked', masks=None, name=None):
+    """
+    Converts a decoded variable to the requested array type.
+
+    Args:
+        values (np.ma.MaskedArray): The variable as decoded by netCDF4.
+        arrays (str, optional): One of ARRAY_TYPES. Defaults to 'masked'.
+        masks (dict, optional): The granule masks, where 'bitmask' stores the validity of the
+                                variable under name. Defaults to None.
+        name (str, optional): The variable name. Defaults to None.
+
+    Returns:
+        np.ndarray: The converted variable, values itself for 'masked'.
+    """
+    if arrays in ['masked', 'packed']:
+        return values
+    data = np.ma.getdata(values)
+    mask = np.ma.getmask(values)
+    if arrays == 'nan':
+        if data.dtype.kind not in 'fiu' or (data.dtype.kind != 'f' and mask is np.ma.nomask):
+            # integer variables without fill values and non-numeric variables stay as they are
+            return data
+        data = data.astype(np.float32, copy=False)
+        if mask is not np.ma.nomask:
+            # a freshly decoded array is filled in place, a cached read-only one is copied first
+            if not data.flags.writeable:
+                data = data.copy()
+            data[mask] = np.nan
+        return data
+    if masks is not None:
+        shareMask(masks, name, values)
+    return data
+
+
+def decodeVariable(variable, key=None, arrays='masked', masks=None, name=None, cache_dir=None, read=None):
+    """
+    Reads a hyperslab of a variable and converts it to the requested array type.
+
+    Args:
+        variable (netCDF4.Variable): The variable to read.
+        key (tuple, optional): The hyperslab. Defaults to the full variable.
+        arrays (str, optional): One of ARRAY_TYPES. Defaults to 'masked'.
+        masks (dict, optional): The granule masks for arrays='bitmask'. Defaults to None.
+        name (str, optional): The key of the variable in the granule. Defaults to the variable name.
+        cache_dir (str, optional): A cache.DiskCache directory, the data is then returned as
+                                   memory-mapped views of its files. Defaults to None.
+        read (callable, optional): Returns the values of the hyperslab on a cache miss instead of
+                                   reading them from the variable, e.g. the blocks read by a
+                                   parallel.BlockReader. Defaults to None.
+
+    Returns:
+        np.ndarray or PackedArray: The decoded data.
+    """
+    key = slice(None) if key is None else key
+    packed = arrays == 'packed' and isPacked(variable)
+
+    # a cached read is shared and read-only, the conversion copies it where it needs to write
+    array_cache = cache.ARRAY_CACHE
+    values = None
+    if array_cache is not None:
+        cache_key = array_cache.key(variable, key, packed)
+        values = array_cache.get(cache_key)
+
+    if values is None:
+        disk_cache = cache.diskCache(cache_dir)
+        if disk_cache is not None:
+            values = disk_cache.get(variable, key, packed)
+        if values is None:
+            with span('read', variable=variable.name) as read_span:
+                if read is not None:
+                    values = read()
+                else:
+                    values = readPacked(variable, key) if packed else variable[key]
+                read_span.bytes = values.nbytes
+            if disk_cache is not None:
+                values = disk_cache.put(variable, key, packed, values)
+        if array_cache is not None:
+            values = array_cache.put(cache_key, values)
+    return convertArray(values, arrays, masks, name or variable.name)
+
+
+class LazyVariable:
+    """
+    A thin wrapper around a netCDF4 variable that defers decoding until it is indexed.
+    """
+
+    def __init__(self, variable, selection=None, arrays='masked', masks=None, cache_dir=None):
+        """
+        Initializes the lazy variable.
+
+        Args:
+            variable (netCDF4.Variable): The variable to wrap.
+            selection (tuple, optional): A per-dimension index restricting the variable to a
+                                         hyperslab, as built by Subset.index. Defaults to None.
+            arrays (str, optional): The array type, see ARRAY_TYPES. Defaults to 'masked'.
+            masks (dict, optional): The granule masks, filled in when the full variable is
+                                    decoded with arrays='bitmask'. Defaults to None.
+            cache_dir (str, optional): The disk cache directory. Defaults to None.
+        """
+        self._variable = variable
+        self._selection = selection
+        self._arrays = arrays
+        self._masks = masks
+        self._cache_dir = cache_dir
+        self._values = None
+        self.name = variable.name
+        if selection is None:
+            self.shape = variable.shape
+        else:
+            self.shape = selectionShape(selection, variable.shape)
+        self.dtype = variable.dtype
+        self.ndim = len(self.shape)
+        self.dimensions = variable.dimensions
+        self.units = getattr(variable, 'units', None)
+
+    def __getitem__(self, key):
+        """
+        Reads only the requested hyperslab, unless the full array is already decoded.
+
+        The shared masks of arrays='bitmask' cover full variables only, so an indexed bitmask
+        variable is returned as a MaskedArray of its raw values with the mask of the hyperslab.
+        """
+        if self._values is not None:
+            values = self._values[key]
+            if self._arrays == 'bitmask' and self._masks is not None and self.name in self._masks:
+                return np.ma.MaskedArray(values, mask=~self._masks[self.name].unpack()[key])
+            return values
+        if self._selection is not None:
+            key = composeIndex(self._selection, key, self._variable.shape)
+        # the mask of a partial read is not stored in the granule masks, it is kept with the data
+        arrays = 'masked' if self._arrays == 'bitmask' else self._arrays
+        return decodeVariable(self._variable, key, arrays, cache_dir=self._cache_dir)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __repr__(self):
+        state = 'loaded' if self._values is not None else 'on disk'
+        return f'<LazyVariable {self.name} {self.shape} {self.dtype} ({state})>'
+
+    @property
+    def values(self):
+        """
+        Decodes the full variable on first access and keeps it for later use.
+
+        Returns:
+            np.ndarray: The decoded variable, a MaskedArray unless another array type was requested.
+        """
+        if self._values is None:
+            self._values = decodeVariable(self._variable, self._selection, self._arrays, self._masks, self.name,
+                                          self._cache_dir)
+        return self._values
+
+    def __array__(self, dtype=None, copy=None):
+        values = np.ma.getdata(self.values)
+        return values if dtype is None else values.astype(dtype)
+
+    def __getattr__(self, name):
+        # Fall back to the decoded array for methods such as max(), min() or ravel()
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.values, name)
+
+
+class Granule(MutableMapping):
+    """
+    A dictionary-like view of a PACE granule backed by an open netCDF4 Dataset.
+
+    Large variables are stored as :class:`LazyVariable` objects, small metadata
+    (units, wavelengths, view angles, F0, ...) is stored as read. The granule should
+    be closed when no longer needed, either explicitly or by using it as a context manager.
+    """
+
+    def __init__(self, dataset, filename, pool=None):
+        """
+        Initializes the granule.
+
+        Args:
+            dataset (netCDF4.Dataset): The open dataset backing the granule.
+            filename (str): The path to the granule file.
+            pool (handles.DatasetPool, optional): The pool the dataset was opened from, it is
+                                                  released to the pool on close. Defaults to None.
+        """
+        self._dataset = dataset
+        self._pool = pool
+        self._data = {}
+        self.filename = filename
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __setitem__(self, key, value):
+        self._data[key] = value
+
+    def __delitem__(self, key):
+        del self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return f'<Granule {self.filename} ({len(self)} keys)>'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def closed(self):
+        """bool: True if the backing dataset has been closed."""
+        return self._dataset is None or not self._dataset.isopen()
+
+    def close(self):
+        """Closes the backing netCDF file. Variables that were not loaded become unreadable."""
+        if self._dataset is not None and self._pool is not None:
+            self._pool.release(self._dataset)
+        elif self._dataset is not None and self._dataset.isopen():
+            self._dataset.close()
+        self._dataset = None
+
+    def load(self, keys=None):
+        """
+        Decodes the requested variables and returns them as a plain dictionary.
+
+        Args:
+            keys (list, optional): The keys to load. Defaults to all keys.
+
+        Returns:
+            dict: A dictionary in the same layout as the eager ``read`` output.
+        """
+        keys = list(self._data) if keys is None else keys
+        return {key: self._data[key].values if isinstance(self._data[key], LazyVariable) else self._data[key]
+                for key in keys}
+
+
+def readVariable(variable, lazy=False, subset=None, arrays='masked', masks=None, name=None, cache_dir=None,
+                 blocks=None):
+    """
+    Reads a netCDF4 variable either eagerly or as a :class:`LazyVariable`.
+
+    Args:
+        variable (netCDF4.Variable): The variable to read.
+        lazy (bool, optional): If True, defer decoding until the variable is indexed. Defaults to False.
+        subset (Subset, optional): The views and wavelengths to read. Defaults to the full variable.
+        arrays (str, optional): One of ARRAY_TYPES, see the module documentation. Defaults to 'masked'.
+        masks (dict, optional): The granule masks for arrays='bitmask'. Defaults to None.
+        name (str, optional): The key of the variable in the granule and its masks. Defaults to the variable name.
+        cache_dir (str, optional): A disk cache directory, see cache.DiskCache. Defaults to None.
+        blocks (parallel.BlockReader, optional): Reads the variable in worker processes, a
+                                                 PendingVariable is then returned and decoded by
+                                                 blocks.resolve. Defaults to None.
+
+    Returns:
+        np.ndarray or LazyVariable: The decoded data or the lazy wrapper.
+    """
+    assert arrays in ARRAY_TYPES, f'Error: arrays must be one of {ARRAY_TYPES}'
+    selection = subset.index(variable) if subset else None
+    if lazy:
+        return LazyVariable(variable, selection, arrays, masks, cache_dir)
+    if blocks is not None:
+        return blocks.submit(variable, selection, arrays, masks, name, cache_dir)
+    return decodeVariable(variable, selection, arrays, masks, name, cache_dir)
@@ -0,0 +1,186 @@
+"""
+Shared netCDF4 Dataset handles for the NASA PACE Data Reader library.
+
+The readers open their files through :data:`HANDLE_POOL`. A handle is counted while a read or
+a lazy Granule uses it and is closed when the last user releases it, even if the read fails.
+With a pool size above zero, released handles stay open and are reused by the next read of
+the same file, the least recently used ones being closed beyond the pool size::
+
+    from nasa_pace_data_reader import handles
+    handles.setPoolSize(16)     # keep up to 16 idle granules open
+
+A file that changes on disk gets a new handle, the old one is closed once released.
+"""
+
+# Standard library imports for the pool bookkeeping.
+import os
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+
+# Third-party imports for the NetCDF handles.
+from netCDF4 import Dataset # type: ignore
+
+# Local imports for the reader exceptions.
+from .exceptions import InvalidFileError
+
+
+class DatasetPool:
+    """
+    A reference-counted set of open Datasets that keeps the most recently released ones open.
+    """
+
+    def __init__(self, maxsize=0):
+        """
+        Initializes the pool.
+
+        Args:
+            maxsize (int, optional): The number of idle handles kept open. Defaults to 0, every
+                                     handle is closed as soon as it is released.
+        """
+        self.maxsize = maxsize
+        self.opens = 0
+        self.reuses = 0
+        self._handles = {}          # key -> [dataset, users]
+        self._idle = OrderedDict()  # keys of the unused handles, least recently used first
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._handles)
+
+    def __repr__(self):
+        return (f'<DatasetPool {len(self)} open ({len(self._idle)} idle, max {self.maxsize}), '
+                f'{self.opens} opens, {self.reuses} reuses>')
+
+    @staticmethod
+    def key(filename):
+        """Identifies a file by path, modification time and size."""
+        stat = os.stat(filename)
+        return (os.path.abspath(filename), stat.st_mtime_ns, stat.st_size)
+
+    def open(self, filename):
+        """
+        Returns an open Dataset of a file, reusing an open handle if there is one.
+        Every call must be matched by a call to release.
+
+        Args:
+            filename (str): The path to the file.
+
+        Returns:
+            netCDF4.Dataset: The open dataset.
+
+        Raises:
+            InvalidFileError: If the file does not exist or cannot be opened.
+        """
+        try:
+            key = self.key(filename)
+        except FileNotFoundError:
+            raise InvalidFileError(f"Error: File not found at {filename}")
+
+        with self._lock:
+            entry = self._handles.get(key)
+            if entry is not None and entry[0].isopen():
+                entry[1] += 1
+                self._idle.pop(key, None)
+                self.reuses += 1
+                return entry[0]
+
+            try:
+                dataNC = Dataset(filename, 'r')
+            except OSError as e:
+                raise InvalidFileError(f"Error: {filename} is not a valid or readable data file") from e
+            self._handles[key] = [dataNC, 1]
+            self.opens += 1
+            return dataNC
+
+    def release(self, dataNC):
+        """
+        Gives back a handle returned by open. Handles that are no longer used are kept open
+        up to the pool size, the least recently used ones are closed.
+
+        Args:
+            dataNC (netCDF4.Dataset): The dataset.
+        """
+        with self._lock:
+            key = next((key for key, entry in self._handles.items() if entry[0] is dataNC), None)
+            if key is None:
+                # not from this pool, e.g. opened before the pool size changed
+                if dataNC.isopen():
+                    dataNC.close()
+                return
+            entry = self._handles[key]
+            entry[1] -= 1
+            if entry[1] <= 0:
+                self._idle[key] = None
+                self._trim()
+
+    @contextmanager
+    def dataset(self, filename):
+        """
+        Opens a file for the duration of a with block.
+
+        Args:
+            filename (str): The path to the file.
+
+        Yields:
+            netCDF4.Dataset: The open dataset, released when the block exits.
+        """
+        dataNC = self.open(filename)
+        try:
+            yield dataNC
+        finally:
+            self.release(dataNC)
+
+    def resize(self, maxsize):
+        """
+        Changes the number of idle handles kept open.
+
+        Args:
+            maxsize (int): The new pool size.
+        """
+        with self._lock:
+            self.maxsize = maxsize
+            self._trim()
+
+    def closeAll(self):
+        """Closes all idle handles, handles in use are closed when released."""
+        with self._lock:
+            while self._idle:
+                self._close(self._idle.popitem(last=False)[0])
+
+    def forget(self):
+        """Drops all handles without closing them, used in forked workers that must not share the parent's files."""
+        self._handles = {}
+        self._idle = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _trim(self):
+        while len(self._idle) > self.maxsize:
+            self._close(self._idle.popitem(last=False)[0])
+
+    def _close(self, key):
+        dataNC, _ = self._handles.pop(key)
+        if dataNC.isopen():
+            dataNC.close()
+
+
+# The pool used by all readers.
+HANDLE_POOL = DatasetPool()
+
+# Forked read workers start with an empty pool instead of the parent's open files.
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=HANDLE_POOL.forget)
+
+
+def setPoolSize(maxsize):
+    """
+    Sets the number of idle granules the readers keep open for reuse.
+
+    Args:
+        maxsize (int): The pool size, 0 to close every file after reading.
+
+    Returns:
+        DatasetPool: The pool used by the readers.
+    """
+    HANDLE_POOL.resize(maxsize)
+    return HANDLE_POOL
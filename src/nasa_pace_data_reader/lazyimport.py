@@ -0,0 +1,38 @@
+"""
+Deferred imports for the heavy plotting dependencies of the NASA PACE Data Reader library.
+
+Importing matplotlib, cartopy and scipy takes longer than reading a granule, so the modules
+that plot refer to them through :class:`LazyModule` proxies. The real module is imported on
+the first attribute access, e.g. ``plt.figure()``, and pure reading jobs never load it.
+"""
+
+# Standard library imports for importing modules by name.
+import importlib
+
+
+class LazyModule:
+    """
+    A stand-in for a module that is imported on first use.
+    """
+
+    def __init__(self, name):
+        """
+        Initializes the proxy.
+
+        Args:
+            name (str): The full module name, e.g. 'matplotlib.pyplot'.
+        """
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f'<LazyModule {self._name} ({state})>'
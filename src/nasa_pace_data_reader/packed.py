@@ -0,0 +1,303 @@
+"""
+Packed-integer variables with deferred decoding for the NASA PACE Data Reader library.
+
+Variables stored as integers with ``scale_factor``/``add_offset`` are expanded by netCDF4 to
+floating point on read. With ``arrays='packed'`` the readers return them as
+:class:`PackedArray` instead: the raw integers and the packing attributes. Slicing stays on
+the raw data, statistics and histograms run on the integers, and arithmetic decodes the
+operands block by block, so sweeps over many granules touch 2-byte instead of 8-byte data::
+
+    data = L2.L2().read(fileName, arrays='packed')
+    counts, edges = data['aot'].histogram(bins=50, range=(0, 2))
+    aot = np.asarray(data['aot'])     # decoded, NaN at the fill values
+"""
+
+# Third-party imports for array handling and the NetCDF default fill values.
+import numpy as np
+from numpy.lib.mixins import NDArrayOperatorsMixin
+from netCDF4 import default_fillvals # type: ignore
+
+# The approximate size of the blocks decoded at once by arithmetic and reductions.
+BLOCK_BYTES = 16*2**20
+
+
+def isPacked(variable):
+    """
+    Checks whether a variable is stored packed.
+
+    Args:
+        variable (netCDF4.Variable): The variable.
+
+    Returns:
+        bool: True for integer variables with a scale_factor or add_offset attribute.
+    """
+    attributes = variable.ncattrs()
+    return variable.dtype.kind in 'iu' and ('scale_factor' in attributes or 'add_offset' in attributes)
+
+
+def packingAttributes(variable):
+    """
+    Collects the attributes needed to decode a packed variable, as netCDF4 interprets them.
+
+    Args:
+        variable (netCDF4.Variable): The packed variable.
+
+    Returns:
+        dict: The scale_factor, add_offset, raw fill values and raw valid range.
+    """
+    attributes = variable.ncattrs()
+    fill_values = []
+    if '_FillValue' in attributes:
+        fill_values.append(variable.getncattr('_FillValue'))
+    elif variable.dtype.str[1:] in default_fillvals and variable.dtype.itemsize > 1:
+        fill_values.append(default_fillvals[variable.dtype.str[1:]])
+    if 'missing_value' in attributes:
+        fill_values += list(np.atleast_1d(variable.getncattr('missing_value')))
+
+    valid_range = None
+    if 'valid_range' in attributes:
+        valid_range = tuple(variable.getncattr('valid_range'))
+    elif 'valid_min' in attributes or 'valid_max' in attributes:
+        valid_range = (variable.getncattr('valid_min') if 'valid_min' in attributes else None,
+                       variable.getncattr('valid_max') if 'valid_max' in attributes else None)
+
+    return {'scale_factor': variable.getncattr('scale_factor') if 'scale_factor' in attributes else 1.0,
+            'add_offset': variable.getncattr('add_offset') if 'add_offset' in attributes else 0.0,
+            'fill_values': tuple(fill_values), 'valid_range': valid_range}
+
+
+def readPacked(variable, key=slice(None)):
+    """
+    Reads the raw integers of a packed variable.
+
+    Args:
+        variable (netCDF4.Variable): The packed variable.
+        key (tuple, optional): The hyperslab to read. Defaults to the full variable.
+
+    Returns:
+        PackedArray: The raw values with their packing attributes.
+    """
+    variable.set_auto_maskandscale(False)
+    try:
+        raw = variable[key]
+    finally:
+        variable.set_auto_maskandscale(True)
+    return PackedArray(np.asarray(raw), name=variable.name, **packingAttributes(variable))
+
+
+class PackedArray(NDArrayOperatorsMixin):
+    """
+    The raw integers of a packed variable, decoded only when the values are needed.
+    """
+
+    def __init__(self, raw, scale_factor=1.0, add_offset=0.0, fill_values=(), valid_range=None, name=None):
+        """
+        Initializes the packed array.
+
+        Args:
+            raw (np.ndarray): The stored integers.
+            scale_factor (float, optional): The scale factor. Defaults to 1.
+            add_offset (float, optional): The offset. Defaults to 0.
+            fill_values (tuple, optional): The raw values marking missing data. Defaults to ().
+            valid_range (tuple, optional): The raw (min, max) of valid data, either may be None. Defaults to None.
+            name (str, optional): The variable name. Defaults to None.
+        """
+        self.raw = raw
+        self.scale_factor = scale_factor
+        self.add_offset = add_offset
+        self.fill_values = fill_values
+        self.valid_range = valid_range
+        self.name = name
+        # decode to the type of the packing attributes, as netCDF4 does
+        self.dtype = np.result_type(np.asarray(scale_factor).dtype, np.asarray(add_offset).dtype)
+        if self.dtype.kind != 'f':
+            self.dtype = np.dtype(np.float32)
+
+    @property
+    def shape(self):
+        return self.raw.shape
+
+    @property
+    def ndim(self):
+        return self.raw.ndim
+
+    @property
+    def size(self):
+        return self.raw.size
+
+    @property
+    def nbytes(self):
+        """int: The size of the raw integers."""
+        return self.raw.nbytes
+
+    def __len__(self):
+        return len(self.raw)
+
+    def __repr__(self):
+        return (f'<PackedArray {self.name} {self.shape} {self.raw.dtype} -> {self.dtype}, '
+                f'scale_factor={self.scale_factor}, add_offset={self.add_offset}>')
+
+    def __getitem__(self, key):
+        """Slices the raw integers, single elements are decoded."""
+        raw = self.raw[key]
+        if np.ndim(raw) == 0:
+            return self.decodeValues(np.asarray(raw), np.nan)[()]
+        return PackedArray(raw, self.scale_factor, self.add_offset, self.fill_values, self.valid_range, self.name)
+
+    def valid(self, raw=None):
+        """
+        Finds the valid values.
+
+        Args:
+            raw (np.ndarray, optional): Raw values to test. Defaults to the whole array.
+
+        Returns:
+            np.ndarray: Boolean array, True where the value is not a fill value and inside the valid range.
+        """
+        raw = self.raw if raw is None else raw
+        valid = np.ones(raw.shape, dtype=bool)
+        for fill_value in self.fill_values:
+            valid &= raw != fill_value
+        if self.valid_range is not None:
+            low, high = self.valid_range
+            if low is not None:
+                valid &= raw >= low
+            if high is not None:
+                valid &= raw <= high
+        return valid
+
+    def decodeValues(self, raw, fill_value=np.nan, dtype=None):
+        """Decodes raw values, invalid ones become fill_value."""
+        values = raw.astype(dtype or self.dtype)
+        values *= self.scale_factor
+        values += self.add_offset
+        values[~self.valid(raw)] = fill_value
+        return values
+
+    def decode(self, fill_value=np.nan, dtype=None):
+        """
+        Decodes the whole array.
+
+        Args:
+            fill_value (float, optional): The value for invalid entries. Defaults to NaN.
+            dtype (np.dtype, optional): The decoded type. Defaults to the type of the packing attributes.
+
+        Returns:
+            np.ndarray: The physical values.
+        """
+        return self.decodeValues(self.raw, fill_value, dtype)
+
+    def masked(self):
+        """
+        Decodes the whole array as netCDF4 would.
+
+        Returns:
+            np.ma.MaskedArray: The physical values, masked at the invalid entries.
+        """
+        return np.ma.MaskedArray(self.decode(fill_value=0), mask=~self.valid())
+
+    def blocks(self):
+        """
+        Splits the first axis into blocks of about BLOCK_BYTES of decoded data.
+
+        Returns:
+            generator: Slices of the first axis.
+        """
+        if self.ndim == 0:
+            yield Ellipsis
+            return
+        row_bytes = max(int(np.prod(self.shape[1:], dtype=np.int64))*self.dtype.itemsize, 1)
+        step = max(BLOCK_BYTES//row_bytes, 1)
+        for start in range(0, self.shape[0], step):
+            yield slice(start, start + step)
+
+    def __array__(self, dtype=None, copy=None):
+        return self.decode(dtype=dtype)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        """Applies numpy functions to the decoded values, block by block for element-wise calls."""
+        arrays = [x for x in inputs if np.ndim(x) > 0]
+        blockwise = (method == '__call__' and ufunc.nout == 1 and 'out' not in kwargs and self.ndim > 0
+                     and all(isinstance(x, (PackedArray, np.ndarray)) and x.shape == self.shape for x in arrays))
+        if not blockwise:
+            decoded = [x.decode() if isinstance(x, PackedArray) else x for x in inputs]
+            return getattr(ufunc, method)(*decoded, **kwargs)
+
+        out = None
+        for rows in self.blocks():
+            part = ufunc(*[x[rows].decode() if isinstance(x, PackedArray) else (x[rows] if np.ndim(x) > 0 else x)
+                           for x in inputs], **kwargs)
+            if out is None:
+                out = np.empty(self.shape, dtype=part.dtype)
+            out[rows] = part
+        return out
+
+    def min(self):
+        """Returns the smallest valid value, computed on the raw integers."""
+        raw = self.raw[self.valid()]
+        if raw.size == 0:
+            return np.nan
+        return self.decodeValues(np.asarray(raw.min() if self.scale_factor >= 0 else raw.max()))[()]
+
+    def max(self):
+        """Returns the largest valid value, computed on the raw integers."""
+        raw = self.raw[self.valid()]
+        if raw.size == 0:
+            return np.nan
+        return self.decodeValues(np.asarray(raw.max() if self.scale_factor >= 0 else raw.min()))[()]
+
+    def count(self):
+        """Returns the number of valid values."""
+        return int(sum(np.count_nonzero(self.valid(self.raw[rows])) for rows in self.blocks()))
+
+    def sum(self):
+        """Returns the sum of the valid values, accumulated on the raw integers."""
+        total, count = 0, 0
+        for rows in self.blocks():
+            raw = self.raw[rows]
+            raw = raw[self.valid(raw)]
+            total += int(raw.sum(dtype=np.int64))
+            count += raw.size
+        return float(self.scale_factor)*total + float(self.add_offset)*count
+
+    def mean(self):
+        """Returns the mean of the valid values."""
+        count = self.count()
+        return self.sum()/count if count else np.nan
+
+    def histogram(self, bins=10, range=None):
+        """
+        Computes the histogram of the valid values.
+
+        Small integer types are counted per raw value with np.bincount, so no decoded copy of the
+        data is made.
+
+        Args:
+            bins (int or sequence, optional): As for np.histogram. Defaults to 10.
+            range (tuple, optional): The (min, max) of the bins in physical units. Defaults to the data range.
+
+        Returns:
+            tuple: (counts, bin_edges), as np.histogram.
+        """
+        if range is None and np.ndim(bins) == 0:
+            range = (self.min(), self.max())
+        if self.raw.dtype.itemsize <= 2:
+            info = np.iinfo(self.raw.dtype)
+            codes = np.arange(info.min, info.max + 1, dtype=np.int64)
+            counts = np.zeros(codes.size, dtype=np.int64)
+            for rows in self.blocks():
+                raw = self.raw[rows]
+                raw = raw[self.valid(raw)].astype(np.int64) - info.min
+                counts += np.bincount(raw.ravel(), minlength=codes.size)
+            used = counts > 0
+            values = self.decodeValues(codes[used].astype(self.raw.dtype))
+            # weighted counts come back as float64, np.histogram itself counts in integers
+            hist, edges = np.histogram(values, bins=bins, range=range, weights=counts[used])
+            return hist.astype(np.int64), edges
+
+        counts, edges = None, None
+        for rows in self.blocks():
+            block = self[rows].decode()
+            part, edges = np.histogram(block[np.isfinite(block)], bins=bins if edges is None else edges, range=range)
+            counts = part if counts is None else counts + part
+        return counts, edges
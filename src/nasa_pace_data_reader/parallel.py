@@ -0,0 +1,250 @@
+"""
+Parallel reads within one granule for the NASA PACE Data Reader library.
+
+A single OCI or SPEXone L1C granule holds several large cubes, and decompressing them one
+after the other dominates the read. With ``workers=`` the readers hand the variables to a
+:class:`BlockReader` instead: large variables are split into blocks of rows, every block is
+read by a worker process with its own handle of the file, and the blocks are joined again
+before the usual conversion and caching. Variables smaller than one block are read directly
+by the caller, since sending them through a worker costs more than it saves::
+
+    l1c_dict = L1.L1C('OCI').read(fileName, workers=4)
+
+The netCDF library is not thread-safe, so the blocks are read in processes and their values
+are sent back to the caller, which costs a copy of the data.
+"""
+
+# Standard library imports for the worker processes.
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Third-party imports for array handling.
+import numpy as np
+
+# Local imports for the handles, the raw reads and the decoding of the joined blocks.
+from .handles import HANDLE_POOL, setPoolSize
+from .packed import PackedArray, isPacked, readPacked
+from .granule import decodeVariable
+from .subset import toIndexer
+from .cache import variablePath, isCached
+
+# The approximate size of the blocks read by one worker.
+BLOCK_BYTES = 32*2**20
+
+
+def startWorker():
+    """Keeps the granule open in the worker between blocks."""
+    setPoolSize(1)
+
+
+def readBlock(filename, path, key, packed):
+    """
+    Reads one block of a variable, run in a worker process.
+
+    Args:
+        filename (str): The path to the granule.
+        path (str): The full name of the variable, e.g. '/observation_data/i'.
+        key (tuple): The hyperslab of the block.
+        packed (bool): True to read the raw packed integers.
+
+    Returns:
+        np.ndarray or PackedArray: The values of the block.
+    """
+    with HANDLE_POOL.dataset(filename) as dataNC:
+        variable = dataNC[path]
+        return readPacked(variable, key) if packed else variable[key]
+
+
+def selectionBytes(variable, key):
+    """
+    Returns the size of a hyperslab of a variable in bytes.
+
+    Args:
+        variable (netCDF4.Variable): The variable.
+        key (tuple): The per-dimension indexers, None for the full variable.
+
+    Returns:
+        int: The number of bytes of the selected values.
+    """
+    key = tuple(slice(None) for _ in variable.shape) if key is None else key
+    sizes = [np.arange(size)[indexer].size for size, indexer in zip(variable.shape, key)]
+    return variable.dtype.itemsize*int(np.prod(sizes, dtype=np.int64))
+
+
+def splitKey(variable, key, block_bytes=BLOCK_BYTES):
+    """
+    Splits a hyperslab along its first dimension into blocks of about block_bytes.
+
+    Block boundaries follow the chunks of the variable, so no chunk is decompressed by two workers.
+
+    Args:
+        variable (netCDF4.Variable): The variable.
+        key (tuple): The per-dimension indexers, None for the full variable.
+        block_bytes (int, optional): The target size of a block. Defaults to BLOCK_BYTES.
+
+    Returns:
+        list: The hyperslabs of the blocks, in order along the first kept dimension.
+    """
+    key = tuple(slice(None) for _ in variable.shape) if key is None else key
+    positions = [np.arange(size)[indexer] for size, indexer in zip(variable.shape, key)]
+    axes = [axis for axis, indexer in enumerate(key) if not isinstance(indexer, (int, np.integer))]
+    if not axes:
+        return [key]
+
+    # split the first dimension that is kept in the result, its blocks are joined along axis 0
+    axis = axes[0]
+    row_bytes = variable.dtype.itemsize*int(np.prod([len(positions[a]) for a in axes[1:]], dtype=np.int64))
+    step = max(block_bytes//max(row_bytes, 1), 1)
+    rows = positions[axis]
+    if len(rows) <= step:
+        return [key]
+
+    if np.all(np.diff(rows) > 0):
+        # cut at chunk boundaries of the file, with the step scaled to the spacing of the selected rows
+        file_step = max(step*int(rows[-1] - rows[0] + 1)//len(rows), 1)
+        chunking = variable.chunking()
+        if chunking != 'contiguous':
+            file_step = max(file_step//chunking[axis], 1)*chunking[axis]
+        starts = [0] + (np.flatnonzero(np.diff(rows//file_step)) + 1).tolist()
+    else:
+        starts = list(range(0, len(rows), step))
+    return [key[:axis] + (toIndexer(rows[start:stop]),) + key[axis + 1:]
+            for start, stop in zip(starts, starts[1:] + [len(rows)])]
+
+
+def joinBlocks(blocks):
+    """
+    Joins the blocks of a variable along the first axis.
+
+    Args:
+        blocks (list): The values of the blocks.
+
+    Returns:
+        np.ndarray or PackedArray: The values of the whole hyperslab.
+    """
+    if len(blocks) == 1:
+        return blocks[0]
+    first = blocks[0]
+    if isinstance(first, PackedArray):
+        return PackedArray(np.concatenate([block.raw for block in blocks]), first.scale_factor, first.add_offset,
+                           first.fill_values, first.valid_range, first.name)
+    if np.ma.isMaskedArray(first):
+        joined = np.ma.concatenate(blocks)
+        joined.fill_value = first.fill_value
+        return joined
+    return np.concatenate(blocks)
+
+
+class PendingVariable:
+    """
+    A variable whose blocks are being read by a BlockReader, without blocks it is read on resolve.
+    """
+
+    def __init__(self, variable, key, arrays, masks, name, cache_dir, futures):
+        self._variable = variable
+        self._key = key
+        self._arrays = arrays
+        self._masks = masks
+        self._cache_dir = cache_dir
+        self._futures = futures
+        self.name = name or variable.name
+
+    def __repr__(self):
+        done = sum(future.done() for future in self._futures)
+        return f'<PendingVariable {self.name} ({done}/{len(self._futures)} blocks read)>'
+
+    def result(self):
+        """
+        Waits for the blocks and decodes the variable.
+
+        Returns:
+            np.ndarray or PackedArray: The decoded data, as readVariable returns it.
+        """
+        if not self._futures:
+            return decodeVariable(self._variable, self._key, self._arrays, self._masks, self.name, self._cache_dir)
+        return decodeVariable(self._variable, self._key, self._arrays, self._masks, self.name, self._cache_dir,
+                              read=lambda: joinBlocks([future.result() for future in self._futures]))
+
+
+class BlockReader:
+    """
+    Reads the variables of one granule concurrently in worker processes.
+    """
+
+    def __init__(self, filename, workers=None, block_bytes=BLOCK_BYTES):
+        """
+        Initializes the reader, the worker processes are started by the first read.
+
+        Args:
+            filename (str): The path to the granule.
+            workers (int, optional): The number of worker processes. Defaults to the number of CPUs.
+            block_bytes (int, optional): The approximate size of the blocks. Defaults to BLOCK_BYTES.
+        """
+        self.filename = os.path.abspath(filename)
+        self.workers = os.cpu_count() if workers is None else workers
+        self.block_bytes = block_bytes
+        self._executor = None
+
+    def __repr__(self):
+        return f'<BlockReader {self.filename} ({self.workers} workers)>'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def submit(self, variable, key=None, arrays='masked', masks=None, name=None, cache_dir=None):
+        """
+        Starts reading a variable.
+
+        Args:
+            variable (netCDF4.Variable): The variable to read.
+            key (tuple, optional): The hyperslab. Defaults to the full variable.
+            arrays (str, optional): One of granule.ARRAY_TYPES. Defaults to 'masked'.
+            masks (dict, optional): The granule masks for arrays='bitmask'. Defaults to None.
+            name (str, optional): The key of the variable in the granule. Defaults to the variable name.
+            cache_dir (str, optional): The disk cache directory. Defaults to None.
+
+        Returns:
+            PendingVariable or np.ndarray: The pending read, or the decoded data if it is cached.
+        """
+        packed = arrays == 'packed' and isPacked(variable)
+        if isCached(variable, key, packed, cache_dir):
+            return decodeVariable(variable, key, arrays, masks, name, cache_dir)
+
+        # variables below a block are cheaper to read here than to send through a worker,
+        # they are still decoded by resolve so the shared masks keep the order of a sequential read
+        if selectionBytes(variable, key) < self.block_bytes:
+            return PendingVariable(variable, key, arrays, masks, name, cache_dir, [])
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=startWorker)
+        path = variablePath(variable)
+        futures = [self._executor.submit(readBlock, self.filename, path, block, packed)
+                   for block in splitKey(variable, key, self.block_bytes)]
+        return PendingVariable(variable, key, arrays, masks, name, cache_dir, futures)
+
+    def resolve(self, data):
+        """
+        Replaces the pending variables of a reader's output by their decoded values.
+
+        The variables are decoded in the order they were stored, so shared bitmask masks are
+        assigned as in a sequential read.
+
+        Args:
+            data (dict): The reader output, updated in place.
+
+        Returns:
+            dict: data.
+        """
+        for key, value in data.items():
+            if isinstance(value, PendingVariable):
+                data[key] = value.result()
+        return data
+
+    def close(self):
+        """Stops the worker processes, blocks not yet read are cancelled."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
@@ -1,17 +1,41 @@
-# Standard library and third-party imports for data handling, plotting, and scientific computation.
+# Standard library and third-party imports for data handling.
 import os
 import numpy as np
-from scipy import interpolate
 
-# Matplotlib and related imports for creating plots.
-from matplotlib import pyplot as plt
-import matplotlib.ticker as mticker
-from mpl_toolkits.axes_grid1 import make_axes_locatable
+# Matplotlib and cartopy are only imported on first use, so reading jobs do not pay for them.
+from .lazyimport import LazyModule
+mticker = LazyModule('matplotlib.ticker')
+ccrs = LazyModule('cartopy.crs')
+gridliner = LazyModule('cartopy.mpl.gridliner')
 
-# Cartopy imports for geographical map projections.
-import cartopy.crs as ccrs
-import cartopy.feature as cfeature
-from cartopy.mpl.gridliner import LONGITUDE_FORMATTER, LATITUDE_FORMATTER
+# Local imports for the swath regridding engine.
+from .regrid import Regridder, BinAverager, INDEX_CACHE
+from .regrid import projectedExtent, projectedCoordinates, projectionGrid, rasterShape, mapProjection
+
+# Local imports for the opt-in profiling spans.
+from .profiling import span, profiled
+
+# Local imports for the matplotlib-free quicklooks, the cached map backgrounds and the figures.
+from . import quicklook
+from .backgrounds import BACKGROUND_CACHE, drawFeatures
+from .figures import newFigure, showFigure, styleFigure
+
+
+def isInvalid(values):
+    """
+    Finds the fill values of a variable read as a masked array or as a NaN-filled array.
+
+    Args:
+        values (np.ndarray): The variable.
+
+    Returns:
+        np.ndarray: Boolean array, True at masked or NaN entries.
+    """
+    invalid = np.ma.getmaskarray(values)
+    data = np.ma.getdata(values)
+    if data.dtype.kind == 'f':
+        invalid = invalid | np.isnan(data)
+    return invalid
 
 class Plot:
     """
@@ -53,28 +77,22 @@ class Plot:
         self.reflectance = False
         self.verbose = False
         self.plotAll = False
+        self.regridCache = INDEX_CACHE  # shared cache of swath-to-grid index maps, None to disable
+        self.backgroundCache = BACKGROUND_CACHE  # shared cache of rendered map features, None to draw vectors
         self.setPlotStyle()
 
 
     def setPlotStyle(self,font=None):
         """
-        Sets the global plotting style for matplotlib.
+        Sets the plotting style of the figures of this object.
+
+        The style is applied to every figure when it is drawn (see figures.PLOT_STYLE), matplotlib's
+        global rcParams are not changed.
 
         Args:
             font (str, optional): The font family to use for plots. Defaults to None.
         """
-        plt.rcParams.update({
-                    'xtick.direction': 'in',
-                    'ytick.direction': 'in',
-                    'ytick.right': 'True',
-                    'xtick.top': 'True',
-                    'mathtext.fontset': 'cm',
-                    'figure.dpi': self.plotDPI,
-                    'axes.unicode_minus': False,
-        })
-
-        if font:
-            plt.rcParams.update({'font.family':font})
+        self.plotFont = font
 
 
     def setBandAngles(self, band=None):
@@ -142,7 +160,6 @@ class Plot:
         """
         self.plotDPI = dpi if dpi is not None else None
         print('setting dpi to %d ppi' %self.plotDPI)
-        plt.rcParams['figure.dpi'] = self.plotDPI
 
 
     def setInstrument(self, instrument=None):
@@ -184,7 +201,7 @@ class Plot:
 
     def plotPixel(self, x, y, dataVar='i', xAxis=None, xlim=None, ylim=None,
                   axis=None, axisLabel=True, returnHandle=False, title=True,
-                  maskFlag=True,
+                  maskFlag=True, noShow=False,
                     **kwargs):
         """
         Plots the data for a single pixel.
@@ -201,6 +218,7 @@ class Plot:
             returnHandle (bool, optional): Whether to return the figure and axes handles. Defaults to False.
             title (bool, optional): Whether to show the plot title. Defaults to True.
             maskFlag (bool, optional): Whether to apply a mask to the data. Defaults to True.
+            noShow (bool, optional): If True, the figure is built outside pyplot and not displayed. Defaults to False.
             **kwargs: Additional keyword arguments for the plot.
         """
         xAxis = self.xAxis if xAxis is None else xAxis
@@ -208,16 +226,20 @@ class Plot:
         xData_, dataVar_, unit_ = self.physicalQuantity(x, y, dataVar, xAxis=xAxis, maskFlag=maskFlag)
 
         # Plot the data
-        fig_, ax_ = plt.subplots(figsize=(6, 4)) if axis is None else (None, axis)
+        if axis is None:
+            fig_ = newFigure(figsize=(6, 4), dpi=self.plotDPI, show=not noShow)
+            ax_ = fig_.add_subplot()
+        else:
+            fig_, ax_ = None, axis
         ax_.plot(xData_, dataVar_, **kwargs)
         if axisLabel:
-            plt.xlabel(xAxis)
+            ax_.set_xlabel(xAxis)
             if unit_:
-                plt.ylabel(f'{dataVar}{unit_}')
+                ax_.set_ylabel(f'{dataVar}{unit_}')
             elif dataVar != 'dolp':
-                plt.ylabel(r'R$_{%s} % dataVar')
+                ax_.set_ylabel(r'R$_{%s} % dataVar')
             elif dataVar == 'dolp':
-                plt.ylabel(dataVar)
+                ax_.set_ylabel(dataVar)
 
         # if oci, plot linear+log  in x axis
         if self.instrument == 'OCI' and xAxis == 'intensity_wavelength':
@@ -232,9 +254,11 @@ class Plot:
 
         if title:
             titleStr = f'{self.data["date_time"]} Pixel ({x}, {y}) of the instrument {self.instrument}'
-            plt.title(titleStr)
+            ax_.set_title(titleStr)
 
-        plt.show()
+        styleFigure(ax_.figure, self.plotFont, axes=[ax_])
+        if not noShow:
+            showFigure(ax_.figure)
 
         if returnHandle:
             return fig_, ax_
@@ -275,7 +299,7 @@ class Plot:
 
                 if self.bandAngles is not None:
                     for i in self.bandAngles:
-                        if self.data[dataVar] is not None and not np.all(np.ma.getmask(self.data[dataVar][x, y, self.bandAngles[i], self.wavIndex])):
+                        if self.data[dataVar] is not None and not np.all(isInvalid(self.data[dataVar][x, y, self.bandAngles[i], self.wavIndex])):
                             if maskFlag:
                                 dataVar_ = np.ma.getdata(self.data[dataVar][x, y, self.bandAngles[i], self.wavIndex])*np.pi/self.data['F0'][self.bandAngles[i], self.wavIndex]
                             else:
@@ -286,7 +310,7 @@ class Plot:
                 if self.bandAngles is not None:
                     for i in self.bandAngles:
                         # check if the data is masked, for the case of OCI only one viewing angle at a time
-                        if not np.all(np.ma.getmask(self.data[dataVar][x, y, self.bandAngles[i], self.wavIndex])):
+                        if not np.all(isInvalid(self.data[dataVar][x, y, self.bandAngles[i], self.wavIndex])):
                             dataVar_ = self.data[dataVar][x, y, self.bandAngles[i], self.wavIndex]
                             continue
                 # check any valid data found
@@ -316,13 +340,14 @@ class Plot:
 
         return xData_, dataVar_, unit_
 
-    def setFigure(self, figsize=(10, 5), **kwargs):
+    def setFigure(self, figsize=(10, 5), show=True, **kwargs):
         """
         Sets up the figure and subplots for multi-variable plots.
 
         Args:
             figsize (tuple, optional): The size of the figure. Defaults to (10, 5).
-            **kwargs: Additional keyword arguments for plt.subplots.
+            show (bool, optional): False to build the figure outside pyplot. Defaults to True.
+            **kwargs: Additional keyword arguments for Figure.subplots.
 
         Returns:
             tuple: A tuple containing the figure and axes objects.
@@ -331,14 +356,16 @@ class Plot:
         if self.plotAll:
             # define the number of subplots
             print(f'...Setting the subplots with number of bands {len(self.bands2plot)} and number of variables {len(self.vars2plot)}')
-            fig_, ax_ = plt.subplots(nrows = len(self.vars2plot), 
-                                     ncols=len(self.bands2plot),
-                                     figsize=figsize, sharex=True, **kwargs)
+            fig_ = newFigure(figsize=figsize, dpi=self.plotDPI, show=show)
+            ax_ = fig_.subplots(nrows = len(self.vars2plot), 
+                                ncols=len(self.bands2plot),
+                                sharex=True, **kwargs)
             
             return fig_, ax_
         else:
             # create a single plot when not plotting all
-            fig_, ax_ = plt.subplots(figsize=figsize, **kwargs)
+            fig_ = newFigure(figsize=figsize, dpi=self.plotDPI, show=show)
+            ax_ = fig_.subplots(**kwargs)
             return fig_, ax_
 
 
@@ -346,7 +373,7 @@ class Plot:
     # plot all bands in a single plot
     def plotPixelVars(self, x, y, xAxis='scattering_angle',
                      bands = None, saveFig=False,
-                     axis=None, axisLabel=True, showUnit=True,
+                     axis=None, axisLabel=True, showUnit=True, noShow=False,
                     **kwargs):
         """
         Plots multiple variables for a single pixel across different bands.
@@ -360,6 +387,7 @@ class Plot:
             axis (matplotlib.axes.Axes, optional): An existing axes to plot on. Defaults to None.
             axisLabel (bool, optional): Whether to show axis labels. Defaults to True.
             showUnit (bool, optional): Whether to show the units on the y-axis. Defaults to True.
+            noShow (bool, optional): If True, the figure is built outside pyplot and not displayed. Defaults to False.
             **kwargs: Additional keyword arguments for the plot.
         """
         assert xAxis in ['scattering_angle', 'view_angles'], 'Invalid x-axis variable'
@@ -381,9 +409,10 @@ class Plot:
 
             # Calculate the figure size to keep a good aspect ratio
             figsize = (subplot_size[0] * cols, subplot_size[1] * rows)
-            figAll, axAll = self.setFigure(figsize=figsize) # type: ignore
+            figAll, axAll = self.setFigure(figsize=figsize, show=not noShow) # type: ignore
         else:
             axAll = axis
+            figAll = np.ravel(axAll)[0].figure
 
         # define color strings based on the length of the bands try to preserve the color
         colors = ['C%d' %i for i in range(cols)]
@@ -421,9 +450,11 @@ class Plot:
                 if axisLabel and i == len(self.vars2plot)-1:
                     axAll[i,j].set_xlabel(xAxis)
 
-        plt.suptitle(f'{self.data["date_time"]} Pixel ({x}, {y}) of the instrument {self.instrument}')
-        plt.tight_layout()
-        plt.show()
+        figAll.suptitle(f'{self.data["date_time"]} Pixel ({x}, {y}) of the instrument {self.instrument}')
+        styleFigure(figAll, self.plotFont)
+        figAll.tight_layout()
+        if not noShow:
+            showFigure(figAll)
 
         # if SPEXOne, change the band back to all
         if self.instrument == 'SPEXone':
@@ -434,9 +465,10 @@ class Plot:
             location = f'./{self.instrument}_pixel_{x}_{y}.png'
             figAll.savefig(location, dpi=self.plotDPI)
 
+    @profiled('Plot.plotRGB')
     def plotRGB(self, var='i', viewAngleIdx=[38, 4, 84],
                  scale= 1, normFactor=200, returnRGB=False, autoNorm=False,
-                 plot=True, rgb_dolp=False, saveFig=False, **kwargs):
+                 plot=True, rgb_dolp=False, saveFig=False, savePath=None, **kwargs):
         """
         Creates and plots an RGB image.
 
@@ -450,6 +482,7 @@ class Plot:
             plot (bool, optional): Whether to display the plot. Defaults to True.
             rgb_dolp (bool, optional): Whether to create an RGB image from DoLP data. Defaults to False.
             saveFig (bool, optional): Whether to save the figure. Defaults to False.
+            savePath (str, optional): The path of the saved figure. Defaults to None, './<instrument>_RGB.png'.
             **kwargs: Additional keyword arguments for the plot.
         """
 
@@ -473,102 +506,110 @@ class Plot:
             # the viewAngleIdx is the index of the wavelength should be between 0 to 5
             assert np.all(np.array(idx) < 5), 'Invalid viewAngleIdx'
 
-        # Create a 3D array to store the RGB data
-        rgb = np.zeros((self.data[var].shape[0], self.data[var].shape[1], 3), dtype=np.float32)
+        with span('rgb', var=var):
+            # Create a 3D array to store the RGB data
+            rgb = np.zeros((self.data[var].shape[0], self.data[var].shape[1], 3), dtype=np.float32)
 
-        # if the instrument is HARP2
-        if self.instrument == 'HARP2':
-            if rgb_dolp:
-                rgb[:, :, 0] = self.data['i'][:,:,idx[0],0]*self.data[var][:,:,idx[0],0]
-                rgb[:, :, 1] = self.data['i'][:,:,idx[1],0]*self.data[var][:,:,idx[1],0]
-                rgb[:, :, 2] = self.data['i'][:,:,idx[2],0]*self.data[var][:,:,idx[2],0]
-            else:
-                rgb[:, :, 0] = self.data[var][:,:,idx[0],0]
-                rgb[:, :, 1] = self.data[var][:,:,idx[1],0]
-                rgb[:, :, 2] = self.data[var][:,:,idx[2],0]
-        elif self.instrument == 'OCI' or self.instrument == 'SPEXone':
-            # for the case of OCI, the variable is the intensity
-            if self.instrument == 'SPEXone' and var == 'dolp':
-                var_wav = 'polarization_wavelength'
-            else:
-                var_wav = 'intensity_wavelength'
-            # find wavelength index close tor R, G, B
-            #self.data['intensity_wavelength']-440
-            idxB = np.argmin(np.abs(self.data[var_wav]-440))
-            idxG = np.argmin(np.abs(self.data[var_wav]-550))
-            idxR = np.argmin(np.abs(self.data[var_wav]-670))
-            if var == 'dolp':
-                rgb[:, :, 0] = self.data['i'][:,:,idx[0],idxR]*self.data[var][:,:,idx[0],idxR]
-                rgb[:, :, 1] = self.data['i'][:,:,idx[1],idxG]*self.data[var][:,:,idx[1],idxG]
-                rgb[:, :, 2] = self.data['i'][:,:,idx[2],idxB]*self.data[var][:,:,idx[2],idxB]
-            else:
+            # if the instrument is HARP2
+            if self.instrument == 'HARP2':
+                if rgb_dolp:
+                    rgb[:, :, 0] = self.data['i'][:,:,idx[0],0]*self.data[var][:,:,idx[0],0]
+                    rgb[:, :, 1] = self.data['i'][:,:,idx[1],0]*self.data[var][:,:,idx[1],0]
+                    rgb[:, :, 2] = self.data['i'][:,:,idx[2],0]*self.data[var][:,:,idx[2],0]
+                else:
+                    rgb[:, :, 0] = self.data[var][:,:,idx[0],0]
+                    rgb[:, :, 1] = self.data[var][:,:,idx[1],0]
+                    rgb[:, :, 2] = self.data[var][:,:,idx[2],0]
+            elif self.instrument == 'OCI' or self.instrument == 'SPEXone':
+                # for the case of OCI, the variable is the intensity
+                if self.instrument == 'SPEXone' and var == 'dolp':
+                    var_wav = 'polarization_wavelength'
+                else:
+                    var_wav = 'intensity_wavelength'
+                # find wavelength index close tor R, G, B
+                #self.data['intensity_wavelength']-440
+                idxB = np.argmin(np.abs(self.data[var_wav]-440))
+                idxG = np.argmin(np.abs(self.data[var_wav]-550))
+                idxR = np.argmin(np.abs(self.data[var_wav]-670))
+                if var == 'dolp':
+                    rgb[:, :, 0] = self.data['i'][:,:,idx[0],idxR]*self.data[var][:,:,idx[0],idxR]
+                    rgb[:, :, 1] = self.data['i'][:,:,idx[1],idxG]*self.data[var][:,:,idx[1],idxG]
+                    rgb[:, :, 2] = self.data['i'][:,:,idx[2],idxB]*self.data[var][:,:,idx[2],idxB]
+                else:
                 
-                if self.instrument == 'SPEXone':
-                    rgb[:, :, 0] = self.data[var][:,:,idx[0],idxR]
-                    rgb[:, :, 1] = self.data[var][:,:,idx[1],idxG]
-                    rgb[:, :, 2] = self.data[var][:,:,idx[2],idxB]
-                else: # for OCI
-                    rgb[:, :, 0] = self.data[var][:,:,viewAngleIdx[0],idxR]
-                    rgb[:, :, 1] = self.data[var][:,:,viewAngleIdx[0],idxG]
-                    rgb[:, :, 2] = self.data[var][:,:,viewAngleIdx[0],idxB]
-
-        # Normalize the RGB image
-        if autoNorm:
-
-            # calculate the normFactor for each band
-            normFactor = np.zeros(3)
-
-            # normalize the RGB to 0-1
-            for rgbIdx in range(3):
-                # normalize the RGB to 0-1 using nanmin and nanmax
-                iMin = 10
-                iMax = np.nanpercentile(rgb[:, :, rgbIdx], 99)
-                rgb[:, :, rgbIdx] = (rgb[:, :, rgbIdx])/(iMax-iMin)
-        else:
-            # if normFactor is scalar, divide the RGB by the scalar else divide in a loop
-            if not isinstance(normFactor, (int, float)):
-                for i in range(3):
-                    if isinstance(scale, (int, float)):
-                        rgb[:, :, i] = rgb[:, :, i]/normFactor[i]*scale
-        
+                    if self.instrument == 'SPEXone':
+                        rgb[:, :, 0] = self.data[var][:,:,idx[0],idxR]
+                        rgb[:, :, 1] = self.data[var][:,:,idx[1],idxG]
+                        rgb[:, :, 2] = self.data[var][:,:,idx[2],idxB]
+                    else: # for OCI
+                        rgb[:, :, 0] = self.data[var][:,:,viewAngleIdx[0],idxR]
+                        rgb[:, :, 1] = self.data[var][:,:,viewAngleIdx[0],idxG]
+                        rgb[:, :, 2] = self.data[var][:,:,viewAngleIdx[0],idxB]
+
+            # Normalize the RGB image
+            if autoNorm:
+
+                # calculate the normFactor for each band
+                normFactor = np.zeros(3)
+
+                # normalize the RGB to 0-1
+                for rgbIdx in range(3):
+                    # normalize the RGB to 0-1 using nanmin and nanmax
+                    iMin = 10
+                    iMax = np.nanpercentile(rgb[:, :, rgbIdx], 99)
+                    rgb[:, :, rgbIdx] = (rgb[:, :, rgbIdx])/(iMax-iMin)
             else:
-                try:
-                    if isinstance(scale, (int, float)):
-                        rgb = rgb/normFactor*scale
-                    else:
-                        for i in range(3):
-                            rgb[:, :, i] = rgb[:, :, i]/normFactor*scale[i]
-                except Exception as e:
-                    print(f'...Error in normalizing the RGB image {e}')
-                    print('normFactor and scale shoulshould be an integer', normFactor)
-        # Floor the rgb values to 0-1
-        rgb = np.clip(rgb, 0, 1)
-
-        # Plot the RGB image
-        if plot:
-            plt.imshow(rgb, origin='lower')
+                # if normFactor is scalar, divide the RGB by the scalar else divide in a loop
+                if not isinstance(normFactor, (int, float)):
+                    for i in range(3):
+                        if isinstance(scale, (int, float)):
+                            rgb[:, :, i] = rgb[:, :, i]/normFactor[i]*scale
+        
+                else:
+                    try:
+                        if isinstance(scale, (int, float)):
+                            rgb = rgb/normFactor*scale
+                        else:
+                            for i in range(3):
+                                rgb[:, :, i] = rgb[:, :, i]/normFactor*scale[i]
+                    except Exception as e:
+                        print(f'...Error in normalizing the RGB image {e}')
+                        print('normFactor and scale shoulshould be an integer', normFactor)
+            # Floor the rgb values to 0-1, fill values of NaN-filled arrays become black like masked ones
+            rgb = np.clip(rgb, 0, 1)
+            rgb[np.isnan(rgb)] = 0
+
+        # Plot the RGB image, a figure that is only saved is built outside pyplot
+        if plot or saveFig:
+            fig = newFigure(dpi=self.plotDPI, show=plot)
+            ax = fig.add_subplot()
+            ax.imshow(rgb, origin='lower')
             if self.instrument == 'HARP2':
-                plt.title(f'{self.data["date_time"]} RGB image of the instrument {self.instrument} using "{var}" variable at angles {idx[0]}, {idx[1]}, {idx[2]}', fontsize=8)
+                ax.set_title(f'{self.data["date_time"]} RGB image of the instrument {self.instrument} using "{var}" variable at angles {idx[0]}, {idx[1]}, {idx[2]}', fontsize=8)
             elif self.instrument == 'OCI':
-                plt.title(f'{self.data["date_time"]} RGB image of the instrument {self.instrument} using "{var}" variable at angle {viewAngleIdx[0]}', fontsize=8)
+                ax.set_title(f'{self.data["date_time"]} RGB image of the instrument {self.instrument} using "{var}" variable at angle {viewAngleIdx[0]}', fontsize=8)
             elif self.instrument == 'SPEXone':
-                plt.title(f'{self.data["date_time"]} RGB image of the instrument {self.instrument} using "{var}" variable at angles {idx[0]}, {idx[1]}, {idx[2]}', fontsize=8)
-            plt.show()
+                ax.set_title(f'{self.data["date_time"]} RGB image of the instrument {self.instrument} using "{var}" variable at angles {idx[0]}, {idx[1]}, {idx[2]}', fontsize=8)
+            styleFigure(fig, self.plotFont)
+            if plot:
+                showFigure(fig)
 
         if returnRGB:
             self.rgb = rgb
 
         if saveFig:
-            location = f'./{self.instrument}_RGB.png'
-            plt.savefig(location, dpi=self.plotDPI)
+            location = savePath if savePath is not None else f'./{self.instrument}_RGB.png'
+            with span('savefig'):
+                fig.savefig(location, dpi=self.plotDPI)
             print(f'...RGB image saved at {location}')
 
     
+    @profiled('Plot.projectVar')
     def projectVar(self, var='i', viewAngleIdx=None, viewAngle= 0,
                    proj='PlateCarree', colorbar=True, varAlpha=1,
                    stockImage=False, level='L1C',idx_=1, saveFig=False,
                    lakes=True, rivers=False, figsize_=None, ax=None, dpi=300,
-                   highResStockImage=False,
+                   highResStockImage=False, noShow=False,
                    **kwargs):
         """ 
         Projects a single variable onto a geographical map using Cartopy.
@@ -590,6 +631,7 @@ class Plot:
             ax (matplotlib.axes.Axes, optional): An existing axes to plot on. Defaults to None.
             dpi (int, optional): The resolution of the figure. Defaults to 300.
             highResStockImage (bool, optional): Whether to use a high-resolution stock image. Defaults to False.
+            noShow (bool, optional): If True, the figure is built outside pyplot and not displayed. Defaults to False.
             **kwargs: Additional keyword arguments for the plot.
         """
 
@@ -645,14 +687,16 @@ class Plot:
         # Prepare figure and axes
         figsize_ = figsize if figsize_ is None else figsize_
         if ax is None:
-            fig = plt.figure(figsize=figsize_)
+            fig = newFigure(figsize=figsize_, dpi=self.plotDPI, show=not noShow)
+        else:
+            fig = ax.figure
         
         if proj == 'PlateCarree':
             if ax is None:
                 if transitionFlag:
-                    ax = plt.axes(projection=ccrs.PlateCarree(central_longitude=lon_center))
+                    ax = fig.add_subplot(projection=ccrs.PlateCarree(central_longitude=lon_center))
                 else:
-                    ax = plt.axes(projection=ccrs.PlateCarree())
+                    ax = fig.add_subplot(projection=ccrs.PlateCarree())
             else:
                 ax = ax
             # Set up gridlines and labels
@@ -661,40 +705,39 @@ class Plot:
             gl.xlabels_top = False
             gl.ylabels_right = False
             gl.xlocator = mticker.FixedLocator(np.around(np.linspace(np.nanmin(lon),np.nanmax(lon),6),2))
-            gl.xformatter = LONGITUDE_FORMATTER
-            gl.yformatter = LATITUDE_FORMATTER
+            gl.xformatter = gridliner.LONGITUDE_FORMATTER
+            gl.yformatter = gridliner.LATITUDE_FORMATTER
 
         elif proj == 'Orthographic':
-            ax = plt.axes(projection=ccrs.Orthographic(central_longitude=lon_center, central_latitude=lat_center))
+            ax = fig.add_subplot(projection=ccrs.Orthographic(central_longitude=lon_center, central_latitude=lat_center))
         else:
             print('Invalid projection method')
         
         # setup the gridlines
         if ax is not None:
-            ax.coastlines()
             ax.set_global()
             ax.set_extent([lon.min(), lon.max(), lat.min(), lat.max()], crs=ccrs.PlateCarree())
             if not highResStockImage:
-                ax.stock_img() if stockImage else ax.add_feature(cfeature.OCEAN, zorder=0)
-                ax.add_feature(cfeature.LAND, zorder=0, edgecolor='black')
+                underlays = ['stock' if stockImage else 'ocean', ('land', {'edgecolor': 'black'})]
             else:
-                ax.background_img(name='NaturalEarthRelief', resolution='high')
+                underlays = ['relief']
             # Add coastline feature
-            ax.add_feature(cfeature.COASTLINE, edgecolor='black', linewidth=1, alpha=0.5)
-            ax.add_feature(cfeature.LAKES, edgecolor='black', linewidth=1, alpha=0.5) if lakes else None
-            ax.add_feature(cfeature.RIVERS, edgecolor='black', linewidth=1, alpha=0.5) if rivers else None
+            line = {'edgecolor': 'black', 'linewidth': 1, 'alpha': 0.5}
+            overlays = [('coastline', line)] + [('lakes', line)]*lakes + [('rivers', line)]*rivers
+            with span('features'):
+                drawFeatures(ax, underlays, self.backgroundCache)
+                drawFeatures(ax, overlays, self.backgroundCache)
         
-        # plot the data with alpha value
-        if varAlpha:
-            kwargs['alpha'] = varAlpha
+        # plot the data with alpha value, the other keyword arguments style the gridlines
+        plot_kwargs = {'alpha': varAlpha} if varAlpha else {}
 
         # if reflectance is True, plot the reflectance
         if level.lower() == 'l1b':
             data_ = self.data[var][viewAngleIdx,:,:]
 
-            plt.contourf(lon, lat,
+            ax.contourf(lon, lat,
                             data_, 60,
-                            transform=ccrs.PlateCarree(), **kwargs)
+                            transform=ccrs.PlateCarree(), **plot_kwargs)
 
         else:
             if self.reflectance and var in ['i', 'q', 'u']:
@@ -703,9 +746,9 @@ class Plot:
             else:
                 data_ = self.data[var][:,:,viewAngleIdx,0]
 
-            plt.contourf(lon, lat,
+            ax.contourf(lon, lat,
                             data_, 60,
-                            transform=ccrs.PlateCarree(), **kwargs)
+                            transform=ccrs.PlateCarree(), **plot_kwargs)
         
         # select var and units
         var, unit_ = self.reflectanceChange(var) if self.reflectance else (var, self.data['_units'][var])
@@ -717,11 +760,14 @@ class Plot:
 
             # round the view angle to 2 decimal places
             ax.set_title(f'${var}{{({self.band})}}$ at {round(float(viewAngle), 2)}° viewing angle of the instrument {self.instrument}')
-            plt.show()
+            styleFigure(fig, self.plotFont)
+            if not noShow:
+                showFigure(fig)
 
             if saveFig:
                 location = f'./{self.instrument}_viewAngle_{viewAngle}.png'
-                fig.savefig(location, dpi=self.plotDPI)
+                with span('savefig'):
+                    fig.savefig(location, dpi=self.plotDPI)
                 print(f'...Figure saved at {location}')
 
     def reflectanceChange(self, var):
@@ -744,6 +790,7 @@ class Plot:
 
 
     # Plot projected RGB using Cartopy
+    @profiled('Plot.projectedRGB')
     def projectedRGB(self, rgb=None, scale=1, ax=None, fig=None,
                      var='i', viewAngleIdx=[36, 4, 84],
                      normFactor=200, proj='PlateCarree',
@@ -751,7 +798,7 @@ class Plot:
                      rgb_dolp=False, figsize=None, savePath=None, dpi=None, setTitle=True,
                      returnRGB=False, lon_0=None, lat_0=None, black_background=True,
                      proj_size=None, returnTransitionFlag=False, highResStockImage=False,
-                     **kwargs):
+                     regrid_method='nearest', native=False, **kwargs):
         """
         Plots a projected RGB image using Cartopy.
 
@@ -763,7 +810,8 @@ class Plot:
             var (str, optional): The variable to use for the RGB channels. Defaults to 'i'.
             viewAngleIdx (list, optional): The indices of the view angles for R, G, and B. Defaults to [36, 4, 84].
             normFactor (float, optional): A normalization factor for the RGB values. Defaults to 200.
-            proj (str, optional): The map projection. Defaults to 'PlateCarree'.
+            proj (str, optional): The map projection, 'PlateCarree', 'Orthographic', 'NorthPolarStereo',
+                                  'SouthPolarStereo' or 'None'. Defaults to 'PlateCarree'.
             saveFig (bool, optional): Whether to save the figure. Defaults to False.
             noShow (bool, optional): If True, the plot is not displayed. Defaults to False.
             rivers (bool, optional): Whether to draw rivers. Defaults to False.
@@ -780,9 +828,15 @@ class Plot:
             proj_size (tuple, optional): The size of the projected image. Defaults to None.
             returnTransitionFlag (bool, optional): Whether to return the dateline transition flag. Defaults to False.
             highResStockImage (bool, optional): Whether to use a high-resolution stock image. Defaults to False.
+            regrid_method (str, optional): 'nearest' or 'mean' (bin averaging, for coarse proj_size). Defaults to 'nearest'.
+            native (bool, optional): If True, regrid straight into the pixel grid of the map projection instead of
+                                     a lon/lat raster that cartopy warps again. The returned extent is then in
+                                     projection coordinates. Always used for the polar projections. Defaults to False.
             **kwargs: Additional keyword arguments for the plot.
         """
-        assert proj.lower() in ['platecarree', 'orthographic', 'none'], 'Invalid projection method currently only PlateCarree and Orthographic are supported'
+        assert proj.lower() in ['platecarree', 'orthographic', 'northpolarstereo', 'southpolarstereo', 'none'], \
+            'Invalid projection method currently only PlateCarree, Orthographic and the polar stereographic projections are supported'
+        native = native or proj.lower() in ['northpolarstereo', 'southpolarstereo']
         self.plotDPI = dpi if dpi is not None else self.plotDPI
         if self.instrument == 'OCI':
             if np.nanmean(self.data['latitude']) > 0:
@@ -816,41 +870,47 @@ class Plot:
 
         proj_size=(900,400) if proj_size is None else proj_size
 
-        if transitionFlag:
-            # Interpolate the RGB values onto a regular grid via function applying scale factor in advance
-            rgb_new, rgb_extent = self.GridRGB(lon, lat, dateline=True, proj_size=proj_size)
+        with span('regrid', method=regrid_method, native=native):
+            if native:
+                # Regrid straight into the pixels of the map projection, so cartopy draws the image without
+                # warping it a second time and no special handling of the dateline or the poles is needed
+                target_crs = self.mapProjection(proj, lon_center, lat_center)
+                rgb_new, rgb_extent = self.projectionRGB(target_crs, proj_size=proj_size, method=regrid_method)
 
-        else:
-            # rgb_new, rgb_extent = self.GridRGB(lon, lat, dateline=False, proj_size=proj_size)
-            rgb_new, nlon, nlat = self.meshgridRGB(lon, lat, return_mapdata=False, proj_size=proj_size) #Created projection image
-            rgb_extent = [nlon.min(), nlon.max(), nlat.min(), nlat.max()]         # type: ignore
+            elif transitionFlag:
+                # Interpolate the RGB values onto a regular grid via function applying scale factor in advance
+                rgb_new, rgb_extent = self.GridRGB(lon, lat, dateline=True, proj_size=proj_size, method=regrid_method)
+
+            else:
+                # rgb_new, rgb_extent = self.GridRGB(lon, lat, dateline=False, proj_size=proj_size)
+                rgb_new, nlon, nlat = self.meshgridRGB(lon, lat, return_mapdata=False, proj_size=proj_size, method=regrid_method) #Created projection image
+                rgb_extent = [nlon.min(), nlon.max(), nlat.min(), nlat.max()]         # type: ignore
 
         # Prepare figure and axes
         if ax is None and proj.lower() != 'none':
             print('...Creating a new figure')
             if figsize is None:
-                fig = plt.figure(figsize=(4, 5), dpi=self.plotDPI) if fig is None else fig
+                fig = newFigure(figsize=(4, 5), dpi=self.plotDPI, show=not noShow) if fig is None else fig
                 # print('...Setting the figure size to (4, 5)')
             else:
                 if fig is None:
                     print(f'...Creating a new figure with figsize {figsize}')
                     print(f'...Setting the figure dpi to {self.plotDPI}')
-                    fig = plt.figure(figsize=figsize, dpi=self.plotDPI)
+                    fig = newFigure(figsize=figsize, dpi=self.plotDPI, show=not noShow)
                 else:
                     fig = fig
                 # print(f'...Setting the figure size to {figsize}')
 
         # Check the projection type
-        if proj == 'Orthographic':
-            # Create an Orthographic projection
+        if proj in ['Orthographic', 'NorthPolarStereo', 'SouthPolarStereo']:
+            # Create an Orthographic (or polar) projection
             if ax is None:
-                ax = plt.axes(projection=ccrs.Orthographic(lon_center, lat_center))
+                ax = fig.add_subplot(projection=target_crs if native else ccrs.Orthographic(lon_center, lat_center))
             else:
                 ax = ax
-            if highResStockImage:
-                ax.background_img(name='BlueMarble', resolution='high')
-            else:
-                ax.stock_img()
+            with span('features'):
+                ax.set_global()
+                drawFeatures(ax, ['bluemarble' if highResStockImage else 'stock'], self.backgroundCache)
             if fig is not None:
                 fig.patch.set_facecolor('black')
 
@@ -858,16 +918,20 @@ class Plot:
             rgb_new = np.ma.masked_where(rgb_new == 0, rgb_new)
 
             # Display the image in the projection
-            ax.imshow(rgb_new, origin='lower',  extent=rgb_extent, transform=ccrs.PlateCarree(), **kwargs)
-            ax.add_feature(cfeature.COASTLINE, edgecolor='black', linewidth=0.2, alpha=0.5)
+            ax.imshow(rgb_new, origin='lower',  extent=rgb_extent, transform=target_crs if native else ccrs.PlateCarree(), **kwargs)
+            with span('features'):
+                drawFeatures(ax, [('coastline', {'edgecolor': 'black', 'linewidth': 0.2, 'alpha': 0.5})],
+                             self.backgroundCache)
 
         elif proj == 'PlateCarree':
             # Create a PlateCarree projection
             if ax is None:
-                if transitionFlag:
-                    ax = plt.axes(projection=ccrs.PlateCarree(central_longitude=lon_center))
+                if native:
+                    ax = fig.add_subplot(projection=target_crs)
+                elif transitionFlag:
+                    ax = fig.add_subplot(projection=ccrs.PlateCarree(central_longitude=lon_center))
                 else:
-                    ax = plt.axes(projection=ccrs.PlateCarree())
+                    ax = fig.add_subplot(projection=ccrs.PlateCarree())
             else: 
                 # print('...Using the existing axes')
                 ax=ax
@@ -875,19 +939,27 @@ class Plot:
             gl = ax.gridlines(crs=ccrs.PlateCarree(), draw_labels=True, linewidth=1, color='white', alpha=0.2, linestyle='--')
             gl.xlabels_top = False
             gl.ylabels_right = False
-            gl.xlocator = mticker.FixedLocator(np.around(np.linspace(rgb_extent[0],rgb_extent[1],6),2))
-            gl.xformatter = LONGITUDE_FORMATTER
-            gl.yformatter = LATITUDE_FORMATTER
+            xticks = np.linspace(rgb_extent[0],rgb_extent[1],6)
+            if native:
+                # the native extent is relative to the central longitude
+                xticks = (xticks + lon_center + 180) % 360 - 180
+            gl.xlocator = mticker.FixedLocator(np.around(xticks,2))
+            gl.xformatter = gridliner.LONGITUDE_FORMATTER
+            gl.yformatter = gridliner.LATITUDE_FORMATTER
 
             # mask the black pane
             rgb_new = np.ma.masked_where(rgb_new == 0, rgb_new)
             
             # Display the image in the projection
-            ax.imshow(rgb_new, origin='lower', extent=rgb_extent, **kwargs)
+            if native:
+                ax.imshow(rgb_new, origin='lower', extent=rgb_extent, transform=target_crs, **kwargs)
+            else:
+                ax.imshow(rgb_new, origin='lower', extent=rgb_extent, **kwargs)
             # Add coastline feature
-            ax.add_feature(cfeature.COASTLINE, edgecolor='black', linewidth=1, alpha=0.5)
-            ax.add_feature(cfeature.LAKES, edgecolor='black', linewidth=1, alpha=0.5) if lakes else None
-            ax.add_feature(cfeature.RIVERS, edgecolor='black', linewidth=1, alpha=0.5) if rivers else None
+            line = {'edgecolor': 'black', 'linewidth': 1, 'alpha': 0.5}
+            with span('features'):
+                drawFeatures(ax, [('coastline', line)] + [('lakes', line)]*lakes + [('rivers', line)]*rivers,
+                             self.backgroundCache)
 
         else:
             # Handle invalid projection type
@@ -909,15 +981,18 @@ class Plot:
                 if ax is not None:
                     ax.set_title(f'RGB image of the instrument {self.instrument} {self.data["date_time"]} at viewing angles {str(self.data["view_angles"][viewAngleIdx[0]])}', color=fontColor)
 
-            plt.box(on=None)
-            plt.show() if not noShow else None
+            # toggle the frame of the map, as plt.box(on=None) did
+            ax.set_frame_on(not ax.get_frame_on())
+            styleFigure(ax.figure, self.plotFont)
+            showFigure(ax.figure) if not noShow else None
 
             if saveFig:
                 location = f'./{self.instrument}_RGB_{str(viewAngleIdx[0])}_proj_{proj}.png'
                 if savePath is not None:
                     location = savePath
                 if fig is not None:  # Check if fig is not None
-                    fig.savefig(location, dpi=self.plotDPI)
+                    with span('savefig'):
+                        fig.savefig(location, dpi=self.plotDPI)
                 print(f'...Figure saved at {location}')
 
         # return the figure and axes and the projected RGB
@@ -934,36 +1009,179 @@ class Plot:
                     return fig, ax, rgb_new, rgb_extent
 
 
-    def meshgridRGB(self, LON, LAT, proj_size=(900,400), return_mapdata=False):
+    @profiled('Plot.quicklookRGB')
+    def quicklookRGB(self, savePath, var='i', viewAngleIdx=[36, 4, 84], scale=1, normFactor=200,
+                     rgb_dolp=False, proj_size=None, gamma=1.0, coastline=True, coast_color=(0, 0, 0),
+                     regrid_method='nearest', lon_0=None, lat_0=None, **kwargs):
+        """
+        Writes a projected RGB image as PNG without matplotlib.
+
+        The image is regridded like projectedRGB(proj='None') onto a longitude/latitude raster,
+        tone mapped through a lookup table and written directly, without axes, gridlines or title.
+
+        Args:
+            savePath (str): The PNG file to write.
+            var (str, optional): The variable to use for the RGB channels. Defaults to 'i'.
+            viewAngleIdx (list, optional): The indices of the view angles for R, G, and B. Defaults to [36, 4, 84].
+            scale (float, optional): A scaling factor for the RGB values. Defaults to 1.
+            normFactor (float, optional): A normalization factor for the RGB values. Defaults to 200.
+            rgb_dolp (bool, optional): Whether to create an RGB image from DoLP data. Defaults to False.
+            proj_size (tuple, optional): The size of the projected image. Defaults to None.
+            gamma (float, optional): The exponent applied to the normalised values. Defaults to 1.
+            coastline (bool, optional): Whether to burn in the Natural Earth coastlines. Defaults to True.
+            coast_color (tuple, optional): The RGB colour of the coastlines in 0-255. Defaults to black.
+            regrid_method (str, optional): 'nearest' or 'mean'. Defaults to 'nearest'.
+            lon_0 (float, optional): The central longitude. Defaults to None.
+            lat_0 (float, optional): The central latitude. Defaults to None.
+            **kwargs: Additional keyword arguments for plotRGB.
+
+        Returns:
+            np.ndarray: The uint8 image, the first row at the southern edge.
+        """
+        rgb_new, rgb_extent = self.projectedRGB(var=var, viewAngleIdx=viewAngleIdx, scale=scale, normFactor=normFactor,
+                                                rgb_dolp=rgb_dolp, proj='None', returnRGB=True, noShow=True,
+                                                proj_size=proj_size, regrid_method=regrid_method,
+                                                lon_0=lon_0, lat_0=lat_0, **kwargs)
+        mask = None
+        if coastline:
+            try:
+                mask = quicklook.coastlineMask(rgb_extent, rgb_new.shape[:2])
+            except Exception as e:
+                print(f'...Coastlines are not available, the quicklook is written without them: {e}')
+
+        image = quicklook.renderRGB(rgb_new, savePath, gamma=gamma, coastline=mask, coast_color=coast_color)
+        print(f'...Quicklook saved at {savePath}')
+        return image
+
+    def mapProjection(self, proj, lon_center, lat_center):
+        """
+        Creates the cartopy projection used for a projected RGB image, see regrid.mapProjection.
+
+        Args:
+            proj (str): The projection name.
+            lon_center (float): The central longitude.
+            lat_center (float): The central latitude, used by the Orthographic projection.
+
+        Returns:
+            cartopy.crs.Projection: The map projection.
+
+        Raises:
+            ValueError: If the projection name is unknown.
+        """
+        return mapProjection(proj, lon_center, lat_center)
+
+    def projectionRGB(self, projection, proj_size=(900,400), max_distance='auto', method='nearest'):
+        """
+        Regrids the RGB image directly onto the pixel grid of a map projection.
+
+        The swath is searched as 3-D unit vectors, so granules over the poles or across the
+        dateline need no special handling.
+
+        Args:
+            projection (cartopy.crs.Projection): The target map projection.
+            proj_size (tuple, optional): The longer side of the raster is max(proj_size) pixels, the other
+                                         side follows the aspect of the swath. Defaults to (900,400).
+            max_distance (float or str, optional): The largest distance in degrees between a raster pixel and
+                                                   the swath, farther pixels are left black. Defaults to 'auto'.
+            method (str, optional): 'nearest' or 'mean' (bin averaging). Defaults to 'nearest'.
+
+        Returns:
+            tuple: The regridded RGB image and its extent [x_min, x_max, y_min, y_max] in projection coordinates.
+        """
+        rgbs_proj, extent = self.projectionRGBs([self.rgb], projection, proj_size, max_distance, method)
+        return rgbs_proj[0], extent
+
+    def projectionRGBs(self, rgbs, projection, proj_size=(900,400), max_distance='auto', method='nearest'):
+        """
+        Regrids several RGB images of the granule onto the pixel grid of a map projection at once.
+
+        The images are stacked along the channels, so the swath is searched once for all of them.
+
+        Args:
+            rgbs (list): The (rows, cols, 3) RGB images, as plotRGB stores them in self.rgb.
+            projection (cartopy.crs.Projection): The target map projection.
+            proj_size (tuple, optional): The longer side of the raster is max(proj_size) pixels. Defaults to (900,400).
+            max_distance (float or str, optional): The largest distance in degrees between a raster pixel and
+                                                   the swath. Defaults to 'auto'.
+            method (str, optional): 'nearest' or 'mean' (bin averaging). Defaults to 'nearest'.
+
+        Returns:
+            tuple: The list of regridded RGB images and their extent [x_min, x_max, y_min, y_max] in projection
+                   coordinates.
+        """
+        stack = rgbs[0] if len(rgbs) == 1 else np.concatenate(rgbs, axis=-1)
+        stack_proj, extent = self.projectionImage(stack, projection, proj_size, max_distance, method)
+        stack_proj = stack_proj.astype(np.float32)
+
+        rgbs_proj = []
+        for i in range(len(rgbs)):
+            # Clip the color values to the range [0, 1] and remove any pixels where any of the color channels are 0
+            rgb_proj = np.clip(stack_proj[..., 3*i:3*i + 3], 0, 1)
+            rgb_proj[np.any(rgb_proj == 0, axis=-1)] = 0
+            rgbs_proj.append(rgb_proj)
+
+        return rgbs_proj, extent
+
+    def projectionImage(self, values, projection, proj_size=(900,400), max_distance='auto', method='nearest',
+                        fill_value=0):
+        """
+        Regrids swath values directly onto the pixel grid of a map projection.
+
+        Args:
+            values (np.ndarray): The swath values, (rows, cols) or (rows, cols, channels).
+            projection (cartopy.crs.Projection): The target map projection.
+            proj_size (tuple, optional): The longer side of the raster is max(proj_size) pixels. Defaults to (900,400).
+            max_distance (float or str, optional): The largest distance in degrees between a raster pixel and
+                                                   the swath. Defaults to 'auto'.
+            method (str, optional): 'nearest' or 'mean' (bin averaging). Defaults to 'nearest'.
+            fill_value (float, optional): The value of raster pixels without data, None for a masked array.
+                                          Defaults to 0.
+
+        Returns:
+            tuple: The regridded values and their extent [x_min, x_max, y_min, y_max] in projection coordinates.
         """
-        Projects RGB data onto a regular grid using meshgrid interpolation.
+        lat = self.data['latitude']
+        lon = self.data['longitude']
+
+        extent = projectedExtent(projection, lon, lat)
+        shape = rasterShape(extent, max(proj_size))
+
+        if method == 'mean':
+            xy = projectedCoordinates(projection, lon, lat)
+            grid_x = extent[0] + (extent[1] - extent[0])*(np.arange(shape[1]) + 0.5)/shape[1]
+            grid_y = extent[2] + (extent[3] - extent[2])*(np.arange(shape[0]) + 0.5)/shape[0]
+            binner = BinAverager(xy[..., 0], xy[..., 1], grid_x, grid_y, periodic=False)
+            return binner.regrid(values, fill_value=fill_value), extent
+
+        # the raster coordinates are only computed when the index map is not cached yet
+        grid = ('projectionRGB', projection.proj4_init, tuple(float(e) for e in extent), shape)
+        regridder = None
+        if self.regridCache is not None:
+            regridder = self.regridCache.lookup(lon, lat, grid, max_distance)[1]
+        if regridder is None:
+            target_lon, target_lat = projectionGrid(projection, extent, shape)
+            regridder = self.regridder(lon, lat, target_lon, target_lat, max_distance, grid=grid)
+        return regridder.regrid(values, fill_value=fill_value), extent
+
+    def meshgridRGB(self, LON, LAT, proj_size=(900,400), return_mapdata=False, max_distance='auto',
+                    method='nearest'):
+        """
+        Projects RGB data onto a regular grid using nearest-neighbour regridding.
 
         Args:
             LON (np.ndarray): The longitude data.
             LAT (np.ndarray): The latitude data.
             proj_size (tuple, optional): The size of the projected grid. Defaults to (900,400).
             return_mapdata (bool, optional): If True, returns additional map data. Defaults to False.
+            max_distance (float or str, optional): The largest distance in degrees between a grid pixel and
+                                                   the swath, farther pixels are left black. Defaults to 'auto'.
+            method (str, optional): 'nearest' picks the closest swath pixel for every grid pixel, 'mean'
+                                    averages all swath pixels falling in a grid pixel, which avoids aliasing
+                                    when the grid is coarser than the swath. Defaults to 'nearest'.
 
         Returns:
             tuple: A tuple containing the projected RGB data and other optional map data.
         """
-        # for each color channel, the code sets the border pixels of the image to 0. 
-        rr = self.rgb[:,:,0]
-        rr[0:-1,0] = 0
-        rr[0:-1,-1] = 0
-        rr[0,0:-1] = 0
-        rr[-1,0:-1] = 0
-        gg = self.rgb[:,:,1]
-        gg[0:-1,0] = 0
-        gg[0:-1,-1] = 0
-        gg[0,0:-1] = 0
-        gg[-1,0:-1] = 0
-        bb = self.rgb[:,:,2]
-        bb[0:-1,0] = 0
-        bb[0:-1,-1] = 0
-        bb[0,0:-1] = 0
-        bb[-1,0:-1] = 0
-
         # The code calculates the maximum and minimum latitude (mx_lat and mn_lat)
         # and longitude (mx_lon and mn_lon) from the LAT and LON arrays. 
         # It then calculates the midpoint of the latitude (lat0) and longitude (lon0)
@@ -1004,39 +1222,17 @@ class Plot:
         # Create a 2D grid of coordinates
         newxx, newyy = np.meshgrid(xx,yy)
 
-        # Interpolate the red, green, and blue color channels at the new grid points
-        newrr = interpolate.griddata( (LON.ravel(),LAT.ravel()), rr.ravel(), (newxx.ravel(), newyy.ravel()), method='nearest',fill_value=0 )
-        newgg = interpolate.griddata( (LON.ravel(),LAT.ravel()), gg.ravel(), (newxx.ravel(), newyy.ravel()), method='nearest',fill_value=0 )
-        newbb = interpolate.griddata( (LON.ravel(),LAT.ravel()), bb.ravel(), (newxx.ravel(), newyy.ravel()), method='nearest',fill_value=0 )
-
-        # Reshape the color channels to the size of the new image
-        newrr = newrr.reshape(x_new,y_new)
-        newgg = newgg.reshape(x_new,y_new)
-        newbb = newbb.reshape(x_new,y_new)
+        # Map the red, green, and blue channels onto the new grid in one pass, grid pixels
+        # farther than max_distance from the swath (or without any swath pixel) stay 0 and are masked when plotted
+        if method == 'mean':
+            rgb_proj = BinAverager(LON, LAT, xx, yy).regrid(self.rgb, fill_value=0).astype(np.float32)
+        else:
+            regridder = self.regridder(LON, LAT, newxx, newyy, max_distance, grid=('meshgridRGB', tuple(proj_size)))
+            rgb_proj = regridder.regrid(self.rgb, fill_value=0).astype(np.float32)
 
         # Clip the color values to the range [0, 1] and remove any pixels where any of the color channels are 0
-        newrr[newrr>1] = 1
-        newrr[newrr<0] = 0
-        newrr[newbb==0] = 0
-        newrr[newgg==0] = 0
-
-        newgg[newgg>1] = 1
-        newgg[newgg<0] = 0
-        newgg[newbb==0] = 0
-        newgg[newrr==0] = 0
-
-        newbb[newbb>=1] = 1
-        newbb[newbb<0] = 0
-        newbb[newrr==0] = 0
-        newbb[newgg==0] = 0
-
-        # Create a new 3D array for the projected RGB image
-        rgb_proj = np.zeros([np.shape(newrr)[0],np.shape(newrr)[1],3], dtype=np.float32)
-
-        # Set the red, green, and blue channels of the new image
-        rgb_proj[:,:,0] = newrr
-        rgb_proj[:,:,1] = newgg
-        rgb_proj[:,:,2] = newbb
+        rgb_proj = np.clip(rgb_proj, 0, 1)
+        rgb_proj[np.any(rgb_proj == 0, axis=-1)] = 0
 
         # If return_mapdata is True, return the map data
         if return_mapdata:
@@ -1048,7 +1244,7 @@ class Plot:
     # Function to regrid RGB data
     # Noah Sienkiewicz created this function and has been modified by Anin to fit with the library
     #------------------------------------------------------------------------------------------
-    def GridRGB(self, lon, lat, dateline=True, proj_size=(900,400)):
+    def GridRGB(self, lon, lat, dateline=True, proj_size=(900,400), max_distance='auto', method='nearest'):
         """
         Interpolates RGB values onto a regularly spaced grid.
 
@@ -1057,31 +1253,23 @@ class Plot:
             lat (np.ndarray): 2D array of latitude values.
             dateline (bool, optional): Whether the data crosses the dateline. Defaults to True.
             proj_size (tuple, optional): The size of the output grid. Defaults to (900,400).
+            max_distance (float or str, optional): The largest distance in degrees between a grid pixel and
+                                                   the swath, farther pixels are transparent. Defaults to 'auto'.
+            method (str, optional): 'nearest' or 'mean' (bin averaging), see meshgridRGB. Defaults to 'nearest'.
 
         Returns:
             tuple: A tuple containing the regridded RGB data and the extent of the grid.
         """
-        # Create a 3D array to store the RGB data
-        tmp_r = self.rgb[:,:,0]
-        tmp_g = self.rgb[:,:,1]
-        tmp_b = self.rgb[:,:,2]
-        
         if dateline:
             #When the dateline is bisecting the lon grid, we need to adjust the grid to be continuous
             #This means separating it into east and west halves according to the dateline. On the east
             #half where it's negative, shift all values by 360 to make them continuous with the west
             #half
-            tmp_lon = np.unique(lon)
-            west_lon = tmp_lon[tmp_lon>0]
-            east_lon = tmp_lon[tmp_lon<0]
-            lon_min = np.min(west_lon)
-            lon_max = np.max(east_lon)
-            lon_min = lon_min
-            lon_max = 360+lon_max
+            lon_min = np.min(lon[lon>0])
+            lon_max = 360+np.max(lon[lon<0])
         else: #if no datetline, do nothing special
-            tmp_lon = np.unique(lon)
             lon_min = np.min(lon)
-            lon_max = np.max(lat)
+            lon_max = np.max(lon)
 
         lat_min = np.min(lat)
         lat_max = np.max(lat)
@@ -1092,46 +1280,19 @@ class Plot:
         # points as the original grid. I create it as the same size as the original grid, but it doesn't
         # have to be. Using nearest neighbor interpolation means there's no real reason to go finer
         # but I didn't really play with it much to check
-        new_lon, new_lat = np.meshgrid(np.linspace(lon_min,lon_max,proj_size[1]),
-                                    np.linspace(lat_min,lat_max,proj_size[0]))
-        
-        tmp_lon = lon.flatten() #flatten the arrays for regridding
-        if dateline: #if the dateline is present, again shift the values to be continuous
-            tmp_lon[tmp_lon<0] = 360+tmp_lon[tmp_lon<0]
-        else: #else do nothing
-            tmp_lon = tmp_lon
-        points = np.vstack([tmp_lon, lat.flatten()]).T #combine the lon and lat arrays into a 2D array according griddate spec
-        new_points = np.vstack([new_lon.flatten(), new_lat.flatten()]).T #same for the new grid
-        
-        # Perform the interpolation RED
-        to_grid = np.copy(tmp_r) #get a copy of the input red image data
-        # Because we're using nearest neighbor, if I don't line the edges with 0, then those values get smeared
-        # from the true image edge to the edge of the grid. We could mask them later with the alpha channel, but
-        # for simplicity I use 0 values to help define the alpha mask, so it's not really worth trying
-        to_grid[0,:] = 0  # top layer of the grid
-        to_grid[-1,:] = 0 # bottom
-        values = to_grid.flatten()  # replace 'values' with your image data array
-        new_values = interpolate.griddata(points, values, new_points, method='nearest') #do interpolation (takes a few seconds)
-        # Reshape the interpolated values to match the shape of the new grid
-        new_r = new_values.reshape(new_lon.shape) #reshape result back to meshgrid expectations
-
-        # Perform the interpolation GRN (same as red)
-        to_grid = np.copy(tmp_g)
-        to_grid[0,:] = 0
-        to_grid[-1,:] = 0
-        values = to_grid.flatten()  # replace 'values' with your data array
-        new_values = interpolate.griddata(points, values, new_points, method='nearest')
-        # Reshape the interpolated values to match the shape of the new grid
-        new_g = new_values.reshape(new_lon.shape)
-
-        # Perform the interpolation BLU (same as red)
-        to_grid = np.copy(tmp_b)
-        to_grid[0,:] = 0
-        to_grid[-1,:] = 0
-        values = to_grid.flatten()  # replace 'values' with your data array
-        new_values = interpolate.griddata(points, values, new_points, method='nearest')
-        # Reshape the interpolated values to match the shape of the new grid
-        new_b = new_values.reshape(new_lon.shape)
+        grid_lon = np.linspace(lon_min,lon_max,proj_size[1])
+        grid_lat = np.linspace(lat_min,lat_max,proj_size[0])
+        new_lon, new_lat = np.meshgrid(grid_lon, grid_lat)
+
+        # The neighbour search works on 3-D unit vectors, so longitudes beyond 180 on the grid match
+        # the negative swath longitudes without shifting them. Grid pixels farther than max_distance
+        # from the swath are left at 0 instead of smearing the swath edge across the grid.
+        if method == 'mean':
+            new_rgb = BinAverager(lon, lat, grid_lon, grid_lat).regrid(self.rgb[:, :, :3], fill_value=0).astype(np.float32)
+        else:
+            regridder = self.regridder(lon, lat, new_lon, new_lat, max_distance, grid=('GridRGB', tuple(proj_size), dateline))
+            new_rgb = regridder.regrid(self.rgb[:, :, :3], fill_value=0)
+        new_r, new_g, new_b = np.moveaxis(new_rgb, -1, 0)
 
         tmp_alpha = np.ones_like(new_b,dtype='float32')*1 #create an alpha channel (opacity) that is 1 (fully opaque) everywhere
         new_rgb = np.stack([new_r, new_g, new_b ,tmp_alpha], axis=-1) #stack into a new RGB on the last axis
@@ -1141,6 +1302,25 @@ class Plot:
 
         return new_rgb, ext
         
+    def regridder(self, lon, lat, target_lon, target_lat, max_distance='auto', grid=None):
+        """
+        Returns the regridder for a swath and target grid, reusing cached index maps.
+
+        Args:
+            lon (np.ndarray): 2D array of swath longitudes.
+            lat (np.ndarray): 2D array of swath latitudes.
+            target_lon (np.ndarray): Longitudes of the target grid.
+            target_lat (np.ndarray): Latitudes of the target grid.
+            max_distance (float or str, optional): The regridding distance cutoff in degrees. Defaults to 'auto'.
+            grid (tuple, optional): A description of the target grid used as part of the cache key. Defaults to None.
+
+        Returns:
+            regrid.Regridder: The regridder.
+        """
+        if self.regridCache is None:
+            return Regridder(lon, lat, target_lon, target_lat, max_distance=max_distance)
+        return self.regridCache.regridder(lon, lat, target_lon, target_lat, max_distance=max_distance, grid=grid)
+
     def average_longitude(self, longitudes):
         """
         Calculates the average longitude, handling the circular nature of longitude data.
@@ -0,0 +1,280 @@
+"""
+Opt-in timing and memory instrumentation for the NASA PACE Data Reader library.
+
+The readers and plotting functions mark their stages with :func:`span` (opening the file,
+reading each variable, assembling the RGB, regridding, adding cartopy features, saving the
+figure). Spans cost next to nothing unless a :class:`Profiler` is active, either as a
+context manager::
+
+    from nasa_pace_data_reader import profiling, L1
+    with profiling.Profiler() as profiler:
+        l1c_dict = L1.L1C().read(fileName)
+    print(profiler.summary())
+    profiler.save('profile.json')
+
+or for the whole process through the ``PACE_PROFILE`` environment variable: ``PACE_PROFILE=1``
+prints a summary at exit, ``PACE_PROFILE=profile.json`` writes the full report to that file.
+"""
+
+# Standard library imports for timing, reporting and thread bookkeeping.
+import os
+import json
+import time
+import atexit
+import functools
+import resource
+import threading
+
+# The environment variable enabling a process-wide profiler.
+ENV_VAR = 'PACE_PROFILE'
+
+# The active profilers, every finished span is reported to all of them.
+_active = []
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def currentRSS():
+    """
+    Returns the resident set size of this process in bytes.
+
+    Returns:
+        int: The RSS, 0 if /proc is not available.
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+class Span:
+    """
+    A timed stage. Set ``bytes`` inside the block to report the amount of data read.
+    """
+
+    def __init__(self, name, info):
+        self.name = name
+        self.info = info
+        self.bytes = 0
+
+    def __enter__(self):
+        stack = _local.__dict__.setdefault('stack', [])
+        self.parent = stack[-1].name if stack else None
+        self.depth = len(stack)
+        stack.append(self)
+        self.rss_start = currentRSS()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.wall = time.perf_counter() - self.start
+        self.rss_delta = currentRSS() - self.rss_start
+        _local.stack.pop()
+        record = self.record(failed=exc_type is not None)
+        with _lock:
+            profilers = list(_active)
+        for profiler in profilers:
+            profiler.add(record)
+        return False
+
+    def record(self, failed=False):
+        """
+        Returns the span as a dictionary.
+
+        Args:
+            failed (bool, optional): Whether the stage raised an exception. Defaults to False.
+
+        Returns:
+            dict: The name, timing, bytes and RSS change of the span.
+        """
+        record = {'name': self.name, 'parent': self.parent, 'depth': self.depth,
+                  'start': self.start, 'wall_s': self.wall, 'bytes': int(self.bytes),
+                  'rss_delta': self.rss_delta, 'thread': threading.current_thread().name}
+        if self.info:
+            record['info'] = self.info
+        if failed:
+            record['failed'] = True
+        return record
+
+
+class NullSpan:
+    """The span returned while no profiler is active, it ignores everything."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+def span(name, **info):
+    """
+    Marks a stage to be timed by the active profilers.
+
+    Args:
+        name (str): The stage name, e.g. 'open', 'read' or 'savefig'.
+        **info: Extra details stored with the span, e.g. the file or the variable name.
+
+    Returns:
+        Span or NullSpan: A context manager timing the block.
+    """
+    if not _active:
+        return NULL_SPAN
+    return Span(name, info)
+
+
+def profiled(name):
+    """
+    Decorates a method so every call is recorded as a span.
+
+    Args:
+        name (str): The span name, e.g. 'L1C.read'.
+
+    Returns:
+        callable: The decorator.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _active:
+                return func(*args, **kwargs)
+            with Span(name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def enabled():
+    """bool: True if a profiler is recording."""
+    return bool(_active)
+
+
+class Profiler:
+    """
+    Collects the spans recorded while it is active.
+    """
+
+    def __init__(self, callback=None):
+        """
+        Initializes the profiler.
+
+        Args:
+            callback (callable, optional): Called with the dictionary of every finished span,
+                                           e.g. to forward them to a logger. Defaults to None.
+        """
+        self.callback = callback
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+
+    def start(self):
+        """Starts recording spans. Returns the profiler."""
+        with _lock:
+            if self not in _active:
+                _active.append(self)
+        return self
+
+    def stop(self):
+        """Stops recording spans."""
+        with _lock:
+            if self in _active:
+                _active.remove(self)
+
+    def add(self, record):
+        """
+        Stores a finished span and passes it to the callback.
+
+        Args:
+            record (dict): The span as returned by Span.record.
+        """
+        with self._lock:
+            self.spans.append(record)
+        if self.callback is not None:
+            self.callback(record)
+
+    def clear(self):
+        """Forgets all recorded spans."""
+        with self._lock:
+            self.spans = []
+
+    def summary(self):
+        """
+        Aggregates the spans by name.
+
+        Returns:
+            dict: For every span name the number of calls, the total wall time in seconds,
+                  the bytes read and the summed RSS change in bytes.
+        """
+        totals = {}
+        with self._lock:
+            spans = list(self.spans)
+        for record in spans:
+            total = totals.setdefault(record['name'], {'count': 0, 'wall_s': 0.0, 'bytes': 0, 'rss_delta': 0})
+            total['count'] += 1
+            total['wall_s'] += record['wall_s']
+            total['bytes'] += record['bytes']
+            total['rss_delta'] += record['rss_delta']
+        return totals
+
+    def report(self):
+        """
+        Returns the recorded spans and their summary.
+
+        Returns:
+            dict: {'spans': [...], 'summary': {...}}, spans in the order they finished.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        return {'spans': spans, 'summary': self.summary()}
+
+    def save(self, path):
+        """
+        Writes the report to a JSON file.
+
+        Args:
+            path (str): The output path.
+        """
+        with open(path, 'w') as output:
+            json.dump(self.report(), output, indent=2, default=str)
+
+    def printSummary(self):
+        """Prints the summary as a table sorted by total time."""
+        print(f"{'span':<24}{'count':>8}{'wall [s]':>12}{'read [MB]':>12}{'RSS [MB]':>12}")
+        for name, total in sorted(self.summary().items(), key=lambda item: -item[1]['wall_s']):
+            print(f"{name:<24}{total['count']:>8}{total['wall_s']:>12.3f}{total['bytes']/1e6:>12.2f}"
+                  f"{total['rss_delta']/1e6:>12.2f}")
+
+
+def profileFromEnvironment():
+    """
+    Starts a process-wide profiler if the PACE_PROFILE environment variable is set.
+
+    Returns:
+        Profiler: The started profiler, None if the variable is not set.
+    """
+    target = os.environ.get(ENV_VAR, '')
+    if target.lower() in ['', '0', 'false', 'no']:
+        return None
+    profiler = Profiler().start()
+    if target.lower().endswith('.json'):
+        atexit.register(profiler.save, target)
+    else:
+        atexit.register(profiler.printSummary)
+    return profiler
+
+
+# A profiler for the whole process, only when requested through the environment.
+ENV_PROFILER = profileFromEnvironment()
@@ -0,0 +1,370 @@
+"""
+Headless raster quicklooks for the NASA PACE Data Reader library.
+
+Production quicklooks do not need interactive figures. The functions here turn a regridded
+RGB image, or a single variable through a colour lookup table, into an 8-bit image and write
+it as PNG with the standard library, without importing matplotlib::
+
+    plt_ = plot.Plot(l1c_dict)
+    plt_.quicklookRGB('quicklook.png', normFactor=200, gamma=0.8)
+
+    rgb, extent = plt_.projectedRGB(proj='None', returnRGB=True)
+    quicklook.renderRGB(rgb, 'quicklook.png', coastline=quicklook.coastlineMask(extent, rgb.shape[:2]))
+
+Tone mapping goes through cached uint8 lookup tables, and coastline masks are rasterised
+once per extent and image size and kept in memory. The cartopy figures of
+:meth:`plot.Plot.projectedRGB` remain the way to make publication figures.
+"""
+
+# Standard library imports for the PNG encoder and the mask cache.
+import zlib
+import struct
+import threading
+from collections import OrderedDict
+
+# Third-party imports for array handling.
+import numpy as np
+
+# Cartopy and matplotlib are only imported for coastlines and for colormaps not listed in COLORMAPS.
+from .lazyimport import LazyModule
+matplotlib = LazyModule('matplotlib')
+ccrs = LazyModule('cartopy.crs')
+
+# Local imports for the opt-in profiling spans and the Natural Earth data, which honours the offline mode.
+from .profiling import span, profiled
+from .backgrounds import naturalEarth, geometries
+
+# The number of entries of the tone lookup tables, input values are quantised to this many levels.
+TONE_LEVELS = 4096
+
+# Colormaps available without matplotlib, as evenly spaced RGB anchors.
+COLORMAPS = {
+    'gray': [(0, 0, 0), (255, 255, 255)],
+    'viridis': [(68, 1, 84), (71, 45, 123), (59, 82, 139), (44, 114, 142), (33, 145, 140),
+                (40, 174, 128), (94, 201, 98), (173, 220, 48), (253, 231, 37)],
+    'magma': [(0, 0, 4), (29, 17, 71), (81, 18, 124), (131, 38, 129), (183, 55, 121),
+              (231, 82, 99), (252, 137, 97), (254, 196, 136), (252, 253, 191)],
+}
+
+# The lookup tables and coastline rasters built so far.
+_tone_luts = {}
+_color_luts = {}
+_coastlines = {}
+_coast_masks = OrderedDict()
+_coast_masks_lock = threading.Lock()
+COAST_MASK_CACHE_SIZE = 32
+
+
+def writePNG(path, image, origin='upper', level=1):
+    """
+    Writes an 8-bit image as PNG.
+
+    Args:
+        path (str): The output file.
+        image (np.ndarray): A uint8 array of shape (rows, cols) for grey, (rows, cols, 3) for RGB
+                            or (rows, cols, 4) for RGBA.
+        origin (str, optional): 'lower' if the first row is the bottom of the image, as drawn by
+                                imshow(origin='lower'). Defaults to 'upper'.
+        level (int, optional): The zlib compression level, low levels are much faster. Defaults to 1.
+    """
+    assert image.dtype == np.uint8, 'Error: the image must be uint8'
+    channels = 1 if image.ndim == 2 else image.shape[2]
+    assert channels in [1, 3, 4], 'Error: the image must have 1, 3 or 4 channels'
+    color_type = {1: 0, 3: 2, 4: 6}[channels]
+    rows, cols = image.shape[:2]
+
+    pixels = image.reshape(rows, cols*channels)
+    if origin == 'lower':
+        pixels = pixels[::-1]
+    # every row uses the 'up' filter, the difference to the row above, which compresses smooth images well
+    filtered = np.empty((rows, cols*channels + 1), dtype=np.uint8)
+    filtered[:, 0] = 2
+    filtered[:, 1:] = pixels
+    filtered[1:, 1:] -= pixels[:-1]
+
+    def chunk(kind, payload):
+        return struct.pack('>I', len(payload)) + kind + payload + struct.pack('>I', zlib.crc32(kind + payload))
+
+    with span('png', rows=rows, cols=cols):
+        header = struct.pack('>IIBBBBB', cols, rows, 8, color_type, 0, 0, 0)
+        data = zlib.compress(filtered.tobytes(), level)
+        with open(path, 'wb') as png:
+            png.write(b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', data) + chunk(b'IEND', b''))
+
+
+def toneLUT(gamma=1.0):
+    """
+    Returns the lookup table mapping quantised values in [0, 1] to 8-bit levels.
+
+    Args:
+        gamma (float, optional): The exponent applied to the values. Defaults to 1.
+
+    Returns:
+        np.ndarray: A uint8 array of TONE_LEVELS entries.
+    """
+    if gamma not in _tone_luts:
+        levels = np.linspace(0, 1, TONE_LEVELS)**gamma
+        _tone_luts[gamma] = np.round(levels*255).astype(np.uint8)
+    return _tone_luts[gamma]
+
+
+def colorLUT(cmap='viridis', levels=256):
+    """
+    Returns a colormap as a uint8 lookup table.
+
+    Args:
+        cmap (str or np.ndarray): A name from COLORMAPS, any matplotlib colormap name, or an
+                                  (N, 3) array of RGB colours in 0-255. Defaults to 'viridis'.
+        levels (int, optional): The number of entries. Defaults to 256.
+
+    Returns:
+        np.ndarray: A uint8 array of shape (levels, 3).
+    """
+    if not isinstance(cmap, str):
+        anchors = np.asarray(cmap, dtype=np.float64)
+    elif (cmap, levels) in _color_luts:
+        return _color_luts[(cmap, levels)]
+    elif cmap in COLORMAPS:
+        anchors = np.asarray(COLORMAPS[cmap], dtype=np.float64)
+    else:
+        anchors = matplotlib.colormaps[cmap](np.linspace(0, 1, levels))[:, :3]*255
+
+    positions = np.linspace(0, 1, len(anchors))
+    samples = np.linspace(0, 1, levels)
+    lut = np.stack([np.interp(samples, positions, anchors[:, i]) for i in range(3)], axis=-1)
+    lut = np.round(lut).astype(np.uint8)
+    if isinstance(cmap, str):
+        _color_luts[(cmap, levels)] = lut
+    return lut
+
+
+def quantize(values, vmin=0.0, vmax=1.0, levels=TONE_LEVELS):
+    """
+    Scales values to lookup table indices.
+
+    The scaling is done in one float32 buffer, values itself is left unchanged, so views of
+    the caller's data and read-only cached arrays can be passed.
+
+    Args:
+        values (np.ndarray): The values, NaN marks missing data.
+        vmin (float, optional): The value mapped to the first entry. Defaults to 0.
+        vmax (float, optional): The value mapped to the last entry. Defaults to 1.
+        levels (int, optional): The number of entries. Defaults to TONE_LEVELS.
+
+    Returns:
+        tuple: (indices, invalid), the uint16 indices and a boolean array marking the NaN values.
+    """
+    invalid = np.isnan(values)
+    scaled = np.subtract(values, vmin, dtype=np.float32)
+    np.multiply(scaled, (levels - 1)/(vmax - vmin), out=scaled)
+    np.clip(scaled, 0, levels - 1, out=scaled)
+    scaled[invalid] = 0
+    return scaled.astype(np.uint16), invalid
+
+
+def coastlineLines(resolution='110m'):
+    """
+    Loads the Natural Earth coastlines, see backgrounds.setOffline for machines without network access.
+
+    Args:
+        resolution (str, optional): '110m', '50m' or '10m'. Defaults to '110m'.
+
+    Returns:
+        list: (N, 2) arrays of longitude and latitude.
+    """
+    if resolution not in _coastlines:
+        path = naturalEarth(resolution, 'physical', 'coastline')
+        lines = []
+        for geometry in geometries(path):
+            for part in getattr(geometry, 'geoms', [geometry]):
+                lines.append(np.asarray(part.coords)[:, :2])
+        _coastlines[resolution] = lines
+    return _coastlines[resolution]
+
+
+def rasterizeLines(lines, extent, shape, projection=None):
+    """
+    Draws polylines into a boolean raster.
+
+    Args:
+        lines (list): (N, 2) arrays of longitude and latitude.
+        extent (list): [x_min, x_max, y_min, y_max] of the raster, as passed to imshow.
+        shape (tuple): The (rows, cols) of the raster, the first row at y_min.
+        projection (cartopy.crs.Projection, optional): The projection of the extent. Defaults to None,
+                                                      the extent is in degrees and may reach beyond 180.
+
+    Returns:
+        np.ndarray: Boolean array, True on the lines.
+    """
+    rows, cols = shape
+    x_min, x_max, y_min, y_max = [float(e) for e in extent]
+    mask = np.zeros(shape, dtype=bool)
+    if not lines:
+        return mask
+
+    points = np.concatenate(lines)
+    ends = np.cumsum([len(line) for line in lines])
+    # segments joining two lines are dropped
+    keep = np.ones(len(points) - 1, dtype=bool)
+    keep[ends[:-1] - 1] = False
+
+    if projection is None:
+        # start every segment within the 360 degrees from the left edge and draw it once more shifted
+        # by -360, so segments crossing the left edge or the antimeridian are drawn in full
+        x0 = (points[:-1, 0] - x_min) % 360 + x_min
+        dx = (np.diff(points[:, 0]) + 180) % 360 - 180
+        y0, dy = points[:-1, 1], np.diff(points[:, 1])
+        x0, dx, y0, dy, keep = [np.concatenate([a, a]) for a in (x0, dx, y0, dy, keep)]
+        x0[len(x0)//2:] -= 360
+    else:
+        # segments leaving the projection or wrapping around it are dropped
+        xy = projection.transform_points(ccrs.PlateCarree(), points[:, 0], points[:, 1])
+        x0, dx = xy[:-1, 0], np.diff(xy[:, 0])
+        y0, dy = xy[:-1, 1], np.diff(xy[:, 1])
+        keep &= np.abs(dx) < (x_max - x_min)/2
+    keep &= np.isfinite(x0) & np.isfinite(dx) & np.isfinite(y0) & np.isfinite(dy)
+
+    # clip the segments to the raster in pixel coordinates, then sample the visible parts at least once per pixel
+    c0 = (x0[keep] - x_min)/(x_max - x_min)*cols
+    r0 = (y0[keep] - y_min)/(y_max - y_min)*rows
+    d_col = dx[keep]/(x_max - x_min)*cols
+    d_row = dy[keep]/(y_max - y_min)*rows
+    t0, t1 = np.zeros(c0.size), np.ones(c0.size)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for p, d, size in [(c0, d_col, cols), (r0, d_row, rows)]:
+            low, high = -p/d, (size - p)/d
+            flat = d == 0
+            low[flat] = np.where((p[flat] >= 0) & (p[flat] < size), -np.inf, np.inf)
+            high[flat] = -low[flat]
+            t0 = np.maximum(t0, np.minimum(low, high))
+            t1 = np.minimum(t1, np.maximum(low, high))
+    visible = t0 <= t1
+    c0, r0 = c0[visible] + t0[visible]*d_col[visible], r0[visible] + t0[visible]*d_row[visible]
+    d_col, d_row = (t1 - t0)[visible]*d_col[visible], (t1 - t0)[visible]*d_row[visible]
+
+    steps = np.ceil(np.maximum(np.abs(d_col), np.abs(d_row))).astype(np.int64) + 1
+    segment = np.repeat(np.arange(steps.size), steps)
+    t = (np.arange(segment.size) - np.repeat(np.cumsum(steps) - steps, steps))/np.repeat(steps, steps)
+    c = np.floor(c0[segment] + t*d_col[segment]).astype(np.int64)
+    r = np.floor(r0[segment] + t*d_row[segment]).astype(np.int64)
+    inside = (c >= 0) & (c < cols) & (r >= 0) & (r < rows)
+    mask[r[inside], c[inside]] = True
+    return mask
+
+
+def coastlineMask(extent, shape, projection=None, resolution='110m', width=1):
+    """
+    Returns the coastlines of a raster as a boolean mask, cached by extent and size.
+
+    Args:
+        extent (list): [x_min, x_max, y_min, y_max] of the raster, as passed to imshow.
+        shape (tuple): The (rows, cols) of the raster, the first row at y_min.
+        projection (cartopy.crs.Projection, optional): The projection of the extent. Defaults to None,
+                                                      the extent is in degrees.
+        resolution (str, optional): The Natural Earth resolution. Defaults to '110m'.
+        width (int, optional): The line width in pixels. Defaults to 1.
+
+    Returns:
+        np.ndarray: Read-only boolean array, True on the coastlines.
+    """
+    key = (projection.proj4_init if projection is not None else None, tuple(float(e) for e in extent),
+           tuple(shape[:2]), resolution, width)
+    with _coast_masks_lock:
+        mask = _coast_masks.get(key)
+        if mask is not None:
+            _coast_masks.move_to_end(key)
+            return mask
+
+    with span('coastline', resolution=resolution):
+        mask = rasterizeLines(coastlineLines(resolution), extent, shape[:2], projection)
+        for _ in range(width - 1):
+            grown = mask.copy()
+            grown[1:] |= mask[:-1]
+            grown[:-1] |= mask[1:]
+            grown[:, 1:] |= mask[:, :-1]
+            grown[:, :-1] |= mask[:, 1:]
+            mask = grown
+    mask.flags.writeable = False
+    with _coast_masks_lock:
+        _coast_masks[key] = mask
+        while len(_coast_masks) > COAST_MASK_CACHE_SIZE:
+            _coast_masks.popitem(last=False)
+    return mask
+
+
+@profiled('quicklook.renderRGB')
+def renderRGB(rgb, path=None, gamma=1.0, clip=(0, 1), coastline=None, coast_color=(0, 0, 0),
+              background=(0, 0, 0), origin='lower'):
+    """
+    Converts an RGB image to 8 bits and optionally writes it as PNG, rgb is left unchanged.
+
+    Args:
+        rgb (np.ndarray): Float array of shape (rows, cols, 3), or (rows, cols, 4) with an alpha channel
+                          as returned by Plot.GridRGB.
+        path (str, optional): The PNG file to write. Defaults to None.
+        gamma (float, optional): The exponent applied after clipping. Defaults to 1.
+        clip (tuple, optional): The (min, max) values mapped to black and full brightness. Defaults to (0, 1).
+        coastline (np.ndarray, optional): A boolean mask burnt into the image, see coastlineMask. Defaults to None.
+        coast_color (tuple, optional): The RGB colour of the coastlines. Defaults to black.
+        background (tuple, optional): The RGB colour of missing pixels (NaN or masked in any channel, or
+                                      alpha 0). Dark but valid pixels stay black. Defaults to black.
+        origin (str, optional): 'lower' if the first row is the bottom of the image. Defaults to 'lower'.
+
+    Returns:
+        np.ndarray: The uint8 image of shape (rows, cols, 3).
+    """
+    with span('tone', gamma=gamma):
+        values = np.ma.getdata(rgb)
+        alpha = values[..., 3] if values.shape[-1] == 4 else None
+        indices, invalid = quantize(values[..., :3], clip[0], clip[1])
+        image = toneLUT(gamma)[indices]
+        # NaN pixels map to the first entry, black, so they are only painted for another colour
+        if tuple(background) != (0, 0, 0):
+            missing = invalid.any(axis=-1) | np.ma.getmaskarray(rgb)[..., :3].any(axis=-1)
+            if alpha is not None:
+                missing |= alpha <= 0
+            image[missing] = background
+        if coastline is not None:
+            image[coastline] = coast_color
+
+    if path is not None:
+        writePNG(path, image, origin=origin)
+    return image
+
+
+@profiled('quicklook.renderVariable')
+def renderVariable(values, path=None, vmin=None, vmax=None, cmap='viridis', coastline=None,
+                   coast_color=(0, 0, 0), background=(0, 0, 0), origin='lower'):
+    """
+    Colours a 2D variable through a colormap lookup table and optionally writes it as PNG.
+
+    Args:
+        values (np.ndarray): The variable, masked or NaN values are drawn in the background colour.
+        path (str, optional): The PNG file to write. Defaults to None.
+        vmin (float, optional): The value of the first colour. Defaults to the minimum of the data.
+        vmax (float, optional): The value of the last colour. Defaults to the maximum of the data.
+        cmap (str or np.ndarray, optional): The colormap, see colorLUT. Defaults to 'viridis'.
+        coastline (np.ndarray, optional): A boolean mask burnt into the image. Defaults to None.
+        coast_color (tuple, optional): The RGB colour of the coastlines. Defaults to black.
+        background (tuple, optional): The RGB colour of missing values. Defaults to black.
+        origin (str, optional): 'lower' if the first row is the bottom of the image. Defaults to 'lower'.
+
+    Returns:
+        np.ndarray: The uint8 image of shape (rows, cols, 3).
+    """
+    values = np.ma.filled(np.ma.asarray(values, dtype=np.float32), np.nan)
+    vmin = float(np.nanmin(values)) if vmin is None else vmin
+    vmax = float(np.nanmax(values)) if vmax is None else vmax
+    if vmax <= vmin:
+        vmax = vmin + 1
+
+    lut = colorLUT(cmap)
+    indices, invalid = quantize(values, vmin, vmax, levels=len(lut))
+    image = lut[indices]
+    image[invalid] = background
+    if coastline is not None:
+        image[coastline] = coast_color
+
+    if path is not None:
+        writePNG(path, image, origin=origin)
+    return image
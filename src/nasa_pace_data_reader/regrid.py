@@ -0,0 +1,617 @@
+"""
+Swath regridding engine for the NASA PACE Data Reader library.
+
+A :class:`Regridder` builds one nearest-neighbour tree per swath geolocation and keeps the
+resulting target-to-source index map, so any number of channels or variables sharing the
+same latitude/longitude can be mapped onto the target grid with a single gather.
+Points are compared as 3-D unit vectors, which makes the search continuous across the
+antimeridian and the poles.
+
+A :class:`BinAverager` goes the other way: it drops every swath pixel into its target cell
+and accumulates sums, counts and extrema with bincount-style reductions, which gives proper
+averages when the target grid is coarser than the swath.
+
+An :class:`IndexMapCache` keeps those index maps keyed by the geolocation and target grid,
+in memory and optionally on disk, so repeated composites of the same granule skip the
+neighbour search entirely.
+"""
+
+# Standard library imports for hashing and the on-disk cache.
+import os
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Third-party imports for array handling, scipy is only imported when a regridder is built.
+import numpy as np
+
+# Local imports for the reader exceptions.
+from .exceptions import EmptySubsetError
+
+
+def lonlatToXYZ(lon, lat):
+    """
+    Converts longitudes and latitudes to 3-D unit vectors.
+
+    Args:
+        lon (np.ndarray): Longitudes in degrees.
+        lat (np.ndarray): Latitudes in degrees.
+
+    Returns:
+        np.ndarray: An (N, 3) array of unit vectors.
+    """
+    lon = np.radians(np.ravel(lon).astype(np.float64))
+    lat = np.radians(np.ravel(lat).astype(np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat*np.cos(lon), cos_lat*np.sin(lon), np.sin(lat)))
+
+
+def chordLength(degrees):
+    """
+    Converts a great-circle distance in degrees to the straight-line distance between unit vectors.
+
+    Args:
+        degrees (float): The angular distance in degrees.
+
+    Returns:
+        float: The chord length on the unit sphere.
+    """
+    return 2*np.sin(np.radians(degrees)/2)
+
+
+def swathSpacing(lon, lat):
+    """
+    Estimates the typical pixel spacing of a 2-D swath.
+
+    Args:
+        lon (np.ndarray): 2D array of longitude values.
+        lat (np.ndarray): 2D array of latitude values.
+
+    Returns:
+        float: The median distance between neighbouring pixels in degrees.
+    """
+    xyz = lonlatToXYZ(lon, lat).reshape(np.shape(lon) + (3,))
+    steps = [np.linalg.norm(np.diff(xyz, axis=axis), axis=-1).ravel() for axis in range(2) if xyz.shape[axis] > 1]
+    steps = np.concatenate(steps) if steps else np.array([])
+    steps = steps[np.isfinite(steps) & (steps > 0)]
+    if steps.size == 0:
+        return 0.0
+    return float(np.degrees(2*np.arcsin(np.median(steps)/2)))
+
+
+class Regridder:
+    """
+    Maps swath data onto a target grid by nearest-neighbour lookup.
+
+    The spatial tree is built once per geolocation and queried once per target grid; every
+    call to :meth:`regrid` afterwards is a single fancy-indexing gather.
+    """
+
+    def __init__(self, lon, lat, target_lon, target_lat, max_distance='auto', valid=None):
+        """
+        Initializes the regridder and computes the target-to-source index map.
+
+        Args:
+            lon (np.ndarray): 2D array of swath longitudes.
+            lat (np.ndarray): 2D array of swath latitudes.
+            target_lon (np.ndarray): Longitudes of the target pixels, any shape.
+            target_lat (np.ndarray): Latitudes of the target pixels, same shape as target_lon.
+            max_distance (float or str, optional): The largest distance in degrees between a target
+                                                   pixel and its source pixel. Target pixels further away
+                                                   are left empty, which keeps off-swath areas transparent.
+                                                   'auto' uses twice the swath pixel spacing, None disables
+                                                   the cutoff. Defaults to 'auto'.
+            valid (np.ndarray, optional): A boolean mask of usable swath pixels. Defaults to all pixels
+                                          with finite, unmasked geolocation.
+        """
+        self.source_shape = np.shape(lon)
+        self.target_shape = np.shape(target_lon)
+
+        # only pixels with a usable geolocation go into the tree
+        lon_ = np.ma.filled(np.ma.asarray(lon, dtype=np.float64), np.nan)
+        lat_ = np.ma.filled(np.ma.asarray(lat, dtype=np.float64), np.nan)
+        usable = np.isfinite(lon_) & np.isfinite(lat_)
+        if valid is not None:
+            usable &= np.asarray(valid, dtype=bool)
+        source = np.flatnonzero(usable)
+
+        if max_distance == 'auto':
+            max_distance = 2*swathSpacing(lon_, lat_)
+        self.max_distance = max_distance
+
+        # int32 halves the size of cached index maps for any realistic swath
+        index_dtype = np.int32 if np.prod(self.source_shape) < np.iinfo(np.int32).max else np.int64
+        index = np.full(int(np.prod(self.target_shape)), -1, dtype=index_dtype)
+        # target pixels off the globe (e.g. the corners of an orthographic raster) are not queried
+        target = lonlatToXYZ(target_lon, target_lat)
+        on_globe = np.flatnonzero(np.all(np.isfinite(target), axis=1))
+        if source.size and on_globe.size:
+            from scipy.spatial import cKDTree
+            tree = cKDTree(lonlatToXYZ(lon_.ravel()[source], lat_.ravel()[source]))
+            upper = np.inf if not max_distance else chordLength(max_distance)
+            _, nearest = tree.query(target[on_globe], distance_upper_bound=upper, workers=-1)
+            found = nearest < source.size
+            index[on_globe[found]] = source[nearest[found]]
+        self.index = index
+
+    @classmethod
+    def fromIndex(cls, index, source_shape, max_distance=None):
+        """
+        Recreates a regridder from a previously computed index map.
+
+        Args:
+            index (np.ndarray): The flat source index of every target pixel, -1 where empty,
+                                shaped like the target grid.
+            source_shape (tuple): The shape of the swath the index refers to.
+            max_distance (float, optional): The cutoff used to compute the index. Defaults to None.
+
+        Returns:
+            Regridder: A regridder that only needs to gather.
+        """
+        regridder = cls.__new__(cls)
+        regridder.source_shape = tuple(source_shape)
+        regridder.target_shape = np.shape(index)
+        regridder.max_distance = max_distance
+        regridder.index = np.ravel(index)
+        return regridder
+
+    @property
+    def valid(self):
+        """np.ndarray: Boolean mask of target pixels that have a source pixel."""
+        return (self.index >= 0).reshape(self.target_shape)
+
+    def regrid(self, values, fill_value=0):
+        """
+        Maps one or more swath variables onto the target grid.
+
+        Args:
+            values (np.ndarray): An array whose first two dimensions match the swath, e.g. (rows, cols)
+                                 or a stack (rows, cols, channels).
+            fill_value (float, optional): The value for empty or masked target pixels. If None, a
+                                          masked array is returned instead. Defaults to 0.
+
+        Returns:
+            np.ndarray: The regridded values with shape target_shape + values.shape[2:].
+        """
+        trailing = np.shape(values)[len(self.source_shape):]
+        flat = np.ma.asarray(values).reshape((-1,) + trailing)
+        found = self.index >= 0
+
+        data = np.zeros((self.index.size,) + trailing, dtype=flat.dtype)
+        mask = np.ones((self.index.size,) + trailing, dtype=bool)
+        data[found] = np.ma.getdata(flat)[self.index[found]]
+        mask[found] = np.ma.getmaskarray(flat)[self.index[found]]
+
+        data = data.reshape(self.target_shape + trailing)
+        mask = mask.reshape(self.target_shape + trailing)
+        if fill_value is None:
+            return np.ma.MaskedArray(data, mask=mask)
+        data[mask] = fill_value
+        return data
+
+
+class BinAverager:
+    """
+    Grids swath data by forward binning ("drop in bucket") onto a regular lon/lat grid.
+
+    Every valid swath pixel is assigned to the grid cell that contains it and the cell values
+    are reduced with vectorised bincount accumulation, so the cost grows linearly with the
+    swath size. Cells that receive no pixel are left empty, so the grid should be coarser
+    than the swath.
+    """
+
+    statistics = ['mean', 'sum', 'count', 'min', 'max']
+
+    def __init__(self, lon, lat, grid_lon, grid_lat, periodic=True):
+        """
+        Initializes the binner and assigns each swath pixel to a grid cell.
+
+        Args:
+            lon (np.ndarray): 2D array of swath longitudes (or projected x coordinates).
+            lat (np.ndarray): 2D array of swath latitudes (or projected y coordinates).
+            grid_lon (np.ndarray): 1D array of evenly spaced cell-centre longitudes, increasing or
+                                   decreasing. Values beyond 180 are allowed for grids across the dateline.
+            grid_lat (np.ndarray): 1D array of evenly spaced cell-centre latitudes.
+            periodic (bool, optional): If True, longitudes are wrapped by 360 degrees into the grid.
+                                       Use False for projected coordinates. Defaults to True.
+        """
+        self.source_shape = np.shape(lon)
+        self.target_shape = (len(grid_lat), len(grid_lon))
+
+        lon_ = np.ma.filled(np.ma.asarray(lon, dtype=np.float64), np.nan).ravel()
+        lat_ = np.ma.filled(np.ma.asarray(lat, dtype=np.float64), np.nan).ravel()
+
+        dlon = (grid_lon[-1] - grid_lon[0])/(len(grid_lon) - 1) if len(grid_lon) > 1 else 1.0
+        dlat = (grid_lat[-1] - grid_lat[0])/(len(grid_lat) - 1) if len(grid_lat) > 1 else 1.0
+
+        # wrap the swath longitudes into the 360 degree window starting at the grid edge
+        if periodic:
+            start = min(grid_lon[0], grid_lon[-1]) - abs(dlon)/2
+            lon_ = (lon_ - start) % 360 + start
+
+        with np.errstate(invalid='ignore'):
+            col = np.rint((lon_ - grid_lon[0])/dlon)
+            row = np.rint((lat_ - grid_lat[0])/dlat)
+        inside = (np.isfinite(col) & np.isfinite(row) & (col >= 0) & (col < self.target_shape[1])
+                  & (row >= 0) & (row < self.target_shape[0]))
+
+        cell = np.full(lon_.size, -1, dtype=np.int64)
+        cell[inside] = row[inside].astype(np.int64)*self.target_shape[1] + col[inside].astype(np.int64)
+        self.cell = cell
+
+    @classmethod
+    def fromExtent(cls, lon, lat, extent, shape):
+        """
+        Creates a binner for a regular grid covering an extent.
+
+        Args:
+            lon (np.ndarray): 2D array of swath longitudes.
+            lat (np.ndarray): 2D array of swath latitudes.
+            extent (list): [lon_min, lon_max, lat_min, lat_max] of the grid edges in degrees.
+            shape (tuple): The (rows, columns) of the grid.
+
+        Returns:
+            BinAverager: The binner.
+        """
+        lon_min, lon_max, lat_min, lat_max = extent
+        dlon = (lon_max - lon_min)/shape[1]
+        dlat = (lat_max - lat_min)/shape[0]
+        grid_lon = lon_min + dlon*(np.arange(shape[1]) + 0.5)
+        grid_lat = lat_min + dlat*(np.arange(shape[0]) + 0.5)
+        return cls(lon, lat, grid_lon, grid_lat)
+
+    def count(self, values=None):
+        """
+        Counts the valid swath pixels in each grid cell.
+
+        Args:
+            values (np.ndarray, optional): If given, masked or non-finite pixels are not counted.
+
+        Returns:
+            np.ndarray: The pixel count of each cell.
+        """
+        cell = self.cell if values is None else self.cell[self._usable(np.ma.asarray(values).ravel())]
+        cell = cell[cell >= 0]
+        return np.bincount(cell, minlength=int(np.prod(self.target_shape))).reshape(self.target_shape)
+
+    def _usable(self, flat):
+        data = np.ma.getdata(flat)
+        usable = ~np.ma.getmaskarray(flat)
+        if np.issubdtype(data.dtype, np.floating):
+            usable &= np.isfinite(data)
+        return usable
+
+    def regrid(self, values, fill_value=0, statistic='mean'):
+        """
+        Bins one or more swath variables onto the grid.
+
+        Args:
+            values (np.ndarray): An array whose first two dimensions match the swath, e.g. (rows, cols)
+                                 or a stack (rows, cols, channels).
+            fill_value (float, optional): The value for cells without valid pixels. If None, a masked
+                                          array is returned instead. Defaults to 0.
+            statistic (str, optional): One of 'mean', 'sum', 'count', 'min' or 'max'. Defaults to 'mean'.
+
+        Returns:
+            np.ndarray: The binned values with shape target_shape + values.shape[2:].
+        """
+        assert statistic in self.statistics, f'Error: statistic must be one of {self.statistics}'
+        trailing = np.shape(values)[len(self.source_shape):]
+        flat = np.ma.asarray(values).reshape((np.prod(self.source_shape, dtype=int), -1))
+        ncell = int(np.prod(self.target_shape))
+
+        out = np.zeros((ncell, flat.shape[1]), dtype=np.float64)
+        counts = np.zeros((ncell, flat.shape[1]), dtype=np.int64)
+        for k in range(flat.shape[1]):
+            usable = self._usable(flat[:, k]) & (self.cell >= 0)
+            cell = self.cell[usable]
+            data = np.ma.getdata(flat[:, k])[usable].astype(np.float64)
+            counts[:, k] = np.bincount(cell, minlength=ncell)
+            if statistic in ['mean', 'sum']:
+                out[:, k] = np.bincount(cell, weights=data, minlength=ncell)
+            elif statistic == 'min':
+                out[:, k] = np.inf
+                np.minimum.at(out[:, k], cell, data)
+            elif statistic == 'max':
+                out[:, k] = -np.inf
+                np.maximum.at(out[:, k], cell, data)
+
+        empty = counts == 0
+        if statistic == 'mean':
+            out = out/np.maximum(counts, 1)
+        elif statistic == 'count':
+            out = counts.astype(np.float64)
+            empty = np.zeros_like(empty)
+
+        out = out.reshape(self.target_shape + trailing)
+        empty = empty.reshape(self.target_shape + trailing)
+        if fill_value is None:
+            return np.ma.MaskedArray(out, mask=empty)
+        out[empty] = fill_value
+        return out
+
+
+def mapProjection(proj, lon_0=0, lat_0=0):
+    """
+    Creates a map projection by name, for Plot.projectedRGB and template.FigureTemplate.
+
+    Args:
+        proj (str or cartopy.crs.Projection): 'PlateCarree', 'Orthographic', 'NorthPolarStereo',
+                                              'SouthPolarStereo', 'None' for the unprojected
+                                              longitude/latitude raster, i.e. PlateCarree, or a projection.
+        lon_0 (float, optional): The central longitude. Defaults to 0.
+        lat_0 (float, optional): The central latitude of the Orthographic projection. Defaults to 0.
+
+    Returns:
+        cartopy.crs.Projection: The map projection, proj itself if it is not a name.
+
+    Raises:
+        ValueError: If the name is none of the above, so a misspelt projection is not drawn as PlateCarree.
+    """
+    if not isinstance(proj, str):
+        return proj
+    import cartopy.crs as ccrs
+    match proj.lower():
+        case 'orthographic':
+            return ccrs.Orthographic(lon_0, lat_0)
+        case 'northpolarstereo':
+            return ccrs.NorthPolarStereo(central_longitude=lon_0)
+        case 'southpolarstereo':
+            return ccrs.SouthPolarStereo(central_longitude=lon_0)
+        case 'platecarree' | 'none':
+            return ccrs.PlateCarree(central_longitude=lon_0)
+        case _:
+            raise ValueError(f'Error: unknown projection {proj}')
+
+
+def projectedExtent(projection, lon, lat, margin=0.02):
+    """
+    Computes the extent of a swath in the coordinates of a map projection.
+
+    Args:
+        projection (cartopy.crs.Projection): The target projection.
+        lon (np.ndarray): 2D array of swath longitudes.
+        lat (np.ndarray): 2D array of swath latitudes.
+        margin (float, optional): The fraction added on every side. Defaults to 0.02.
+
+    Returns:
+        list: [x_min, x_max, y_min, y_max] in projection coordinates.
+
+    Raises:
+        EmptySubsetError: If no pixel of the swath is visible in the projection, e.g. on the far side of a globe.
+    """
+    xy = projectedCoordinates(projection, lon, lat)
+    x = xy[..., 0][np.isfinite(xy[..., 0])]
+    y = xy[..., 1][np.isfinite(xy[..., 1])]
+    if x.size == 0 or y.size == 0:
+        raise EmptySubsetError('Error: the swath is not visible in the map projection')
+    x_pad = (x.max() - x.min())*margin
+    y_pad = (y.max() - y.min())*margin
+
+    # stay inside the valid domain of the projection
+    x_min, x_max = max(x.min() - x_pad, projection.x_limits[0]), min(x.max() + x_pad, projection.x_limits[1])
+    y_min, y_max = max(y.min() - y_pad, projection.y_limits[0]), min(y.max() + y_pad, projection.y_limits[1])
+    return [x_min, x_max, y_min, y_max]
+
+
+def projectedCoordinates(projection, lon, lat):
+    """
+    Projects longitudes and latitudes into a map projection.
+
+    Args:
+        projection (cartopy.crs.Projection): The target projection.
+        lon (np.ndarray): Longitudes in degrees.
+        lat (np.ndarray): Latitudes in degrees.
+
+    Returns:
+        np.ndarray: The projected coordinates with a trailing (x, y) axis, NaN where not visible.
+    """
+    import cartopy.crs as ccrs
+    lon = np.ma.filled(np.ma.asarray(lon, dtype=np.float64), np.nan)
+    lat = np.ma.filled(np.ma.asarray(lat, dtype=np.float64), np.nan)
+    xy = projection.transform_points(ccrs.Geodetic(), lon, lat)[..., :2]
+    xy[~np.isfinite(xy)] = np.nan
+    return xy
+
+
+def projectionGrid(projection, extent, shape):
+    """
+    Computes the longitude and latitude of every pixel centre of a raster in a map projection.
+
+    Args:
+        projection (cartopy.crs.Projection): The projection of the raster.
+        extent (list): [x_min, x_max, y_min, y_max] of the raster edges in projection coordinates.
+        shape (tuple): The (rows, columns) of the raster.
+
+    Returns:
+        tuple: 2D arrays of longitude and latitude, NaN for pixels off the globe.
+    """
+    import cartopy.crs as ccrs
+    x_min, x_max, y_min, y_max = extent
+    x = x_min + (x_max - x_min)*(np.arange(shape[1]) + 0.5)/shape[1]
+    y = y_min + (y_max - y_min)*(np.arange(shape[0]) + 0.5)/shape[0]
+    xx, yy = np.meshgrid(x, y)
+    lonlat = ccrs.Geodetic().transform_points(projection, xx, yy)
+    lon, lat = lonlat[..., 0], lonlat[..., 1]
+
+    # round-trip the pixels to drop those that fall off the globe (e.g. orthographic corners)
+    back = projection.transform_points(ccrs.Geodetic(), lon, lat)
+    off_globe = ~np.isfinite(lon) | ~np.isfinite(lat) | (np.hypot(back[..., 0] - xx, back[..., 1] - yy) > 1e-3*max(x_max - x_min, y_max - y_min))
+    lon[off_globe] = np.nan
+    lat[off_globe] = np.nan
+    return lon, lat
+
+
+def rasterShape(extent, size):
+    """
+    Chooses a raster shape with square pixels whose longer side has a given size.
+
+    Args:
+        extent (list): [x_min, x_max, y_min, y_max] of the raster.
+        size (int): The number of pixels along the longer side.
+
+    Returns:
+        tuple: The (rows, columns) of the raster.
+    """
+    width = extent[1] - extent[0]
+    height = extent[3] - extent[2]
+    if width >= height:
+        return max(int(round(size*height/width)), 1), size
+    return size, max(int(round(size*width/height)), 1)
+
+
+class IndexMapCache:
+    """
+    A least-recently-used cache of regridder index maps with an optional on-disk tier.
+
+    Index maps are keyed by a hash of the swath latitude/longitude and a description of the
+    target grid (e.g. method and proj_size), so every composite of the same granule, whatever
+    the variable or view triplet, reuses the same map.
+    """
+
+    def __init__(self, maxsize=8, cache_dir=None):
+        """
+        Initializes the cache.
+
+        Args:
+            maxsize (int, optional): The number of index maps kept in memory. Defaults to 8.
+            cache_dir (str, optional): A directory where index maps are also stored as .npy files,
+                                       None to keep them in memory only. Defaults to None.
+        """
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, *parts):
+        """
+        Hashes arrays and parameters into a cache key.
+
+        Args:
+            *parts: Arrays (hashed by content, shape and dtype) or other values (hashed by repr).
+
+        Returns:
+            str: The hexadecimal key.
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        for part in parts:
+            if isinstance(part, np.ndarray):
+                digest.update(repr((part.shape, part.dtype.str)).encode())
+                digest.update(np.ascontiguousarray(np.ma.getdata(part)).tobytes())
+                if np.ma.is_masked(part):
+                    digest.update(np.packbits(np.ma.getmaskarray(part)).tobytes())
+            else:
+                digest.update(repr(part).encode())
+        return digest.hexdigest()
+
+    def get(self, key, source_shape):
+        """
+        Looks up a regridder, first in memory and then on disk.
+
+        Args:
+            key (str): The cache key.
+            source_shape (tuple): The shape of the swath the index refers to.
+
+        Returns:
+            Regridder: The cached regridder, or None if the key is unknown.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        if self.cache_dir is not None:
+            path = os.path.join(self.cache_dir, f'{key}.npy')
+            if os.path.exists(path):
+                regridder = Regridder.fromIndex(np.load(path), source_shape)
+                self._remember(key, regridder)
+                with self._lock:
+                    self.hits += 1
+                return regridder
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, regridder):
+        """
+        Stores a regridder in memory and, if configured, its index map on disk.
+
+        Args:
+            key (str): The cache key.
+            regridder (Regridder): The regridder to store.
+        """
+        self._remember(key, regridder)
+        if self.cache_dir is not None:
+            # write to a temporary file first so concurrent readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.npy')
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, regridder.index.reshape(regridder.target_shape))
+            os.replace(tmp_path, os.path.join(self.cache_dir, f'{key}.npy'))
+
+    def _remember(self, key, regridder):
+        with self._lock:
+            self._entries[key] = regridder
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Empties the in-memory tier. Files in cache_dir are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def lookup(self, lon, lat, grid, max_distance='auto'):
+        """
+        Looks up the regridder for a swath and a target grid description without building it.
+
+        Args:
+            lon (np.ndarray): 2D array of swath longitudes.
+            lat (np.ndarray): 2D array of swath latitudes.
+            grid (tuple): A description of the target grid, e.g. ('meshgridRGB', proj_size).
+            max_distance (float or str, optional): See Regridder. Defaults to 'auto'.
+
+        Returns:
+            tuple: The cache key and the cached regridder, or None on a miss.
+        """
+        lon = np.ma.asarray(lon)
+        lat = np.ma.asarray(lat)
+        key = self.key(lon, lat, *(grid if isinstance(grid, tuple) else (grid,)), max_distance)
+        return key, self.get(key, lon.shape)
+
+    def regridder(self, lon, lat, target_lon, target_lat, max_distance='auto', grid=None):
+        """
+        Returns a cached regridder for a swath and target grid, building it on a miss.
+
+        Args:
+            lon (np.ndarray): 2D array of swath longitudes.
+            lat (np.ndarray): 2D array of swath latitudes.
+            target_lon (np.ndarray): Longitudes of the target pixels.
+            target_lat (np.ndarray): Latitudes of the target pixels.
+            max_distance (float or str, optional): See Regridder. Defaults to 'auto'.
+            grid (tuple, optional): A description of the target grid, e.g. ('meshgridRGB', proj_size).
+                                    It must determine target_lon/target_lat for the given swath;
+                                    if None the target coordinates are hashed instead. Defaults to None.
+
+        Returns:
+            Regridder: The regridder for this swath and grid.
+        """
+        target = grid if grid is not None else (np.asarray(target_lon), np.asarray(target_lat))
+        key, regridder = self.lookup(lon, lat, target, max_distance)
+        if regridder is None:
+            regridder = Regridder(lon, lat, target_lon, target_lat, max_distance=max_distance)
+            self.put(key, regridder)
+        return regridder
+
+
+# Shared in-memory cache used by the plotting methods
+INDEX_CACHE = IndexMapCache()
@@ -0,0 +1,480 @@
+"""
+Parallel quicklook generation for the NASA PACE Data Reader library.
+
+``Examples/quicklook-l1c.sh`` used to start a new Python interpreter for every granule, paying
+for the imports and the cartopy figure each time, and rendered the granules one after the other.
+:func:`renderMany` renders a whole directory tree in one process pool instead. Every worker imports
+matplotlib and cartopy and builds the figures of the layout once, then each granule is read,
+regridded once for all panels, drawn into the existing figure and saved::
+
+    pace-quicklook /data/HARP2/L1C --save-path /data/quicklook --workers 8
+
+or from Python::
+
+    from nasa_pace_data_reader import renderer
+    report = renderer.renderMany(['/data/HARP2/L1C'], save_path='/data/quicklook', workers=8)
+    print(report.summary())
+
+Granules whose quicklooks exist already are skipped unless ``overwrite=True``. The layout is one of
+LAYOUTS or a JSON file with the same keys.
+"""
+
+# Standard library imports for the command line, the directory walk and the worker pool.
+import os
+import sys
+import glob
+import copy
+import json
+import time
+import fnmatch
+import argparse
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Third-party imports for array handling.
+import numpy as np
+
+# Local imports for reading, regridding and the reusable figures.
+from .L1 import L1C
+from .plot import Plot
+from .template import FigureTemplate
+from .backgrounds import setOffline, setCacheDir
+from .profiling import span, profiled
+
+# The granules rendered when a directory is given.
+PATTERN = '*L1C*5km.nc'
+
+# The quicklook layouts: the panels of the map figure, each with its title and the keyword arguments of
+# Plot.plotRGB, the figure title with the {date_time} and {filename} fields, and the orthographic view.
+LAYOUTS = {
+    'HARP2': {
+        'nrows': 2,
+        'ncols': 2,
+        'figsize': [12, 9],
+        'title': 'HARP2 L1C Quicklook\n {date_time} UTC',
+        'panels': [
+            {'title': 'Intensity\n(R=670 nm, G=550 nm, B=440 nm)'},
+            {'title': 'Intensity\n(R=670 nm, G=870 nm, B=440 nm)', 'var': 'i', 'viewAngleIdx': [36, 73, 84],
+             'scale': [0.85, 1.4, 1]},
+            {'title': 'Polarized Radiance\n(R=670 nm, G=550 nm, B=440 nm)', 'var': 'dolp',
+             'viewAngleIdx': [31, 3, 83], 'normFactor': 50, 'scale': [0.8, 1, 1], 'rgb_dolp': True},
+            {'title': 'Polarized Radiance\n(R=670 nm, G=870 nm, B=440 nm)', 'var': 'dolp', 'normFactor': 50,
+             'scale': [0.8, 1, 1], 'rgb_dolp': True},
+        ],
+        'orthographic': {'figsize': [5, 5], 'panel': 0},
+    },
+}
+
+# The orthographic views are centred on a grid of this spacing in degrees, so nearby granules share a figure.
+ORTHO_STEP = 10
+
+# The number of orthographic figures a renderer keeps.
+ORTHO_FIGURES = 4
+
+# The renderer of a worker process, built once by startWorker.
+_renderer = None
+
+
+def loadLayout(layout):
+    """
+    Returns a quicklook layout.
+
+    Args:
+        layout (str or dict): A key of LAYOUTS, the path to a JSON file or the layout itself.
+
+    Returns:
+        dict: A copy of the layout.
+
+    Raises:
+        ValueError: If the layout is unknown or has more panels than the figure.
+    """
+    if isinstance(layout, dict):
+        layout = copy.deepcopy(layout)
+    elif layout in LAYOUTS:
+        layout = copy.deepcopy(LAYOUTS[layout])
+    elif os.path.isfile(layout):
+        with open(layout) as f:
+            layout = json.load(f)
+    else:
+        raise ValueError(f'Error: unknown layout {layout}, use one of {list(LAYOUTS)} or a JSON file')
+
+    layout.setdefault('nrows', 1)
+    layout.setdefault('ncols', len(layout.get('panels', [])))
+    if not layout.get('panels') or len(layout['panels']) > layout['nrows']*layout['ncols']:
+        raise ValueError(f'Error: the layout needs 1 to {layout["nrows"]*layout["ncols"]} panels')
+    return layout
+
+
+def findGranules(targets, pattern=PATTERN):
+    """
+    Lists the granules of directories, glob patterns and files.
+
+    Args:
+        targets (list): Directories, searched recursively for pattern, glob patterns or paths to granules.
+        pattern (str, optional): The file name pattern within directories. Defaults to PATTERN.
+
+    Returns:
+        list: The absolute paths of the granules, sorted and without duplicates.
+    """
+    found = set()
+    for target in targets:
+        target = os.path.expanduser(str(target))
+        if os.path.isdir(target):
+            for directory, _, files in os.walk(target):
+                found.update(os.path.join(directory, name) for name in fnmatch.filter(files, pattern))
+        elif os.path.isfile(target):
+            found.add(target)
+        else:
+            found.update(path for path in glob.glob(target, recursive=True) if os.path.isfile(path))
+    return sorted(os.path.abspath(path) for path in found)
+
+
+def quicklookPath(filename, save_path=None):
+    """
+    Returns the path of the quicklook of a granule.
+
+    Args:
+        filename (str): The path to the granule.
+        save_path (str, optional): The output directory. Defaults to None, the directory of the granule.
+
+    Returns:
+        str: <save_path>/<granule name without extension>_quicklook.png
+    """
+    directory = os.path.dirname(filename) if save_path is None else save_path
+    return os.path.join(directory, os.path.splitext(os.path.basename(filename))[0] + '_quicklook.png')
+
+
+def orthographicPath(path):
+    """Returns the path of the orthographic view saved next to a quicklook."""
+    root, ext = os.path.splitext(path)
+    return f'{root}_orthographic{ext}'
+
+
+class RenderResult:
+    """
+    The outcome of rendering a single granule.
+
+    Attributes:
+        path (str): The path to the granule.
+        outputs (list): The saved images, empty if the render failed.
+        seconds (float): The time spent on the granule in the worker.
+        error (Exception): The exception raised while rendering, None if the render succeeded.
+        traceback (str): The formatted traceback of the error, None if the render succeeded.
+    """
+
+    def __init__(self, path, outputs=(), seconds=0.0, error=None, traceback=None):
+        self.path = path
+        self.outputs = list(outputs)
+        self.seconds = seconds
+        self.error = error
+        self.traceback = traceback
+
+    @property
+    def ok(self):
+        """bool: True if the granule was rendered without error."""
+        return self.error is None
+
+    def __repr__(self):
+        status = f'{self.seconds:.2f} s' if self.ok else f'failed: {self.error!r}'
+        return f'<RenderResult {self.path} ({status})>'
+
+
+class RenderReport:
+    """
+    The results and the throughput of a batch of quicklooks.
+
+    Attributes:
+        results (list): One RenderResult per rendered granule, in the order they completed.
+        skipped (list): The granules whose quicklooks existed already.
+        workers (int): The number of worker processes.
+        seconds (float): The wall-clock time of the batch.
+    """
+
+    def __init__(self, workers, skipped=()):
+        self.results = []
+        self.skipped = list(skipped)
+        self.workers = workers
+        self.seconds = 0.0
+
+    @property
+    def failed(self):
+        """list: The results of the granules that could not be rendered."""
+        return [result for result in self.results if not result.ok]
+
+    def summary(self):
+        """
+        Formats the throughput of the batch.
+
+        Returns:
+            str: The number of rendered, skipped and failed granules, the granules per minute and the
+                 mean time per granule in a worker.
+        """
+        done = [result for result in self.results if result.ok]
+        rate = 60*len(done)/self.seconds if self.seconds > 0 else 0.0
+        mean = np.mean([result.seconds for result in done]) if done else 0.0
+        return (f'...Rendered {len(done)} granules in {self.seconds:.1f} s with {self.workers} workers '
+                f'({rate:.1f} granules/min, {mean:.2f} s per granule and worker), '
+                f'{len(self.skipped)} skipped, {len(self.failed)} failed')
+
+
+class QuicklookRenderer:
+    """
+    Renders the quicklooks of granules into figures that are built once.
+    """
+
+    def __init__(self, layout='HARP2', dpi=300, normFactor=300, orthographic=True, proj_size=(900,400),
+                 regrid_method='nearest'):
+        """
+        Builds the map figure of the layout.
+
+        Args:
+            layout (str or dict, optional): The layout, see loadLayout. Defaults to 'HARP2'.
+            dpi (int, optional): The resolution of the saved images. Defaults to 300.
+            normFactor (float, optional): The normalization factor of panels that do not set their own.
+                                          Defaults to 300.
+            orthographic (bool, optional): Whether to also save the orthographic view of the layout.
+                                           Defaults to True.
+            proj_size (tuple, optional): The longer side of the regridded images is max(proj_size) pixels.
+                                         Defaults to (900,400).
+            regrid_method (str, optional): 'nearest' or 'mean'. Defaults to 'nearest'.
+        """
+        self.layout = loadLayout(layout)
+        self.dpi = dpi
+        self.proj_size = proj_size
+        self.regrid_method = regrid_method
+        self.orthographic = orthographic and self.layout.get('orthographic') is not None
+        self.layers = [{'normFactor': normFactor, **{key: value for key, value in panel.items() if key != 'title'}}
+                       for panel in self.layout['panels']]
+
+        self.template = FigureTemplate('PlateCarree', nrows=self.layout['nrows'], ncols=self.layout['ncols'],
+                                       figsize=tuple(self.layout.get('figsize', (6, 6))), dpi=dpi,
+                                       proj_size=proj_size)
+        for panel, spec in zip(self.template.panels, self.layout['panels']):
+            panel.ax.set_title(spec.get('title', ''))
+        self._orthographic = OrderedDict()
+
+    def __repr__(self):
+        return f'<QuicklookRenderer {len(self.layers)} panels{", orthographic" if self.orthographic else ""}>'
+
+    @property
+    def variables(self):
+        """list: The observation variables read from the granules."""
+        return sorted({'i'} | {layer.get('var', 'i') for layer in self.layers})
+
+    def outputs(self, savePath):
+        """Returns the images saved for a quicklook path."""
+        return [savePath, orthographicPath(savePath)] if self.orthographic else [savePath]
+
+    def orthographicTemplate(self, plot):
+        """
+        Returns the orthographic figure centred closest to a granule.
+
+        Args:
+            plot (Plot): The plot object of the granule.
+
+        Returns:
+            FigureTemplate: A globe centred on the granule, snapped to ORTHO_STEP degrees.
+        """
+        lon = plot.data['longitude']
+        lat = plot.data['latitude']
+        if np.abs(np.nanmax(lon) - np.nanmin(lon)) > 180:
+            lon_center = plot.average_longitude(np.ravel(lon))[0]
+        else:
+            lon_center = (np.nanmax(lon) + np.nanmin(lon))/2
+        lat_center = (np.nanmax(lat) + np.nanmin(lat))/2
+        key = (float(np.round(lon_center/ORTHO_STEP)*ORTHO_STEP % 360), float(np.round(lat_center/ORTHO_STEP)*ORTHO_STEP))
+
+        ortho = self._orthographic.get(key)
+        if ortho is None:
+            ortho = FigureTemplate('Orthographic', lon_0=key[0], lat_0=key[1],
+                                   figsize=tuple(self.layout['orthographic'].get('figsize', (5, 5))), dpi=self.dpi,
+                                   proj_size=self.proj_size)
+            self._orthographic[key] = ortho
+            while len(self._orthographic) > ORTHO_FIGURES:
+                self._orthographic.popitem(last=False)
+        self._orthographic.move_to_end(key)
+        return ortho
+
+    @profiled('QuicklookRenderer.render')
+    def render(self, filename, savePath):
+        """
+        Renders the quicklook of one granule.
+
+        Args:
+            filename (str): The path to the granule.
+            savePath (str): The path of the quicklook, the orthographic view is saved next to it.
+
+        Returns:
+            list: The saved images.
+        """
+        l1c_dict = L1C().read(filename, variables=self.variables)
+        plot = Plot(l1c_dict)
+
+        title = self.layout.get('title', '{filename}').format(date_time=l1c_dict.get('date_time'),
+                                                            filename=os.path.basename(filename))
+        self.template.renderRGBs(plot, self.layers, savePath, title=title, regrid_method=self.regrid_method)
+        if self.orthographic:
+            layer = self.layers[self.layout['orthographic'].get('panel', 0)]
+            ortho = self.orthographicTemplate(plot)
+            ortho.renderRGB(plot, orthographicPath(savePath), regrid_method=self.regrid_method, **layer)
+        return self.outputs(savePath)
+
+
+def startWorker(options, offline=None, cache_dir=None):
+    """
+    Imports the plotting libraries and builds the figures of a worker process once.
+
+    Args:
+        options (dict): The keyword arguments of QuicklookRenderer.
+        offline (str, optional): A Natural Earth data directory to use without downloads, '' for
+                                 cartopy's own directory. Defaults to None, downloads are allowed.
+        cache_dir (str, optional): A directory caching the rendered map backgrounds. Defaults to None.
+    """
+    global _renderer
+    if offline is not None:
+        setOffline(offline or None)
+    if cache_dir is not None:
+        setCacheDir(cache_dir)
+    with span('startWorker'):
+        _renderer = QuicklookRenderer(**options)
+
+
+def renderOne(filename, savePath):
+    """
+    Renders one granule with the renderer of the worker and captures any error instead of raising it.
+
+    Args:
+        filename (str): The path to the granule.
+        savePath (str): The path of the quicklook.
+
+    Returns:
+        RenderResult: The saved images or the captured error.
+    """
+    start = time.perf_counter()
+    try:
+        outputs = _renderer.render(filename, savePath)
+        return RenderResult(filename, outputs, time.perf_counter() - start)
+    except Exception as e:
+        return RenderResult(filename, seconds=time.perf_counter() - start, error=e, traceback=traceback.format_exc())
+
+
+def renderMany(targets, save_path=None, pattern=PATTERN, workers=None, overwrite=False, offline=None,
+               cache_dir=None, **options):
+    """
+    Renders the quicklooks of many granules in a pool of worker processes.
+
+    Args:
+        targets (list): Directories, glob patterns or granules, see findGranules.
+        save_path (str, optional): The output directory, created if needed. Defaults to None, every
+                                   quicklook is saved next to its granule.
+        pattern (str, optional): The file name pattern within directories. Defaults to PATTERN.
+        workers (int, optional): The number of worker processes, 1 to render in this process.
+                                 Defaults to the number of CPUs.
+        overwrite (bool, optional): If True, existing quicklooks are rendered again. Defaults to False.
+        offline (str, optional): A Natural Earth data directory to use without downloads, see startWorker.
+                                 Defaults to None.
+        cache_dir (str, optional): A directory caching the rendered map backgrounds. Defaults to None.
+        **options: Keyword arguments for QuicklookRenderer, e.g. layout, dpi or normFactor.
+
+    Returns:
+        RenderReport: The result of every rendered granule and the throughput.
+    """
+    start = time.perf_counter()
+    granules = findGranules(targets, pattern)
+    if save_path is not None:
+        os.makedirs(save_path, exist_ok=True)
+
+    # a quicklook counts as done when all of its images exist
+    orthographic = options.get('orthographic', True) and \
+        loadLayout(options.get('layout', 'HARP2')).get('orthographic') is not None
+    jobs, skipped = [], []
+    for filename in granules:
+        savePath = quicklookPath(filename, save_path)
+        outputs = [savePath, orthographicPath(savePath)] if orthographic else [savePath]
+        if not overwrite and all(os.path.exists(output) for output in outputs):
+            skipped.append(filename)
+        else:
+            jobs.append((filename, savePath))
+
+    workers = max(min(os.cpu_count() if workers is None else workers, len(jobs)), 1)
+    report = RenderReport(workers, skipped)
+    print(f'...Found {len(granules)} granules, {len(skipped)} already rendered, '
+          f'{len(jobs)} to render with {workers} workers')
+
+    def record(result):
+        report.results.append(result)
+        status = f'{result.seconds:.2f} s' if result.ok else f'failed: {result.error}'
+        print(f'...[{len(report.results)}/{len(jobs)}] {os.path.basename(result.path)} ({status})')
+
+    if jobs and workers == 1:
+        startWorker(options, offline, cache_dir)
+        for filename, savePath in jobs:
+            record(renderOne(filename, savePath))
+    elif jobs:
+        with ProcessPoolExecutor(max_workers=workers, initializer=startWorker,
+                                 initargs=(options, offline, cache_dir)) as executor:
+            futures = {executor.submit(renderOne, filename, savePath): filename for filename, savePath in jobs}
+            for future in as_completed(futures):
+                try:
+                    record(future.result())
+                except Exception as e:
+                    # the worker itself failed, e.g. a crashed process
+                    record(RenderResult(futures[future], error=e, traceback=traceback.format_exc()))
+
+    report.seconds = time.perf_counter() - start
+    print(report.summary())
+    return report
+
+
+def main(argv=None):
+    """
+    The pace-quicklook command.
+
+    Args:
+        argv (list, optional): The command line arguments. Defaults to sys.argv[1:].
+
+    Returns:
+        int: 0 if all granules were rendered, 1 if any failed.
+    """
+    parser = argparse.ArgumentParser(
+                prog='pace-quicklook',
+                formatter_class=argparse.RawTextHelpFormatter,
+                description='Parallel PACE L1C quicklook processor',
+                epilog="""
+    EXIT Status:
+        0   : All is well in the world
+        1   : At least one granule could not be rendered
+                """)
+    parser.add_argument('targets', nargs='+',
+                        help='directories (searched recursively), glob patterns or L1C files')
+    parser.add_argument('--save-path', '--save_path', dest='save_path', type=str, default=None,
+                        help='output directory, defaults to the directory of every granule')
+    parser.add_argument('--pattern', type=str, default=PATTERN, help=f'file name pattern in directories, {PATTERN}')
+    parser.add_argument('--workers', '-j', type=int, default=None, help='worker processes, defaults to the CPUs')
+    parser.add_argument('--overwrite', action='store_true', help='render existing quicklooks again')
+    parser.add_argument('--layout', type=str, default='HARP2',
+                        help=f'one of {", ".join(LAYOUTS)} or a JSON file with the same keys')
+    parser.add_argument('--dpi', type=int, default=300, help='DPI of the saved figures')
+    parser.add_argument('--normFactor', type=float, default=300, help='Normalization factor of the intensity panels')
+    parser.add_argument('--no-orthographic', dest='orthographic', action='store_false',
+                        help='do not save the orthographic view')
+    parser.add_argument('--offline', type=str, default=None, nargs='?', const='',
+                        help='never download Natural Earth data, optionally from this data directory')
+    parser.add_argument('--cache-dir', type=str, default=None, help='directory caching the map backgrounds')
+    args = parser.parse_args(argv)
+
+    assert args.normFactor > 0, 'normFactor must be greater than 0'
+    loadLayout(args.layout)
+
+    report = renderMany(args.targets, save_path=args.save_path, pattern=args.pattern, workers=args.workers,
+                        overwrite=args.overwrite, offline=args.offline, cache_dir=args.cache_dir,
+                        layout=args.layout, dpi=args.dpi, normFactor=args.normFactor,
+                        orthographic=args.orthographic)
+    for result in report.failed:
+        print(f'...Error rendering {result.path}:\n{result.traceback}')
+    return 1 if report.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""
+Hyperslab subsetting helpers for the NASA PACE Data Reader library.
+
+A :class:`Subset` describes which views, wavelengths and row/column window should be read.
+It maps those selections onto the dimensions of each NetCDF variable, so that only the
+requested hyperslabs are decoded from disk.
+"""
+
+# Third-party imports for array handling.
+import numpy as np
+
+
+def dimensionRole(dimension):
+    """
+    Classifies a NetCDF dimension name as a view or a wavelength dimension.
+
+    Args:
+        dimension (str): The dimension name, e.g. 'number_of_views' or 'intensity_bands_per_view'.
+
+    Returns:
+        str: 'view', 'wavelength' or None if the dimension is neither.
+    """
+    name = dimension.lower()
+    if 'band' in name or 'wavelength' in name:
+        return 'wavelength'
+    if 'view' in name:
+        return 'view'
+    return None
+
+
+def toIndexer(indices):
+    """
+    Converts a list of indices to the cheapest equivalent NetCDF indexer.
+
+    Evenly spaced, increasing indices become a slice so the read is a single strided
+    hyperslab, any other order is kept as a list.
+
+    Args:
+        indices (int, slice or list): The indices along one dimension.
+
+    Returns:
+        int, slice or list: The indexer.
+    """
+    if isinstance(indices, (int, np.integer, slice)):
+        return indices
+    indices = [int(i) for i in np.atleast_1d(indices)]
+    if len(indices) == 1:
+        return slice(indices[0], indices[0] + 1)
+    step = indices[1] - indices[0]
+    if step > 0 and all(b - a == step for a, b in zip(indices[:-1], indices[1:])):
+        return slice(indices[0], indices[-1] + 1, step)
+    return indices
+
+
+def composeIndex(selection, key, shape):
+    """
+    Composes an index on a subset with the selection that defined the subset.
+
+    Args:
+        selection (tuple): The per-dimension indexers used to read the subset.
+        key: The index applied to the subset (ints, slices, integer lists or Ellipsis).
+        shape (tuple): The shape of the full, unsubset variable.
+
+    Returns:
+        tuple: An index into the full variable that reads the same values.
+    """
+    # dimensions selected with an integer are already dropped from the subset
+    kept = [not isinstance(outer, (int, np.integer)) for outer in selection]
+    ndim = sum(kept)
+
+    key = key if isinstance(key, tuple) else (key,)
+    if Ellipsis in key:
+        position = key.index(Ellipsis)
+        key = key[:position] + (slice(None),) * (ndim - len(key) + 1) + key[position + 1:]
+    key = iter(key + (slice(None),) * (ndim - len(key)))
+
+    composed = []
+    for size, outer, keep in zip(shape, selection, kept):
+        if not keep:
+            composed.append(outer)
+            continue
+        positions = np.arange(size)[outer][next(key)]
+        composed.append(int(positions) if np.ndim(positions) == 0 else toIndexer(positions))
+    return tuple(composed)
+
+
+def selectionShape(selection, shape):
+    """
+    Computes the shape of a hyperslab without reading it.
+
+    Args:
+        selection (tuple): The per-dimension indexers.
+        shape (tuple): The shape of the full variable.
+
+    Returns:
+        tuple: The shape of the selected hyperslab.
+    """
+    return tuple(len(np.arange(size)[outer]) for size, outer in zip(shape, selection)
+                 if not isinstance(outer, (int, np.integer)))
+
+
+def selectNames(names, variables, keep=('latitude', 'longitude')):
+    """
+    Restricts a list of variable names to the requested ones.
+
+    Args:
+        names (list): The variable names known to the reader.
+        variables (list): The requested variable names, None to keep all.
+        keep (tuple, optional): Names that are always kept, since the geolocation is needed
+                                for projections. Defaults to ('latitude', 'longitude').
+
+    Returns:
+        list: The variable names to read.
+    """
+    if variables is None:
+        return names
+    return [name for name in names if name in variables or name in keep]
+
+
+def bboxWindow(latitude, longitude, bbox):
+    """
+    Finds the smallest row/column window of a swath that covers a bounding box.
+
+    Args:
+        latitude (np.ndarray): 2D array of latitude values.
+        longitude (np.ndarray): 2D array of longitude values.
+        bbox (tuple): (lon_min, lon_max, lat_min, lat_max) in degrees, longitudes in [-180, 180].
+                      A box crossing the antimeridian is given with lon_min > lon_max,
+                      e.g. (170, -170, -10, 10).
+
+    Returns:
+        tuple: (row slice, column slice), or None if no pixel falls inside the box.
+    """
+    lon_min, lon_max, lat_min, lat_max = bbox
+    lat = np.ma.filled(np.ma.asarray(latitude, dtype=np.float64), np.nan)
+    lon = np.ma.filled(np.ma.asarray(longitude, dtype=np.float64), np.nan)
+
+    # wrap the longitudes to [-180, 180) so the box test works for 0-360 data as well
+    lon = (lon + 180) % 360 - 180
+
+    if lon_min <= lon_max:
+        inside_lon = (lon >= lon_min) & (lon <= lon_max)
+    else:
+        inside_lon = (lon >= lon_min) | (lon <= lon_max)
+    inside = inside_lon & (lat >= lat_min) & (lat <= lat_max)
+
+    rows = np.flatnonzero(inside.any(axis=1))
+    cols = np.flatnonzero(inside.any(axis=0))
+    if rows.size == 0:
+        return None
+    return slice(int(rows[0]), int(rows[-1]) + 1), slice(int(cols[0]), int(cols[-1]) + 1)
+
+
+class Subset:
+    """
+    A selection of views, wavelengths and a row/column window to read from a granule.
+    """
+
+    def __init__(self, view_indices=None, wavelength_indices=None):
+        """
+        Initializes the subset.
+
+        Args:
+            view_indices (list, optional): The view indices to read. Defaults to all views.
+            wavelength_indices (list or dict, optional): The wavelength (band) indices to read. A dict
+                                                         maps dimension names, e.g. 'polarization_bands_per_view',
+                                                         to their own indices. Defaults to all wavelengths.
+        """
+        self.view_indices = view_indices
+        self.wavelength_indices = wavelength_indices
+        self.window = {}
+
+    def __bool__(self):
+        return self.view_indices is not None or self.wavelength_indices is not None or bool(self.window)
+
+    def clip(self, latitude, longitude, bbox):
+        """
+        Restricts the subset to the row/column window covering a bounding box.
+
+        Args:
+            latitude (netCDF4.Variable): The 2D latitude variable of the granule.
+            longitude (netCDF4.Variable): The 2D longitude variable of the granule.
+            bbox (tuple): (lon_min, lon_max, lat_min, lat_max) in degrees.
+
+        Returns:
+            tuple: (row slice, column slice), or None if no pixel falls inside the box.
+        """
+        window = bboxWindow(latitude[:], longitude[:], bbox)
+        if window is not None:
+            self.window = dict(zip(latitude.dimensions, window))
+        return window
+
+    def indexer(self, dimension):
+        """
+        Returns the indexer for a single dimension.
+
+        Args:
+            dimension (str): The dimension name.
+
+        Returns:
+            int, slice or list: The indexer, slice(None) if the dimension is not subset.
+        """
+        if dimension in self.window:
+            return self.window[dimension]
+        role = dimensionRole(dimension)
+        if role == 'view' and self.view_indices is not None:
+            return toIndexer(self.view_indices)
+        if role == 'wavelength' and self.wavelength_indices is not None:
+            if isinstance(self.wavelength_indices, dict):
+                if dimension in self.wavelength_indices:
+                    return toIndexer(self.wavelength_indices[dimension])
+                return slice(None)
+            return toIndexer(self.wavelength_indices)
+        return slice(None)
+
+    def index(self, variable):
+        """
+        Builds the NetCDF index for a variable.
+
+        Args:
+            variable (netCDF4.Variable): The variable to index.
+
+        Returns:
+            tuple: The per-dimension indexers, or None if the variable is read in full.
+        """
+        index = tuple(self.indexer(dimension) for dimension in variable.dimensions)
+        if all(isinstance(i, slice) and i == slice(None) for i in index):
+            return None
+        return index
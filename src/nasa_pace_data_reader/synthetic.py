@@ -0,0 +1,498 @@
+"""
+Synthetic granule generator for the NASA PACE Data Reader library.
+
+Writes NetCDF files with the group, dimension and variable layout expected by the readers
+(:class:`L1.L1C` for HARP2, SPEXone and OCI, :class:`L1.L1B`, :class:`L1.L1beta` and
+:class:`L2.L2`), filled with smooth, compressible fields instead of real radiances. The
+files are meant for benchmarks and examples, so sizes, chunking and compression can be
+chosen freely, e.g.::
+
+    from nasa_pace_data_reader import synthetic, L1
+    path = synthetic.writeL1C('/tmp/bench', instrument='HARP2', rows=519, cols=519)
+    l1c_dict = L1.L1C().read(path)
+"""
+
+# Standard library imports for file naming.
+import os
+import datetime
+
+# Third-party imports for array handling and writing NetCDF files.
+import numpy as np
+from netCDF4 import Dataset # type: ignore
+
+# Default layout of each instrument: views, intensity bands and polarization bands per view.
+L1C_LAYOUTS = {
+    'HARP2': {'views': 90, 'bands': 1, 'polarization_bands': 1},
+    'SPEXone': {'views': 5, 'bands': 400, 'polarization_bands': 50},
+    'OCI': {'views': 2, 'bands': 249, 'polarization_bands': None},
+}
+
+# Approximate band centres in nm used for the wavelength variables.
+HARP2_WAVELENGTHS = [441.9, 549.8, 669.4, 867.8]
+
+
+def granuleName(instrument, level, time=None, suffix=''):
+    """
+    Builds a file name following the PACE naming convention, e.g. 'PACE_HARP2.20240501T000000.L1C.5km.nc'.
+
+    The readers take the instrument from the name and the observation time from the second
+    field, so synthetic granules can be read and sorted like real ones.
+
+    Args:
+        instrument (str): The instrument name.
+        level (str): The product level, e.g. 'L1C' or 'L2'.
+        time (datetime.datetime, optional): The observation time. Defaults to 2024-05-01 00:00:00.
+        suffix (str, optional): Extra name fields before the extension, e.g. '5km'. Defaults to ''.
+
+    Returns:
+        str: The file name.
+    """
+    time = datetime.datetime(2024, 5, 1) if time is None else time
+    fields = [f'PACE_{instrument}', time.strftime('%Y%m%dT%H%M%S'), level] + ([suffix] if suffix else [])
+    return '.'.join(fields) + '.nc'
+
+
+def swathGeolocation(rows, cols, lon_center=0.0, lat_center=0.0, resolution=5.0, heading=-10.0):
+    """
+    Creates the latitude and longitude of a rectangular swath.
+
+    Args:
+        rows (int): The number of along-track bins.
+        cols (int): The number of across-track bins.
+        lon_center (float, optional): The longitude of the swath centre, 180 gives a swath
+                                      crossing the antimeridian. Defaults to 0.
+        lat_center (float, optional): The latitude of the swath centre. Defaults to 0.
+        resolution (float, optional): The bin size in km. Defaults to 5.
+        heading (float, optional): The angle of the track from north in degrees. Defaults to -10.
+
+    Returns:
+        tuple: 2D latitude and longitude arrays, longitudes in [-180, 180).
+    """
+    step = resolution / 111.2
+    along, across = np.meshgrid((np.arange(rows) - (rows - 1) / 2) * step,
+                                (np.arange(cols) - (cols - 1) / 2) * step, indexing='ij')
+    heading = np.deg2rad(heading)
+    lat = lat_center + along*np.cos(heading) - across*np.sin(heading)
+    lat = np.clip(lat, -89.9, 89.9)
+    lon = lon_center + (along*np.sin(heading) + across*np.cos(heading)) / np.cos(np.deg2rad(lat))
+    lon = (lon + 180) % 360 - 180
+    return lat.astype(np.float32), lon.astype(np.float32)
+
+
+def smoothField(shape, scale=1.0, offset=0.0, noise=0.02, seed=0):
+    """
+    Creates a smooth field with a little noise, which compresses roughly like real imagery.
+
+    The first two axes are the spatial ones, every further axis gets its own gain so
+    views and bands differ.
+
+    Args:
+        shape (tuple): The shape of the field.
+        scale (float, optional): The amplitude of the field. Defaults to 1.
+        offset (float, optional): The mean of the field. Defaults to 0.
+        noise (float, optional): The relative amplitude of the noise. Defaults to 0.02.
+        seed (int, optional): The seed of the random generator. Defaults to 0.
+
+    Returns:
+        np.ndarray: A float32 array.
+    """
+    rng = np.random.default_rng(seed)
+    y = np.linspace(0, 3*np.pi, shape[0], dtype=np.float32)[:, None]
+    x = np.linspace(0, 2*np.pi, shape[1], dtype=np.float32)[None, :]
+    base = (0.5 + 0.25*np.sin(y + rng.uniform(0, np.pi))*np.cos(x) + 0.25*np.sin(0.5*x*y)).astype(np.float32)
+    base = base.reshape(base.shape + (1,)*(len(shape) - 2))
+    gain = rng.uniform(0.7, 1.3, size=(1, 1) + tuple(shape[2:])).astype(np.float32)
+    field = base*gain
+    field += noise*rng.standard_normal(shape, dtype=np.float32)
+    return offset + scale*field
+
+
+class SyntheticWriter:
+    """
+    Writes variables into an open Dataset with a common chunking and compression setup.
+    """
+
+    def __init__(self, dataset, chunks=None, compression='zlib', complevel=4, shuffle=True, seed=0, pack=False):
+        """
+        Initializes the writer.
+
+        Args:
+            dataset (netCDF4.Dataset): The dataset to write to.
+            chunks (dict, optional): Chunk length per dimension name, dimensions not listed are
+                                     stored whole within a chunk. Defaults to the library default.
+            compression (str, optional): 'zlib' or None. Defaults to 'zlib'.
+            complevel (int, optional): The zlib compression level. Defaults to 4.
+            shuffle (bool, optional): Whether to apply the HDF5 shuffle filter. Defaults to True.
+            seed (int, optional): The seed for the synthetic fields. Defaults to 0.
+            pack (bool, optional): Store the float fields as int16 with scale_factor and add_offset,
+                                   as done for packed products. Defaults to False.
+        """
+        assert compression in ['zlib', None], 'Error: compression must be "zlib" or None'
+        self.dataset = dataset
+        self.chunks = chunks
+        self.compression = compression
+        self.complevel = complevel
+        self.shuffle = shuffle
+        self.seed = seed
+        self.pack = pack
+
+    def dimensions(self, sizes):
+        """
+        Creates the dimensions of the dataset.
+
+        Args:
+            sizes (dict): The length of each dimension.
+        """
+        for name, size in sizes.items():
+            self.dataset.createDimension(name, size)
+
+    def chunksizes(self, dims):
+        """
+        Returns the chunk shape of a variable, or None for the library default.
+
+        Args:
+            dims (tuple): The dimension names of the variable.
+
+        Returns:
+            tuple: The chunk shape.
+        """
+        if self.chunks is None:
+            return None
+        sizes = [len(self.dataset.dimensions[dim]) for dim in dims]
+        return tuple(min(self.chunks.get(dim, size), size) for dim, size in zip(dims, sizes))
+
+    def write(self, group, name, dims, values, units=None, fill_value=-999.0, dtype='f4'):
+        """
+        Creates a variable and writes its values.
+
+        Args:
+            group (netCDF4.Group): The group holding the variable.
+            name (str): The variable name.
+            dims (tuple): The dimension names.
+            values (np.ndarray): The values, broadcast to the variable shape.
+            units (str, optional): The units attribute. Defaults to None.
+            fill_value (float, optional): The fill value. Defaults to -999.
+            dtype (str, optional): The NetCDF data type. Defaults to 'f4'.
+
+        Returns:
+            netCDF4.Variable: The written variable.
+        """
+        compress = self.compression is not None and len(dims) > 1
+        pack = self.pack and dtype == 'f4' and len(dims) > 1
+        if pack:
+            # int16 over the value range, the lowest value is kept for the fill value
+            low, high = float(np.nanmin(values)), float(np.nanmax(values))
+            dtype, fill_value = 'i2', -32767
+        variable = group.createVariable(name, dtype, dims, fill_value=fill_value,
+                                        zlib=compress, complevel=self.complevel, shuffle=self.shuffle and compress,
+                                        chunksizes=self.chunksizes(dims) if len(dims) > 1 else None)
+        if pack:
+            variable.scale_factor = np.float32(max(high - low, 1e-6)/65000)
+            variable.add_offset = np.float32((high + low)/2)
+        if units is not None:
+            variable.units = units
+        shape = tuple(len(self.dataset.dimensions[dim]) for dim in dims)
+        variable[:] = np.broadcast_to(values, shape)
+        return variable
+
+    def field(self, shape, scale=1.0, offset=0.0):
+        """Returns a smooth field, with a new seed for every call."""
+        self.seed += 1
+        return smoothField(shape, scale=scale, offset=offset, seed=self.seed)
+
+
+def geometryFields(writer, group, dims, shape, names):
+    """
+    Writes the viewing geometry variables of a granule.
+
+    Args:
+        writer (SyntheticWriter): The writer.
+        group (netCDF4.Group): The geolocation group.
+        dims (tuple): The dimensions of the angle variables.
+        shape (tuple): The shape of the angle variables.
+        names (list): The variable names to write, angles scale with their name.
+    """
+    ranges = {'scattering_angle': (90, 90), 'zenith': (0, 70), 'azimuth': (-180, 360), 'rotation_angle': (-90, 180)}
+    for name in names:
+        offset, scale = next((value for key, value in ranges.items() if key in name), (0, 90))
+        writer.write(group, name, dims, writer.field(shape, scale=scale, offset=offset), units='degrees')
+
+
+def writeL1C(directory, instrument='HARP2', rows=519, cols=519, views=None, bands=None, polarization_bands=None,
+             lon_center=0.0, lat_center=0.0, time=None, experimental=False, **kwargs):
+    """
+    Writes a synthetic L1C granule that can be read with L1.L1C(instrument).
+
+    Args:
+        directory (str): The directory to write to, created if missing.
+        instrument (str, optional): 'HARP2', 'SPEXone' or 'OCI'. Defaults to 'HARP2'.
+        rows (int, optional): The number of along-track bins. Defaults to 519.
+        cols (int, optional): The number of across-track bins. Defaults to 519.
+        views (int, optional): The number of views. Defaults to the instrument layout.
+        bands (int, optional): The number of intensity bands per view. Defaults to the instrument layout.
+        polarization_bands (int, optional): The number of polarization bands per view. Defaults to the instrument layout.
+        lon_center (float, optional): The longitude of the swath centre. Defaults to 0.
+        lat_center (float, optional): The latitude of the swath centre. Defaults to 0.
+        time (datetime.datetime, optional): The observation time used in the file name. Defaults to 2024-05-01.
+        experimental (bool, optional): Also write the HARP2 sensor1-3 variables. Defaults to False.
+        **kwargs: Chunking and compression options passed to SyntheticWriter.
+
+    Returns:
+        str: The path to the written granule.
+    """
+    instrument = {name.lower(): name for name in L1C_LAYOUTS}[instrument.lower()]
+    layout = L1C_LAYOUTS[instrument]
+    views = layout['views'] if views is None else views
+    bands = layout['bands'] if bands is None else bands
+    polarization_bands = layout['polarization_bands'] if polarization_bands is None else polarization_bands
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, granuleName(instrument, 'L1C', time, suffix='5km'))
+
+    with Dataset(path, 'w') as dataNC:
+        dataNC.title = f'PACE {instrument} Level-1C Data'
+        dataNC.date_created = (datetime.datetime(2024, 5, 1) if time is None else time).strftime('%Y-%m-%dT%H:%M:%SZ')
+        writer = SyntheticWriter(dataNC, **kwargs)
+        sizes = {'bins_along_track': rows, 'bins_across_track': cols, 'number_of_views': views,
+                 'intensity_bands_per_view': bands}
+        if polarization_bands:
+            sizes['polarization_bands_per_view'] = polarization_bands
+        writer.dimensions(sizes)
+
+        time_data = dataNC.createGroup('bin_attributes')
+        geo_data = dataNC.createGroup('geolocation_data')
+        obs_data = dataNC.createGroup('observation_data')
+        sensor_data = dataNC.createGroup('sensor_views_bands')
+
+        # the nadir view time of each bin
+        writer.write(time_data, 'nadir_view_time', ('bins_along_track',), np.linspace(0, 300, rows), units='seconds')
+
+        # geolocation
+        spatial = ('bins_along_track', 'bins_across_track')
+        lat, lon = swathGeolocation(rows, cols, lon_center, lat_center)
+        writer.write(geo_data, 'latitude', spatial, lat, units='degrees_north')
+        writer.write(geo_data, 'longitude', spatial, lon, units='degrees_east')
+        writer.write(geo_data, 'height', spatial, writer.field((rows, cols), scale=500).astype(np.int16),
+                     units='meters', fill_value=-32767, dtype='i2')
+        angles = ['scattering_angle', 'solar_zenith_angle', 'solar_azimuth_angle', 'sensor_zenith_angle',
+                  'sensor_azimuth_angle']
+        if instrument != 'OCI':
+            angles.append('rotation_angle')
+        geometryFields(writer, geo_data, spatial + ('number_of_views',), (rows, cols, views), angles)
+
+        # observations, the polarized quantities of SPEXone are on their own band dimension
+        intensity = spatial + ('number_of_views', 'intensity_bands_per_view')
+        polarization = spatial + ('number_of_views', 'polarization_bands_per_view') if instrument == 'SPEXone' else intensity
+        writer.write(obs_data, 'i', intensity, writer.field((rows, cols, views, bands), scale=150), units='W m-2 sr-1 um-1')
+        if instrument != 'OCI':
+            pshape = (rows, cols, views, sizes[polarization[-1]])
+            writer.write(obs_data, 'q', polarization, writer.field(pshape, scale=40, offset=-20), units='W m-2 sr-1 um-1')
+            writer.write(obs_data, 'u', polarization, writer.field(pshape, scale=40, offset=-20), units='W m-2 sr-1 um-1')
+            writer.write(obs_data, 'dolp', polarization, writer.field(pshape, scale=0.5), units='none')
+        if instrument == 'SPEXone':
+            writer.write(obs_data, 'q_over_i', polarization, writer.field(pshape, scale=0.4, offset=-0.2), units='none')
+            writer.write(obs_data, 'u_over_i', polarization, writer.field(pshape, scale=0.4, offset=-0.2), units='none')
+        if instrument == 'HARP2' and experimental:
+            for name in ['sensor1', 'sensor2', 'sensor3']:
+                writer.write(obs_data, name, intensity, writer.field((rows, cols, views, bands), scale=4000), units='counts')
+
+        # sensor views and bands
+        writer.write(sensor_data, 'sensor_view_angle', ('number_of_views',), np.linspace(-57, 57, views), units='degrees')
+        band_dims = ('number_of_views', 'intensity_bands_per_view')
+        if instrument == 'HARP2':
+            # HARP2 cycles through its four bands view by view
+            wavelengths = np.array(HARP2_WAVELENGTHS)[np.arange(views) % 4][:, None]
+        else:
+            wavelengths = np.linspace(385, 770 if instrument == 'SPEXone' else 895, bands)[None, :]
+        writer.write(sensor_data, 'intensity_wavelength', band_dims, wavelengths, units='nm')
+        writer.write(sensor_data, 'intensity_f0', band_dims, 1800 - wavelengths, units='W m-2 um-1')
+        if instrument == 'SPEXone':
+            pol_dims = ('number_of_views', 'polarization_bands_per_view')
+            pol_wavelengths = np.linspace(385, 770, polarization_bands)[None, :]
+            writer.write(sensor_data, 'polarization_wavelength', pol_dims, pol_wavelengths, units='nm')
+            writer.write(sensor_data, 'polarization_f0', pol_dims, 1800 - pol_wavelengths, units='W m-2 um-1')
+
+    return path
+
+
+def writeL1B(directory, rows=395, cols=519, views=90, lon_center=0.0, lat_center=0.0, time=None,
+             experimental=False, **kwargs):
+    """
+    Writes a synthetic HARP2 L1B granule that can be read with L1.L1B().
+
+    Unlike L1C, the L1B variables are stored per view as (views, rows, cols), including
+    latitude and longitude.
+
+    Args:
+        directory (str): The directory to write to, created if missing.
+        rows (int, optional): The number of scan lines. Defaults to 395.
+        cols (int, optional): The number of pixels per line. Defaults to 519.
+        views (int, optional): The number of views. Defaults to 90.
+        lon_center (float, optional): The longitude of the swath centre. Defaults to 0.
+        lat_center (float, optional): The latitude of the swath centre. Defaults to 0.
+        time (datetime.datetime, optional): The observation time used in the file name. Defaults to 2024-05-01.
+        experimental (bool, optional): Also write the sensor1-3 variables. Defaults to False.
+        **kwargs: Chunking and compression options passed to SyntheticWriter.
+
+    Returns:
+        str: The path to the written granule.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, granuleName('HARP2', 'L1B', time))
+
+    with Dataset(path, 'w') as dataNC:
+        dataNC.title = 'PACE HARP2 Level-1B Data'
+        writer = SyntheticWriter(dataNC, **kwargs)
+        writer.dimensions({'number_of_views': views, 'number_of_lines': rows, 'number_of_pixels': cols})
+        geo_data = dataNC.createGroup('geolocation_data')
+        obs_data = dataNC.createGroup('observation_data')
+        sensor_data = dataNC.createGroup('sensor_views_bands')
+
+        dims = ('number_of_views', 'number_of_lines', 'number_of_pixels')
+        shape = (views, rows, cols)
+        lat, lon = swathGeolocation(rows, cols, lon_center, lat_center)
+        writer.write(geo_data, 'latitude', dims, lat, units='degrees_north')
+        writer.write(geo_data, 'longitude', dims, lon, units='degrees_east')
+        writer.write(geo_data, 'surface_altitude', dims, writer.field((rows, cols), scale=500), units='meters')
+        for name in ['solar_zenith_angle', 'solar_azimuth_angle', 'sensor_zenith_angle', 'sensor_azimuth_angle']:
+            # the spatial axes come first in the synthetic field, so generate per view and move the axis
+            writer.write(geo_data, name, dims, np.moveaxis(writer.field((rows, cols, views), scale=70), -1, 0),
+                         units='degrees')
+
+        names = ['i', 'q', 'u', 'dolp'] + (['sensor1', 'sensor2', 'sensor3'] if experimental else [])
+        scales = {'i': (150, 0), 'q': (40, -20), 'u': (40, -20), 'dolp': (0.5, 0)}
+        for name in names:
+            scale, offset = scales.get(name, (4000, 0))
+            values = np.moveaxis(writer.field((rows, cols, views), scale=scale, offset=offset), -1, 0)
+            writer.write(obs_data, name, dims, values, units='counts' if name.startswith('sensor') else 'W m-2 sr-1 um-1')
+
+        wavelengths = np.array(HARP2_WAVELENGTHS)[np.arange(views) % 4]
+        writer.write(sensor_data, 'sensor_view_angle', ('number_of_views',), np.linspace(-57, 57, views), units='degrees')
+        writer.write(sensor_data, 'intensity_wavelength', ('number_of_views',), wavelengths, units='nm')
+        writer.write(sensor_data, 'intensity_f0', ('number_of_views',), 1800 - wavelengths, units='W m-2 um-1')
+
+    return path
+
+
+def writeL1beta(directory, rows=400, frames=16, cols=400, lon_center=0.0, lat_center=0.0, time=None, **kwargs):
+    """
+    Writes a synthetic GAPMAP L1beta granule that can be read with L1.L1beta().
+
+    Args:
+        directory (str): The directory to write to, created if missing.
+        rows (int, optional): The number of image lines. Defaults to 400.
+        frames (int, optional): The number of frames. Defaults to 16.
+        cols (int, optional): The number of image columns. Defaults to 400.
+        lon_center (float, optional): The longitude of the image centre. Defaults to 0.
+        lat_center (float, optional): The latitude of the image centre. Defaults to 0.
+        time (datetime.datetime, optional): The observation time used in the file name. Defaults to 2024-05-01.
+        **kwargs: Chunking and compression options passed to SyntheticWriter.
+
+    Returns:
+        str: The path to the written granule.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, granuleName('GAPMAP', 'L1beta', time))
+
+    with Dataset(path, 'w') as dataNC:
+        writer = SyntheticWriter(dataNC, **kwargs)
+        writer.dimensions({'number_of_lines': rows, 'number_of_frames': frames, 'number_of_pixels': cols})
+        img_data = dataNC.createGroup('IMAGE_DATA')
+        nav_data = dataNC.createGroup('NAVIGATION')
+
+        dims = ('number_of_lines', 'number_of_frames', 'number_of_pixels')
+        lat, lon = swathGeolocation(rows, cols, lon_center, lat_center, resolution=0.1)
+        writer.write(img_data, 'Latitude', dims, lat[:, None, :], units='degrees_north')
+        writer.write(img_data, 'Longitude', dims, lon[:, None, :], units='degrees_east')
+        writer.write(img_data, 'Surface_Altitude', dims, writer.field((rows, cols), scale=500)[:, None, :], units='meters')
+        for name in ['image_0', 'image_45', 'image_90', 'image_135']:
+            values = np.moveaxis(writer.field((rows, cols, frames), scale=4000), -1, 1)
+            writer.write(img_data, name, dims, values, units='counts')
+
+        writer.write(nav_data, 'JD', ('number_of_frames',), 2460431.5 + np.arange(frames)/86400, units='days')
+        writer.write(nav_data, 'Date', ('number_of_frames',), np.full(frames, 20240501), fill_value=None, dtype='i4')
+        writer.write(nav_data, 'Time', ('number_of_frames',), np.arange(frames), units='seconds')
+
+    return path
+
+
+def writeL2(directory, rows=519, cols=519, wavelengths=(440, 550, 670, 870), lon_center=0.0, lat_center=0.0,
+            time=None, **kwargs):
+    """
+    Writes a synthetic HARP2 GRASP-Anin L2 granule that can be read with L2.L2().
+
+    Args:
+        directory (str): The directory to write to, created if missing.
+        rows (int, optional): The number of along-track bins. Defaults to 519.
+        cols (int, optional): The number of across-track bins. Defaults to 519.
+        wavelengths (tuple, optional): The retrieval wavelengths in nm. Defaults to (440, 550, 670, 870).
+        lon_center (float, optional): The longitude of the swath centre. Defaults to 0.
+        lat_center (float, optional): The latitude of the swath centre. Defaults to 0.
+        time (datetime.datetime, optional): The observation time used in the file name. Defaults to 2024-05-01.
+        **kwargs: Chunking and compression options passed to SyntheticWriter.
+
+    Returns:
+        str: The path to the written granule.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, granuleName('HARP2', 'L2', time, suffix='GRASP'))
+
+    # the spectral products, every other variable is a single field per bin
+    spectral = ['aot', 'aot_fine', 'aot_coarse', 'fmf', 'mi', 'mr', 'ssa_total', 'rv_fine', 'rv_coarse',
+                'surfaceAlbedo', 'brdfP1', 'brdfP2', 'brdfP3', 'bpdfP1', 'waterP1', 'waterP2', 'waterP3']
+    single = ['angstrom', 'alh', 'spherFrac', 'reff_coarse', 'reff_fine', 'vd', 'windspeed']
+
+    with Dataset(path, 'w') as dataNC:
+        dataNC.title = 'PACE HARP2 Level-2 data'
+        dataNC.date_created = (datetime.datetime(2024, 5, 1) if time is None else time).strftime('%Y-%m-%dT%H:%M:%SZ')
+        writer = SyntheticWriter(dataNC, **kwargs)
+        writer.dimensions({'bins_along_track': rows, 'bins_across_track': cols, 'wavelength': len(wavelengths)})
+        geophysical_data = dataNC.createGroup('geophysical_data')
+        geo_data = dataNC.createGroup('geolocation_data')
+        sensor_data = dataNC.createGroup('sensor_band_parameters')
+        diagnostic_data = dataNC.createGroup('diagnostic_data')
+
+        spatial = ('bins_along_track', 'bins_across_track')
+        lat, lon = swathGeolocation(rows, cols, lon_center, lat_center)
+        writer.write(geo_data, 'latitude', spatial, lat, units='degrees_north')
+        writer.write(geo_data, 'longitude', spatial, lon, units='degrees_east')
+
+        for name in spectral:
+            values = writer.field((rows, cols, len(wavelengths)), scale=0.5)
+            writer.write(geophysical_data, name, spatial + ('wavelength',), values, units='none')
+        for name in single:
+            writer.write(geophysical_data, name, spatial, writer.field((rows, cols), scale=2), units='none')
+
+        writer.write(diagnostic_data, 'chi2', spatial, writer.field((rows, cols), scale=3), units='none')
+        writer.write(diagnostic_data, 'n_iter', spatial, np.full((rows, cols), 20), units='none')
+        writer.write(diagnostic_data, 'quality_flag', spatial, np.ones((rows, cols)), units='none')
+
+        writer.write(sensor_data, 'wavelength', ('wavelength',), np.asarray(wavelengths), units='nm')
+
+    return path
+
+
+def writeGranule(directory, level='L1C', instrument='HARP2', **kwargs):
+    """
+    Writes a synthetic granule of any supported level.
+
+    Args:
+        directory (str): The directory to write to, created if missing.
+        level (str, optional): 'L1C', 'L1B', 'L1beta' or 'L2'. Defaults to 'L1C'.
+        instrument (str, optional): The L1C instrument. Defaults to 'HARP2'.
+        **kwargs: Size, geolocation, chunking and compression options of the level writer.
+
+    Returns:
+        str: The path to the written granule.
+    """
+    match level.lower():
+        case 'l1c':
+            return writeL1C(directory, instrument=instrument, **kwargs)
+        case 'l1b':
+            return writeL1B(directory, **kwargs)
+        case 'l1beta':
+            return writeL1beta(directory, **kwargs)
+        case 'l2':
+            return writeL2(directory, **kwargs)
+        case _:
+            raise ValueError(f'Error: unknown level {level}, use L1C, L1B, L1beta or L2')
@@ -0,0 +1,362 @@
+"""
+Reusable map figures for batch rendering with the NASA PACE Data Reader library.
+
+Building a cartopy figure (axes, gridlines, map features, colorbar) costs more than regridding
+a granule. A :class:`FigureTemplate` builds them once; every granule then only swaps the data
+and extent of the existing image with ``set_data``/``set_extent`` and the figure is saved again::
+
+    from nasa_pace_data_reader import L1, plot, template
+    orbit = template.FigureTemplate('Orthographic', lon_0=-60, lat_0=0, figsize=(6, 6))
+    for fileName in files:
+        plt_ = plot.Plot(L1.L1C().read(fileName))
+        orbit.renderRGB(plt_, fileName.replace('.nc', '.png'), normFactor=200)
+
+The images are regridded straight into the pixels of the template projection, so cartopy does
+not warp them again. The projection is fixed when the template is built, the extent either
+stays fixed or follows every granule, in which case the cached map feature layers follow too.
+A granule across the dateline spans the whole width of a PlateCarree template centred on 0°,
+centre such templates with ``lon_0=180``.
+"""
+
+# Third-party imports for array handling.
+import numpy as np
+
+# Cartopy and matplotlib are only imported when a template is built.
+from .lazyimport import LazyModule
+ccrs = LazyModule('cartopy.crs')
+gridliner = LazyModule('cartopy.mpl.gridliner')
+mfigure = LazyModule('matplotlib.figure')
+backend_agg = LazyModule('matplotlib.backends.backend_agg')
+
+# Local imports for the cached map backgrounds, the projections, the exceptions and the opt-in profiling spans.
+from .backgrounds import BACKGROUND_CACHE, drawFeatures
+from .regrid import mapProjection
+from .exceptions import EmptySubsetError
+from .profiling import span, profiled
+
+# The projections drawn on a globe, they show the whole globe and a stock image by default.
+GLOBES = ['orthographic', 'northpolarstereo', 'southpolarstereo']
+
+
+def toRGBA(image):
+    """Makes the black (empty) pixels of a regridded RGB image transparent, other images are returned as they are."""
+    image = np.asanyarray(image)
+    if image.ndim == 3 and image.shape[-1] == 3:
+        alpha = np.any(np.ma.filled(image, 0) > 0, axis=-1)
+        return np.dstack([np.ma.filled(image, 0), alpha]).astype(np.float32)
+    return image
+
+
+class MapPanel:
+    """
+    One map axes of a FigureTemplate with the artists that are reused across granules.
+    """
+
+    def __init__(self, ax, extent=None, underlays=(), overlays=(), cache=BACKGROUND_CACHE, gridlines=False,
+                 cmap=None, vmin=None, vmax=None, colorbar=None):
+        """
+        Builds the artists of the panel.
+
+        Args:
+            ax (cartopy.mpl.geoaxes.GeoAxes): The map axes.
+            extent (list or str, optional): [lon_min, lon_max, lat_min, lat_max] or 'global' for a fixed
+                                            view, None to follow the extent of every image. Defaults to None.
+            underlays (list, optional): Map features drawn under the data, see backgrounds.normalizeFeatures.
+            overlays (list, optional): Map features drawn over the data.
+            cache (BackgroundCache, optional): The layer cache, None to draw the features as vectors.
+                                               Defaults to BACKGROUND_CACHE.
+            gridlines (bool, optional): Whether to draw labelled gridlines. Defaults to False.
+            cmap (str, optional): The colormap of single-band images. Defaults to None.
+            vmin (float, optional): The lower limit of the colormap. Defaults to None.
+            vmax (float, optional): The upper limit of the colormap. Defaults to None.
+            colorbar (str, optional): The label of a colorbar, None for no colorbar. Defaults to None.
+        """
+        self.ax = ax
+        self.underlays = list(underlays)
+        self.overlays = list(overlays)
+        self.cache = cache
+        self.extraImages = []
+        self._layers = [None, None]
+        self._vectors = False
+
+        if extent is None:
+            self.extent = None
+        else:
+            if isinstance(extent, str):
+                assert extent == 'global', 'Error: extent must be a list or "global"'
+                ax.set_global()
+            else:
+                ax.set_extent(extent, crs=ccrs.PlateCarree())
+            self.extent = list(ax.get_xlim()) + list(ax.get_ylim())
+
+        # the image is created once, with the limits of the colormap kept for every granule
+        view = self.extent if self.extent is not None else [0, 1, 0, 1]
+        self.image = ax.imshow(np.ma.masked_all((2, 2)), origin='lower', extent=view, transform=ax.projection,
+                               cmap=cmap, vmin=vmin, vmax=vmax, interpolation='nearest', zorder=1)
+
+        if gridlines:
+            gl = ax.gridlines(crs=ccrs.PlateCarree(), draw_labels=True, linewidth=1, color='white', alpha=0.2,
+                              linestyle='--')
+            gl.top_labels = False
+            gl.right_labels = False
+            gl.xformatter = gridliner.LONGITUDE_FORMATTER
+            gl.yformatter = gridliner.LATITUDE_FORMATTER
+
+        self.colorbar = None
+        if colorbar is not None:
+            self.colorbar = ax.figure.colorbar(self.image, ax=ax, label=colorbar, shrink=0.7)
+
+        if self.extent is not None:
+            self.drawFeatures(self.extent)
+
+    def __repr__(self):
+        return f'<MapPanel {type(self.ax.projection).__name__}, {"fixed" if self.extent else "following"} extent>'
+
+    def drawFeatures(self, extent):
+        """
+        Draws the map features for a view, reusing the layers drawn for an earlier one.
+
+        Args:
+            extent (list): [x_min, x_max, y_min, y_max] in the projection of the axes.
+        """
+        with span('features'):
+            if self.cache is None:
+                # vectors are clipped by cartopy at every draw, they are added once
+                if not self._vectors:
+                    drawFeatures(self.ax, self.underlays, None, zorder=-1)
+                    drawFeatures(self.ax, self.overlays, None, zorder=2)
+                    self._vectors = True
+            else:
+                self._layers[0] = drawFeatures(self.ax, self.underlays, self.cache, extent, zorder=-1,
+                                               image=self._layers[0])
+                self._layers[1] = drawFeatures(self.ax, self.overlays, self.cache, extent, zorder=2,
+                                               image=self._layers[1])
+        self.ax.set_xlim(extent[:2])
+        self.ax.set_ylim(extent[2:])
+
+    def update(self, image, extent, title=None):
+        """
+        Swaps the image shown by the panel.
+
+        Args:
+            image (np.ndarray): The image in the pixels of the panel projection, (rows, cols) for a
+                                single band or (rows, cols, 3) for RGB, the first row at the bottom.
+            extent (list): [x_min, x_max, y_min, y_max] of the image in projection coordinates.
+            title (str, optional): A new title of the panel. Defaults to None, the title is kept.
+        """
+        self.image.set_data(toRGBA(image))
+        self.image.set_extent(extent)
+        self.image.set_visible(True)
+        if self.extent is None:
+            self.drawFeatures(list(extent))
+        else:
+            # set_extent of the image widens the limits with autoscaling, keep the fixed view
+            self.ax.set_xlim(self.extent[:2])
+            self.ax.set_ylim(self.extent[2:])
+        if title is not None:
+            self.ax.set_title(title)
+
+    def hide(self, title=None):
+        """
+        Shows no image on the panel, e.g. for a granule outside a fixed view.
+
+        Args:
+            title (str, optional): A new title of the panel. Defaults to None, the title is kept.
+        """
+        self.image.set_visible(False)
+        if title is not None:
+            self.ax.set_title(title)
+
+    def add(self, image, extent):
+        """
+        Adds an image that stays on the panel, e.g. the earlier granules of an orbit.
+
+        Args:
+            image (np.ndarray): The image in the pixels of the panel projection, see update.
+            extent (list): [x_min, x_max, y_min, y_max] of the image in projection coordinates.
+        """
+        view = self.ax.get_xlim(), self.ax.get_ylim()
+        self.extraImages.append(self.ax.imshow(toRGBA(image), origin='lower', extent=extent,
+                                               transform=self.ax.projection, cmap=self.image.get_cmap(),
+                                               norm=self.image.norm, interpolation='nearest', zorder=1))
+        self.ax.set_xlim(view[0])
+        self.ax.set_ylim(view[1])
+
+    def clear(self):
+        """Removes the images added with add."""
+        for image in self.extraImages:
+            image.remove()
+        self.extraImages = []
+
+
+class FigureTemplate:
+    """
+    A map figure that is built once and re-rendered for every granule.
+    """
+
+    def __init__(self, proj='PlateCarree', lon_0=0, lat_0=0, nrows=1, ncols=1, figsize=(6, 6), dpi=300,
+                 extent=None, underlays=None, overlays=None, gridlines=None, cmap=None, vmin=None, vmax=None,
+                 colorbar=None, facecolor=None, proj_size=(900,400), cache=BACKGROUND_CACHE):
+        """
+        Builds the figure, its map axes and the artists of every panel.
+
+        Args:
+            proj (str or cartopy.crs.Projection, optional): The projection of all panels, see regrid.mapProjection.
+                                                            Defaults to 'PlateCarree'.
+            lon_0 (float, optional): The central longitude. Defaults to 0.
+            lat_0 (float, optional): The central latitude of the Orthographic projection. Defaults to 0.
+            nrows (int, optional): The number of panel rows. Defaults to 1.
+            ncols (int, optional): The number of panel columns. Defaults to 1.
+            figsize (tuple, optional): The figure size in inches. Defaults to (6, 6).
+            dpi (int, optional): The resolution of the saved figures. Defaults to 300.
+            extent (list or str, optional): The fixed view of the panels, see MapPanel. Defaults to
+                                            'global' on globes and None, following the data, otherwise.
+            underlays (list, optional): Map features under the data. Defaults to ['stock'] on globes.
+            overlays (list, optional): Map features over the data. Defaults to the coastlines.
+            gridlines (bool, optional): Whether to draw labelled gridlines. Defaults to True for PlateCarree.
+            cmap (str, optional): The colormap of single-band images. Defaults to None.
+            vmin (float, optional): The lower limit of the colormap. Defaults to None.
+            vmax (float, optional): The upper limit of the colormap. Defaults to None.
+            colorbar (str, optional): The label of a colorbar on every panel. Defaults to None.
+            facecolor (str, optional): The figure background. Defaults to 'black' on globes and 'white' otherwise.
+            proj_size (tuple, optional): The longer side of the regridded images is max(proj_size) pixels.
+                                         Defaults to (900,400).
+            cache (BackgroundCache, optional): The map feature cache, None to draw vectors.
+                                               Defaults to BACKGROUND_CACHE.
+        """
+        globe = isinstance(proj, str) and proj.lower() in GLOBES
+        self.projection = mapProjection(proj, lon_0, lat_0)
+        self.proj_size = proj_size
+        self.dpi = dpi
+        extent = ('global' if globe else None) if extent is None else extent
+        underlays = (['stock'] if globe else []) if underlays is None else underlays
+        if overlays is None:
+            overlays = [('coastline', {'edgecolor': 'black', 'linewidth': 0.2 if globe else 1, 'alpha': 0.5})]
+        gridlines = not globe if gridlines is None else gridlines
+
+        with span('template', panels=nrows*ncols):
+            self.figure = mfigure.Figure(figsize=figsize, dpi=dpi)
+            self.canvas = backend_agg.FigureCanvasAgg(self.figure)
+            self.figure.patch.set_facecolor(('black' if globe else 'white') if facecolor is None else facecolor)
+            self.panels = [MapPanel(self.figure.add_subplot(nrows, ncols, i + 1, projection=self.projection),
+                                    extent, underlays, overlays, cache, gridlines, cmap, vmin, vmax, colorbar)
+                           for i in range(nrows*ncols)]
+
+    def __repr__(self):
+        return f'<FigureTemplate {type(self.projection).__name__}, {len(self.panels)} panels>'
+
+    def __getitem__(self, panel):
+        return self.panels[panel]
+
+    @profiled('FigureTemplate.renderRGB')
+    def renderRGB(self, plot, savePath=None, panel=0, title=None, regrid_method='nearest', **kwargs):
+        """
+        Shows the RGB image of a granule on a panel.
+
+        Args:
+            plot (Plot): The plot object of the granule.
+            savePath (str, optional): Where to save the figure. Defaults to None, not saved.
+            panel (int, optional): The index of the panel. Defaults to 0.
+            title (str, optional): A new title of the panel. Defaults to None.
+            regrid_method (str, optional): 'nearest' or 'mean'. Defaults to 'nearest'.
+            **kwargs: Keyword arguments for Plot.plotRGB, e.g. var, viewAngleIdx, scale, normFactor or rgb_dolp.
+
+        Returns:
+            tuple: The regridded RGB image and its extent in projection coordinates, (None, None)
+                   if the granule is not visible in the projection.
+        """
+        plot.plotRGB(returnRGB=True, plot=False, **kwargs)
+        try:
+            with span('regrid', method=regrid_method, native=True):
+                rgb_new, rgb_extent = plot.projectionRGB(self.projection, proj_size=self.proj_size,
+                                                         method=regrid_method)
+            self.panels[panel].update(rgb_new, rgb_extent, title)
+        except EmptySubsetError:
+            print('...The granule is not visible in the projection of the template')
+            rgb_new, rgb_extent = None, None
+            self.panels[panel].hide(title)
+        if savePath is not None:
+            self.save(savePath)
+        return rgb_new, rgb_extent
+
+    @profiled('FigureTemplate.renderRGBs')
+    def renderRGBs(self, plot, layers, savePath=None, title=None, regrid_method='nearest'):
+        """
+        Shows several RGB images of a granule, one per panel, with a single regrid.
+
+        Args:
+            plot (Plot): The plot object of the granule.
+            layers (list): The keyword arguments for Plot.plotRGB of every panel, in panel order.
+            savePath (str, optional): Where to save the figure. Defaults to None, not saved.
+            title (str, optional): A new title of the figure. Defaults to None.
+            regrid_method (str, optional): 'nearest' or 'mean'. Defaults to 'nearest'.
+
+        Returns:
+            tuple: The regridded RGB images and their extent in projection coordinates, (None, None)
+                   if the granule is not visible in the projection.
+        """
+        assert len(layers) <= len(self.panels), 'Error: more layers than panels'
+        rgbs = []
+        for kwargs in layers:
+            plot.plotRGB(returnRGB=True, plot=False, **kwargs)
+            rgbs.append(plot.rgb)
+        try:
+            with span('regrid', method=regrid_method, native=True, layers=len(layers)):
+                rgbs_new, rgb_extent = plot.projectionRGBs(rgbs, self.projection, proj_size=self.proj_size,
+                                                           method=regrid_method)
+            for panel, rgb_new in zip(self.panels, rgbs_new):
+                panel.update(rgb_new, rgb_extent)
+        except EmptySubsetError:
+            print('...The granule is not visible in the projection of the template')
+            rgbs_new, rgb_extent = None, None
+            for panel in self.panels[:len(layers)]:
+                panel.hide()
+        if savePath is not None:
+            self.save(savePath, title)
+        elif title is not None:
+            self.figure.suptitle(title)
+        return rgbs_new, rgb_extent
+
+    @profiled('FigureTemplate.renderVariable')
+    def renderVariable(self, plot, values, savePath=None, panel=0, title=None, regrid_method='nearest'):
+        """
+        Shows a single-band swath variable of a granule on a panel, through the colormap of the template.
+
+        Args:
+            plot (Plot): The plot object of the granule, providing the latitude and longitude.
+            values (np.ndarray): The (rows, cols) swath values, e.g. plot.data['i'][:, :, 40, 0].
+            savePath (str, optional): Where to save the figure. Defaults to None, not saved.
+            panel (int, optional): The index of the panel. Defaults to 0.
+            title (str, optional): A new title of the panel. Defaults to None.
+            regrid_method (str, optional): 'nearest' or 'mean'. Defaults to 'nearest'.
+
+        Returns:
+            tuple: The regridded masked image and its extent in projection coordinates, (None, None)
+                   if the granule is not visible in the projection.
+        """
+        try:
+            with span('regrid', method=regrid_method, native=True):
+                image, extent = plot.projectionImage(np.ma.masked_invalid(values), self.projection,
+                                                     proj_size=self.proj_size, method=regrid_method, fill_value=None)
+            self.panels[panel].update(image, extent, title)
+        except EmptySubsetError:
+            print('...The granule is not visible in the projection of the template')
+            image, extent = None, None
+            self.panels[panel].hide(title)
+        if savePath is not None:
+            self.save(savePath)
+        return image, extent
+
+    def save(self, savePath, title=None):
+        """
+        Saves the figure as it is now.
+
+        Args:
+            savePath (str): The image file.
+            title (str, optional): A new title of the figure. Defaults to None, the title is kept.
+        """
+        if title is not None:
+            self.figure.suptitle(title)
+        with span('savefig'):
+            self.figure.savefig(savePath, dpi=self.dpi, facecolor=self.figure.get_facecolor())
+        print(f'...Figure saved at {savePath}')